@@ -0,0 +1,147 @@
+"""
+Content-addressed cache for synthesized speech.
+
+Each clip is stored as `<id>.mp3`, where the id is a hash of the text,
+language and voice. Two requests for the same phrase (disclaimers,
+greetings, cached answers) share one file and one synthesis, and
+concurrent requests can no longer overwrite each other's audio. The
+directory is bounded in size and evicts least-recently-used clips. Access
+times are written back to the files, so LRU order survives a restart.
+
+    AUDIO_CACHE_DIR     where clips are stored (default ./audio_cache)
+    AUDIO_CACHE_MAX_MB  total size before eviction (default 200)
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from voice_of_the_doctor import synthesize_mp3
+
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio_cache"))
+AUDIO_CACHE_MAX_BYTES = int(float(os.getenv("AUDIO_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+AUDIO_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def audio_id(text: str, lang: str = "en", tld: str = "com", slow: bool = False) -> str:
+    """Stable id for a clip: the same text and voice always map to the same file"""
+    key = f"gtts\0{lang}\0{tld}\0{int(slow)}\0{text}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+class AudioCache:
+    def __init__(self, directory: str = AUDIO_CACHE_DIR, max_bytes: int = AUDIO_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def path(self, clip_id: str) -> str:
+        return os.path.join(self.directory, f"{clip_id}.mp3")
+
+    def _load(self) -> None:
+        # Called with the lock held; rebuilds LRU order from access times
+        os.makedirs(self.directory, exist_ok=True)
+        clips = []
+        for entry in os.scandir(self.directory):
+            name, ext = os.path.splitext(entry.name)
+            if ext == ".mp3" and AUDIO_ID.match(name):
+                stat = entry.stat()
+                clips.append((stat.st_atime, name, stat.st_size))
+        self._index = OrderedDict((name, size) for _, name, size in sorted(clips))
+        self._total = sum(self._index.values())
+
+    def get(self, clip_id: str) -> Optional[str]:
+        """Path of a cached clip (marked as recently used), or None"""
+        with self._lock:
+            if self._index is None:
+                self._load()
+            if clip_id not in self._index:
+                return None
+            self._index.move_to_end(clip_id)
+        path = self.path(clip_id)
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except FileNotFoundError:
+            with self._lock:
+                self._total -= self._index.pop(clip_id, 0)
+            return None
+        return path
+
+    def put(self, clip_id: str, data: bytes) -> str:
+        """Stores a clip atomically, evicting the least recently used ones past the size cap"""
+        path = self.path(clip_id)
+        with self._lock:
+            if self._index is None:
+                self._load()
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        evicted = []
+        with self._lock:
+            self._total += len(data) - self._index.pop(clip_id, 0)
+            self._index[clip_id] = len(data)
+            while self._total > self.max_bytes and len(self._index) > 1:
+                old_id, size = self._index.popitem(last=False)
+                self._total -= size
+                evicted.append(old_id)
+            self.evictions += len(evicted)
+        for old_id in evicted:
+            try:
+                os.remove(self.path(old_id))
+            except FileNotFoundError:
+                pass
+        return path
+
+    def read(self, clip_id: str) -> bytes:
+        """
+        Bytes of a cached clip.
+
+        Raises:
+            FileNotFoundError: the clip is not (or no longer) cached.
+        """
+        path = self.get(clip_id)
+        if path is None:
+            raise FileNotFoundError(clip_id)
+        with open(path, "rb") as f:
+            return f.read()
+
+    def get_or_create(self, text: str, lang: str = "en", tld: str = "com", slow: bool = False) -> str:
+        """
+        Returns the clip id for `text`, synthesizing it only on a cache miss.
+        Blocking (gTTS makes a network call); run it off the event loop.
+        """
+        clip_id = audio_id(text, lang, tld, slow)
+        if self.get(clip_id) is not None:
+            self.hits += 1
+            return clip_id
+        self.misses += 1
+        self.put(clip_id, synthesize_mp3(text, lang=lang, tld=tld, slow=slow))
+        return clip_id
+
+    def stats(self) -> dict:
+        with self._lock:
+            clips = len(self._index) if self._index is not None else None
+            total = self._total
+        return {
+            "clips": clips,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+audio_cache = AudioCache()
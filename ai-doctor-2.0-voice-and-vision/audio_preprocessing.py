@@ -0,0 +1,175 @@
+"""
+Recording cleanup before speech-to-text.
+
+Uploads are decoded with pydub, downmixed to 16 kHz mono and passed
+through a NumPy energy-based voice activity detector: leading and trailing
+silence is dropped and long pauses are shortened. What is left is
+re-encoded compactly, so Whisper receives fewer bytes and fewer billed
+seconds. Recordings longer than STT_CHUNK_SECONDS are cut at pauses into
+chunks that are transcribed in parallel and joined back in order.
+
+If a recording cannot be decoded (for instance ffmpeg is not installed for
+a compressed format) it is sent unchanged.
+
+    STT_PREPROCESS      1 to clean up recordings before transcription (default 1)
+    STT_SAMPLE_RATE     sample rate sent to Whisper (default 16000)
+    STT_AUDIO_FORMAT    flac, ogg (Opus) or wav (default flac)
+    STT_CHUNK_SECONDS   longest chunk sent in one request (default 60)
+    STT_CONCURRENCY     chunks transcribed in parallel per recording (default 4)
+"""
+
+import logging
+import os
+from io import BytesIO
+from typing import List, Tuple
+
+import numpy as np
+from pydub import AudioSegment
+
+STT_PREPROCESS = os.getenv("STT_PREPROCESS", "1") == "1"
+STT_SAMPLE_RATE = int(os.getenv("STT_SAMPLE_RATE", "16000"))
+STT_AUDIO_FORMAT = os.getenv("STT_AUDIO_FORMAT", "flac").lower()
+STT_CHUNK_SECONDS = float(os.getenv("STT_CHUNK_SECONDS", "60"))
+STT_CONCURRENCY = int(os.getenv("STT_CONCURRENCY", "4"))
+
+FRAME_MS = 30
+# A frame is speech when it is this far above the noise floor (10th percentile level)
+# or within 20 dB of the loudest frame, whichever is lower, and always louder than the floor
+VAD_MARGIN_DB = 12
+VAD_FLOOR_DBFS = -50
+# Kept around detected speech so word onsets and endings are not clipped
+SPEECH_PAD_MS = 200
+# Longer pauses inside the recording are shortened to this
+MAX_PAUSE_MS = 400
+
+EXPORT_OPTIONS = {
+    "flac": {},
+    "ogg": {"codec": "libopus", "bitrate": "24k"},
+    "wav": {},
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_levels(samples: np.ndarray, frame: int) -> np.ndarray:
+    """RMS level of each frame in dBFS"""
+    count = -(-len(samples) // frame)
+    frames = np.zeros(count * frame, dtype=np.float32)
+    frames[:len(samples)] = samples
+    rms = np.sqrt(np.mean(frames.reshape(count, frame) ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def speech_spans(samples: np.ndarray, rate: int) -> List[Tuple[int, int]]:
+    """
+    (start, end) sample ranges worth transcribing: detected speech plus
+    padding, with the pauses between them shortened to MAX_PAUSE_MS.
+    Empty when the recording is silent.
+    """
+    frame = rate * FRAME_MS // 1000
+    if len(samples) < frame:
+        return []
+    levels = _frame_levels(samples, frame)
+    threshold = max(min(np.percentile(levels, 10) + VAD_MARGIN_DB, levels.max() - 20), VAD_FLOOR_DBFS)
+    voiced = levels > threshold
+    if not voiced.any():
+        return []
+
+    pad = SPEECH_PAD_MS // FRAME_MS
+    voiced = np.convolve(voiced, np.ones(2 * pad + 1), mode="same") > 0
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.astype(np.int8), [0]))))
+    spans = [[start * frame, min(end * frame, len(samples))] for start, end in zip(edges[0::2], edges[1::2])]
+
+    # Keep part of each pause, split between the speech on either side of it
+    keep = rate * MAX_PAUSE_MS // 1000
+    for previous, following in zip(spans, spans[1:]):
+        gap = following[0] - previous[1]
+        kept = min(gap, keep)
+        previous[1] += kept // 2
+        following[0] -= kept - kept // 2
+    return [(start, end) for start, end in spans]
+
+
+def _split_long(span: Tuple[int, int], limit: int, levels: np.ndarray, frame: int) -> List[Tuple[int, int]]:
+    """Cuts a span longer than `limit` at its quietest frame in the second half of each window"""
+    start, end = span
+    pieces = []
+    while end - start > limit:
+        first, last = (start + limit // 2) // frame, (start + limit) // frame
+        cut = (first + int(np.argmin(levels[first:last]))) * frame
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+
+def chunk_spans(spans: List[Tuple[int, int]], limit: int, levels: np.ndarray, frame: int) -> List[List[Tuple[int, int]]]:
+    """Groups consecutive spans into chunks of at most `limit` samples, cutting between spans where possible"""
+    chunks, current, size = [], [], 0
+    for span in spans:
+        for piece in _split_long(span, limit, levels, frame):
+            length = piece[1] - piece[0]
+            if current and size + length > limit:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(piece)
+            size += length
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _encode(pcm: np.ndarray, rate: int, audio_format: str) -> Tuple[str, bytes]:
+    segment = AudioSegment(pcm.tobytes(), sample_width=2, frame_rate=rate, channels=1)
+    out = BytesIO()
+    try:
+        segment.export(out, format=audio_format, **EXPORT_OPTIONS.get(audio_format, {}))
+    except Exception:
+        # flac and ogg need ffmpeg; wav is written by pydub itself
+        if audio_format == "wav":
+            raise
+        logger.warning("Could not encode %s for transcription; sending wav", audio_format)
+        out = BytesIO()
+        segment.export(out, format="wav")
+        audio_format = "wav"
+    return audio_format, out.getvalue()
+
+
+def prepare_for_stt(audio: Tuple[str, bytes], audio_format: str = STT_AUDIO_FORMAT,
+                    rate: int = STT_SAMPLE_RATE, chunk_seconds: float = STT_CHUNK_SECONDS) -> List[Tuple[str, bytes]]:
+    """
+    Turns an uploaded (filename, bytes) recording into the (filename, bytes)
+    chunks to transcribe, in order. Returns [] when it holds no speech, and
+    the upload unchanged when it cannot be decoded. CPU-bound; run it off
+    the event loop.
+    """
+    filename, data = audio
+    stem, extension = os.path.splitext(filename)
+    try:
+        segment = AudioSegment.from_file(BytesIO(data), format=extension.lstrip(".").lower() or None)
+    except Exception as e:
+        logger.warning("Could not decode %s for preprocessing (%s); sending it unchanged", filename, e)
+        return [audio]
+
+    segment = segment.set_channels(1).set_frame_rate(rate).set_sample_width(2)
+    pcm = np.frombuffer(segment.raw_data, dtype=np.int16)
+    samples = pcm.astype(np.float32) / 32768
+    spans = speech_spans(samples, rate)
+    if not spans:
+        logger.info("No speech detected in %s", filename)
+        return []
+
+    frame = rate * FRAME_MS // 1000
+    chunks = chunk_spans(spans, int(chunk_seconds * rate), _frame_levels(samples, frame), frame)
+    prepared = []
+    for index, chunk in enumerate(chunks):
+        chunk_format, encoded = _encode(np.concatenate([pcm[start:end] for start, end in chunk]), rate, audio_format)
+        prepared.append((f"{stem or 'audio'}.{index}.{chunk_format}", encoded))
+
+    kept = sum(end - start for start, end in spans) / rate
+    logger.info(
+        "Prepared %s for transcription: %.1fs -> %.1fs in %d chunk(s), %d KB -> %d KB",
+        filename, len(pcm) / rate, kept, len(prepared), len(data) // 1024,
+        sum(len(encoded) for _, encoded in prepared) // 1024
+    )
+    return prepared
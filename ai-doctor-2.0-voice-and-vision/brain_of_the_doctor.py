@@ -9,13 +9,63 @@ GROQ_API_KEY=os.environ.get("GROQ_API_KEY")
 
 #Step2: Convert image to required format
 import base64
+from io import BytesIO
+from PIL import Image, ImageOps
 
+# The vision model gains nothing from more pixels than this on the long side
+VISION_MAX_SIDE=int(os.environ.get("VISION_MAX_SIDE", "1120"))
+# JPEG or WEBP
+VISION_IMAGE_FORMAT=os.environ.get("VISION_IMAGE_FORMAT", "JPEG").upper()
+VISION_IMAGE_QUALITY=int(os.environ.get("VISION_IMAGE_QUALITY", "85"))
+
+MIME_TYPES={"JPEG": "image/jpeg", "WEBP": "image/webp"}
 
 #image_path="acne.jpg"
 
+def prepare_image(data, image_format=None, max_side=None):
+    """
+    Decodes an uploaded image from memory, applies its EXIF orientation,
+    downsizes it to max_side and re-encodes it compactly.
+
+    Returns (base64 string, mime type). The original bytes are kept when they
+    are already in the target format, small enough, upright and smaller than
+    the re-encode.
+    Raises PIL.UnidentifiedImageError for data that is not an image.
+    """
+    image_format=(image_format or VISION_IMAGE_FORMAT).upper()
+    max_side=max_side or VISION_MAX_SIDE
+
+    image=Image.open(BytesIO(data))
+    source_format=image.format
+    # JPEG can decode straight at a reduced scale, which is much faster than a full decode + resize
+    image.draft("RGB", (max_side, max_side))
+    rotated=image.getexif().get(0x0112, 1) not in (0, 1)
+    image=ImageOps.exif_transpose(image)
+
+    resized=max(image.size) > max_side
+    if resized:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    if image_format == "JPEG" and image.mode != "RGB":
+        # JPEG has no alpha channel: flatten transparent areas onto white
+        rgba=image.convert("RGBA")
+        image=Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode not in ("RGB", "RGBA"):
+        image=image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+    output=BytesIO()
+    image.save(output, format=image_format, quality=VISION_IMAGE_QUALITY, optimize=True)
+    encoded=output.getvalue()
+
+    if not resized and not rotated and source_format == image_format and len(data) <= len(encoded):
+        encoded=data
+    return base64.b64encode(encoded).decode('utf-8'), MIME_TYPES[image_format]
+
 def encode_image(image_path):   
-    image_file=open(image_path, "rb")
-    return base64.b64encode(image_file.read()).decode('utf-8')
+    with open(image_path, "rb") as image_file:
+        encoded_image, _=prepare_image(image_file.read(), image_format="JPEG")
+    return encoded_image
 
 #Step3: Setup Multimodal LLM 
 from groq import Groq
@@ -26,9 +76,8 @@ model="meta-llama/llama-4-scout-17b-16e-instruct"
 #model = "meta-llama/llama-4-scout-17b-16e-instruct"
 #model="llama-3.2-90b-vision-preview" #Deprecated
 
-def analyze_image_with_query(query, model, encoded_image):
-    client=Groq()  
-    messages=[
+def build_image_messages(query, encoded_image, mime_type="image/jpeg"):
+    return [
         {
             "role": "user",
             "content": [
@@ -39,14 +88,44 @@ def analyze_image_with_query(query, model, encoded_image):
                 {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{encoded_image}",
+                        "url": f"data:{mime_type};base64,{encoded_image}",
                     },
                 },
             ],
         }]
-    chat_completion=client.chat.completions.create(
-        messages=messages,
+
+_sync_client=None
+
+def analyze_image_with_query(query, model, encoded_image):
+    # One client per process, so repeated calls reuse its connection pool
+    global _sync_client
+    if _sync_client is None:
+        _sync_client=Groq()
+    chat_completion=_sync_client.chat.completions.create(
+        messages=build_image_messages(query, encoded_image),
         model=model
     )
 
     return chat_completion.choices[0].message.content
+
+async def analyze_image_with_query_async(query, model, encoded_image, client, mime_type="image/jpeg"):
+    """Same as analyze_image_with_query, on the shared AsyncGroq client"""
+    chat_completion=await client.chat.completions.create(
+        messages=build_image_messages(query, encoded_image, mime_type),
+        model=model
+    )
+
+    return chat_completion.choices[0].message.content
+
+async def stream_image_analysis(query, model, encoded_image, client, mime_type="image/jpeg"):
+    """Same as analyze_image_with_query_async, yielding the answer as it is generated"""
+    stream=await client.chat.completions.create(
+        messages=build_image_messages(query, encoded_image, mime_type),
+        model=model,
+        stream=True
+    )
+    # Closes the connection if the consumer stops early (e.g. a losing hedged request)
+    async with stream:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
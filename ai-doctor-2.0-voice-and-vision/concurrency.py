@@ -0,0 +1,190 @@
+"""
+Keeps the AI Doctor event loop responsive under load.
+
+- run_blocking() moves blocking work (gTTS, file I/O, base64 encoding) onto a
+  bounded thread pool, so a slow call never stalls /health or other requests.
+- AdmissionController caps how many expensive requests run at once and how
+  many may wait. When the wait queue is full, new requests get 429 with a
+  Retry-After estimate. Requests that wait longer than the queue timeout get
+  503, so clients back off instead of piling up.
+
+Tunable through the environment:
+
+    BLOCKING_WORKERS        threads for blocking work (default 8)
+    MAX_CONCURRENT_REQUESTS expensive requests served at once (default 16)
+    MAX_QUEUED_REQUESTS     requests allowed to wait for a slot (default 32)
+    QUEUE_TIMEOUT           seconds a request may wait before a 503 (default 10)
+"""
+
+import asyncio
+import functools
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "8"))
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "16"))
+MAX_QUEUED_REQUESTS = int(os.getenv("MAX_QUEUED_REQUESTS", "32"))
+QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", "10"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="ai-doctor-blocking")
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs a blocking callable on the bounded pool and awaits its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded wait queue.
+
+    Service time is tracked as an exponentially weighted moving average so
+    Retry-After reflects how long the current backlog should take to drain.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_REQUESTS, max_queued=MAX_QUEUED_REQUESTS,
+                 queue_timeout=QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.avg_service_time = 1.0
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    def retry_after(self) -> int:
+        backlog = self.queued + self.in_flight
+        return max(1, math.ceil(backlog / self.max_concurrent * self.avg_service_time))
+
+    async def acquire(self) -> None:
+        # Waiters are counted before the first await, so simultaneous arrivals see each other
+        if self.in_flight + self.queued >= self.max_concurrent + self.max_queued:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests in progress, please retry shortly",
+                headers={"Retry-After": str(self.retry_after())},
+            )
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Service is busy, please retry shortly",
+                headers={"Retry-After": str(self.retry_after())},
+            )
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+
+    def release(self, service_time: float) -> None:
+        self.in_flight -= 1
+        self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * service_time
+        self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_service_time_s": round(self.avg_service_time, 3),
+        }
+
+
+admission = AdmissionController()
+
+
+async def admit():
+    """FastAPI dependency: holds an admission slot for the duration of the request"""
+    await admission.acquire()
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        admission.release(time.monotonic() - start)
+
+
+class StreamSlot:
+    """
+    Admission slot held by a streamed response, whose body outlives the
+    endpoint. Released exactly once: by the response when sending ends
+    (however it ends), or by admit_stream() when no response took it over,
+    e.g. on a validation error or an exception in the endpoint.
+    """
+
+    def __init__(self):
+        self._start = time.monotonic()
+        self._released = False
+        self.handed_off = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            admission.release(time.monotonic() - self._start)
+
+    async def guard(self, body: AsyncIterator) -> AsyncIterator:
+        """Passes body through and frees the slot as soon as it ends, fails or is closed"""
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            self.release()
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """StreamingResponse that owns a StreamSlot and frees it once the response is over"""
+
+    def __init__(self, content: AsyncIterator, slot: StreamSlot, **kwargs):
+        super().__init__(slot.guard(content), **kwargs)
+        slot.handed_off = True
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        # Also covers a body that was never started (client gone before the first chunk)
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.slot.release()
+
+
+async def admit_stream():
+    """
+    FastAPI dependency for streamed responses: yields a StreamSlot to pass
+    to SlotStreamingResponse. If the request never gets that far, the slot
+    is freed here.
+    """
+    await admission.acquire()
+    slot = StreamSlot()
+    try:
+        yield slot
+    finally:
+        if not slot.handed_off:
+            slot.release()
@@ -0,0 +1,197 @@
+"""
+Per-session conversation memory for /chat.
+
+Each session keeps its recent turns verbatim plus one running summary of
+everything older. When the turns outgrow the session's token budget, the
+oldest ones are folded into the summary (one LLM call) and dropped, so the
+history sent with each request stays bounded no matter how long the chat
+runs. The summary is reused on every later request until the next overflow.
+
+Session ids are chosen by clients, so the service only honours them for
+callers holding AI_DOCTOR_SERVICE_TOKEN (the website backend), which name
+the authenticated user a session belongs to; see session_key().
+
+Sessions expire after SESSION_TTL seconds of inactivity and are evicted in
+least-recently-used order once MAX_SESSIONS or the global token cap is hit:
+
+    SESSION_TTL             idle seconds before a session is dropped (default 1800)
+    MAX_SESSIONS            sessions kept in memory (default 1000)
+    SESSION_TOKEN_BUDGET    history tokens sent per request (default 1500)
+    SESSION_STORE_MAX_TOKENS  history tokens held across all sessions (default 2000000)
+    AI_DOCTOR_SERVICE_TOKEN   shared secret of callers allowed to use sessions (unset: sessions disabled)
+"""
+
+import asyncio
+import hmac
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List
+
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "1000"))
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "1500"))
+SESSION_STORE_MAX_TOKENS = int(os.getenv("SESSION_STORE_MAX_TOKENS", "2000000"))
+SERVICE_TOKEN = os.getenv("AI_DOCTOR_SERVICE_TOKEN", "")
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def session_key(session_id: str, owner: str, service_token: str) -> str:
+    """
+    Store key for a client's session id, scoped to the user the caller
+    vouches for. Raises PermissionError unless the caller presented the
+    service token and named an owner.
+    """
+    if not (SERVICE_TOKEN and service_token and hmac.compare_digest(service_token, SERVICE_TOKEN)):
+        raise PermissionError("Chat sessions are only available through the authenticated website backend")
+    if not owner:
+        raise PermissionError("Chat sessions need the user they belong to")
+    return f"{owner}:{session_id}"
+
+
+@dataclass
+class Turn:
+    role: str
+    content: str
+    tokens: int
+
+
+@dataclass
+class Session:
+    session_id: str
+    summary: str = ""
+    summary_tokens: int = 0
+    turns: List[Turn] = field(default_factory=list)
+    last_used: float = field(default_factory=time.monotonic)
+    # Serializes requests within a session so turns stay in order
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def tokens(self) -> int:
+        return self.summary_tokens + sum(turn.tokens for turn in self.turns)
+
+    def messages(self, system_content: str, prompt: str) -> list:
+        """Chat messages: system prompt, summary of older turns, recent turns, then the new prompt"""
+        messages = [{"role": "system", "content": system_content}]
+        if self.summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation with this patient: {self.summary}"
+            })
+        messages.extend({"role": turn.role, "content": turn.content} for turn in self.turns)
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+
+Summarizer = Callable[[str, List[Turn]], Awaitable[str]]
+
+
+class ConversationStore:
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS, token_budget=SESSION_TOKEN_BUDGET,
+                 max_total_tokens=SESSION_STORE_MAX_TOKENS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.token_budget = token_budget
+        self.max_total_tokens = max_total_tokens
+        self.summaries = 0
+        self.evictions = 0
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._total_tokens = 0
+
+    def get(self, session_id: str) -> Session:
+        """Returns the session, creating it if needed, and marks it most recently used"""
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = Session(session_id)
+            self._sessions[session_id] = session
+            self._evict()
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_used = time.monotonic()
+        return session
+
+    def record(self, session: Session, user_message: str, reply: str) -> None:
+        """Appends one exchange to the session"""
+        before = session.tokens
+        session.turns.append(Turn("user", user_message, estimate_tokens(user_message)))
+        session.turns.append(Turn("assistant", reply, estimate_tokens(reply)))
+        session.last_used = time.monotonic()
+        if self._sessions.get(session.session_id) is session:
+            self._sessions.move_to_end(session.session_id)
+        self._account(session, session.tokens - before)
+        self._evict()
+
+    async def compact(self, session: Session, summarize: Summarizer) -> None:
+        """
+        Folds the oldest turns into the summary once the session is over budget.
+
+        Recent turns are kept verbatim up to half the budget, so a compaction
+        buys room for several more exchanges before the next one. If the
+        summarizer fails, the oldest turns are dropped instead.
+        """
+        if session.tokens <= self.token_budget:
+            return
+        keep_from = len(session.turns)
+        kept = 0
+        while keep_from > 0 and kept + session.turns[keep_from - 1].tokens <= self.token_budget // 2:
+            keep_from -= 1
+            kept += session.turns[keep_from].tokens
+        # Keep whole exchanges so the history never starts with an assistant turn
+        if keep_from % 2:
+            keep_from += 1
+        old_turns = session.turns[:keep_from]
+        if not old_turns:
+            return
+
+        before = session.tokens
+        try:
+            summary = await summarize(session.summary, old_turns)
+        except Exception as e:
+            logger.warning("Summarizing session %s failed, dropping old turns: %s", session.session_id, e)
+        else:
+            session.summary = summary
+            session.summary_tokens = estimate_tokens(summary)
+            self.summaries += 1
+        session.turns = session.turns[keep_from:]
+        self._account(session, session.tokens - before)
+
+    def _account(self, session: Session, delta: int) -> None:
+        # A session evicted while a request was using it no longer counts
+        if self._sessions.get(session.session_id) is session:
+            self._total_tokens += delta
+
+    def _remove(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id)
+        self._total_tokens -= session.tokens
+        self.evictions += 1
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used > cutoff:
+                break
+            self._remove(session_id)
+
+    def _evict(self) -> None:
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._total_tokens > self.max_total_tokens
+        ):
+            self._remove(next(iter(self._sessions)))
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "tokens": self._total_tokens,
+            "summaries": self.summaries,
+            "evictions": self.evictions,
+        }
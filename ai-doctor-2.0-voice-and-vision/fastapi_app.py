@@ -5,12 +5,16 @@ Provides endpoints for AI-powered medical image analysis and voice processing
 """
 
 import os
-import base64
-import tempfile
-from typing import Optional
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+import json
+import hashlib
+import time
+import asyncio
+import logging
+from contextlib import aclosing, asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 from dotenv import load_dotenv
@@ -19,17 +23,55 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import our custom modules
-from brain_of_the_doctor import encode_image, analyze_image_with_query
-from voice_of_the_patient import transcribe_with_groq
-from voice_of_the_doctor import text_to_speech_with_gtts
+import groq_client
+from concurrency import SlotStreamingResponse, StreamSlot, admission, admit, admit_stream, run_blocking, shutdown_executor
+from conversation_store import ConversationStore, Session, Turn, estimate_tokens, session_key
+from model_router import model_router
+from response_cache import ResponseCache, normalize_query
+from single_flight import SingleFlight
+from uploads import BodySizeLimitMiddleware, MAX_AUDIO_BYTES, MAX_IMAGE_BYTES, read_upload
+from PIL import Image, UnidentifiedImageError
+from brain_of_the_doctor import prepare_image, analyze_image_with_query_async, stream_image_analysis
+from voice_of_the_patient import transcribe_with_groq_async
+from audio_cache import AUDIO_ID, audio_cache, audio_id
+from speech_pipeline import SentenceSplitter, SpeechPipeline, split_sentences
+from stages import StageTimer, gather_stages
+
+ASSISTANT_SYSTEM_PROMPT = "You are a helpful AI medical assistant that provides general health information and guidance."
+EMPATHETIC_SYSTEM_PROMPT = ASSISTANT_SYSTEM_PROMPT + " Always be empathetic and supportive."
+SUMMARY_SYSTEM_PROMPT = "You summarize conversations between a patient and an AI medical assistant for the assistant's own memory."
+SUMMARY_MAX_TOKENS = 200
+
+logger = logging.getLogger(__name__)
+
+# Per-session chat history, keyed by the authenticated user and the session_id they send to /chat
+conversations = ConversationStore()
+# Answers to single-turn text queries
+response_cache = ResponseCache()
+# Identical upstream calls in flight at the same time share one request
+llm_flights = SingleFlight()
+vision_flights = SingleFlight()
+tts_flights = SingleFlight()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared Groq client on startup; close it and the blocking-work pool on shutdown"""
+    await groq_client.startup()
+    yield
+    await groq_client.shutdown()
+    shutdown_executor()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="AI Doctor Service",
     description="AI-powered medical image analysis and voice processing",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Refuse oversized uploads while they stream in
+app.add_middleware(BodySizeLimitMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -60,6 +102,437 @@ class CombinedResponse(BaseModel):
     transcription: str
     analysis: str
     audio_response: Optional[str] = None
+    timings: Optional[dict] = None
+
+def get_groq():
+    """Shared AsyncGroq client, or a 500 when GROQ_API_KEY is missing"""
+    try:
+        return groq_client.get_client()
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def medical_prompt(query: str, empathetic: bool = False) -> str:
+    """User prompt shared by the text and chat endpoints"""
+    empathy = "\n        - Be empathetic and supportive in your responses" if empathetic else ""
+    return f"""You are a professional AI medical assistant. Please provide helpful, accurate medical information about the following query: "{query}"
+
+        Guidelines:
+        - Provide clear, concise medical information
+        - Include general symptoms, causes, and treatment options when appropriate
+        - Always recommend consulting a healthcare professional for proper diagnosis
+        - Keep responses informative but not overly technical
+        - Focus on general health information and common conditions
+        - Do not provide specific medical diagnoses or prescriptions{empathy}
+        
+        Query: {query}
+        
+        Please provide a helpful response:"""
+
+def chat_messages(system_content: str, prompt: str) -> list:
+    """Messages for a single-turn request"""
+    return [
+        {
+            "role": "system",
+            "content": system_content
+        },
+        {
+            "role": "user", 
+            "content": prompt
+        }
+    ]
+
+def text_request(messages: list, model: str) -> dict:
+    """Chat-completion arguments for a text-tier model"""
+    return dict(
+        model=model,
+        messages=messages,
+        temperature=0.7,
+        max_tokens=500
+    )
+
+def prompt_tokens(messages: list) -> int:
+    """Rough prompt size, which the model router uses to spot simple requests"""
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+async def complete_messages(messages: list) -> tuple:
+    """Text completion routed across the text tier; returns (answer, model used)"""
+    client = get_groq()
+
+    async def request(model: str) -> str:
+        response = await client.chat.completions.create(**text_request(messages, model))
+        return response.choices[0].message.content
+
+    return await model_router.call("text", request, prompt_tokens(messages))
+
+async def complete_text(system_content: str, prompt: str) -> tuple:
+    """Single-turn text completion; returns (answer, model used)"""
+    return await complete_messages(chat_messages(system_content, prompt))
+
+def cache_namespace(system_content: str, empathetic: bool) -> str:
+    """Everything besides the query that shapes an answer: model tier, prompts and sampling parameters"""
+    models = ",".join(model_router.tiers["text"].models)
+    return json.dumps(
+        text_request(chat_messages(system_content, medical_prompt("{query}", empathetic)), models),
+        sort_keys=True
+    )
+
+def cache_bypass(cache_control: Optional[str] = Header(None)) -> bool:
+    """Clients skip the response cache with `Cache-Control: no-cache`"""
+    return bool(cache_control) and "no-cache" in cache_control.lower()
+
+def chat_session(session_id: Optional[str] = Form(None), x_session_owner: Optional[str] = Header(None),
+                 x_service_token: Optional[str] = Header(None)) -> Optional[Session]:
+    """
+    The conversation a /chat request continues, or None for a single-turn
+    request. A bare session_id proves nothing, so it is only honoured for the
+    website backend (X-Service-Token) on behalf of the user in X-Session-Owner.
+    """
+    if not session_id:
+        return None
+    try:
+        key = session_key(session_id, x_session_owner, x_service_token)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    return conversations.get(key)
+
+async def cached_text(system_content: str, query: str, empathetic: bool, bypass: bool, response: Response) -> tuple:
+    """
+    complete_text() behind the response cache, returning (answer, model that
+    wrote it); the X-Cache header reports exact, semantic, miss or bypass.
+    Concurrent misses for the same query share one completion; a bypass
+    always gets a completion of its own.
+    """
+    namespace = cache_namespace(system_content, empathetic)
+    if bypass:
+        response_cache.bypass()
+        tier = "bypass"
+    else:
+        cached, tier = await response_cache.lookup(namespace, query)
+        if cached is not None:
+            response.headers["X-Cache"] = tier
+            return cached
+
+    async def complete() -> tuple:
+        answer, model = await complete_text(system_content, medical_prompt(query, empathetic))
+        await response_cache.store(namespace, query, (answer, model))
+        return answer, model
+
+    if bypass:
+        answer, model = await complete()
+    else:
+        answer, model = await llm_flights.do(response_cache.key(namespace, query), complete)
+    response.headers["X-Cache"] = tier
+    return answer, model
+
+async def summarize_turns(summary: str, turns: List[Turn]) -> str:
+    """Folds older chat turns into the session's running summary"""
+    transcript = "\n".join(f"{turn.role.capitalize()}: {turn.content}" for turn in turns)
+    previous = f"Summary so far: {summary}\n\n" if summary else ""
+    prompt = f"""{previous}Conversation to add:
+{transcript}
+
+Write an updated summary in at most 120 words. Keep symptoms, their duration, medications, allergies, relevant history and advice already given. Leave out pleasantries."""
+    messages = chat_messages(SUMMARY_SYSTEM_PROMPT, prompt)
+    client = get_groq()
+
+    async def request(model: str) -> str:
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.2,
+            max_tokens=SUMMARY_MAX_TOKENS
+        )
+        return response.choices[0].message.content
+
+    summary, _ = await model_router.call("text", request, prompt_tokens(messages))
+    return summary
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def completion_chunks(client, messages: list, model: str) -> AsyncIterator:
+    """Chunks of a streamed completion that carry content or usage"""
+    stream = await client.chat.completions.create(**text_request(messages, model), stream=True)
+    async with stream:
+        async for chunk in stream:
+            has_content = chunk.choices and chunk.choices[0].delta.content
+            if has_content or chunk.usage or (chunk.x_groq and chunk.x_groq.usage):
+                yield chunk
+
+async def stream_text(client, messages: list, on_done: Optional[Callable[[str, str], Awaitable[None]]] = None) -> AsyncIterator[str]:
+    """
+    Streams a completion, routed across the text tier, as Server-Sent Events;
+    on_done receives the full text and model of a completion that finished
+    without error.
+
+        event: token   data: {"text": "..."}        one per content delta
+        event: done    data: {"model", "usage", "time_to_first_token_ms", "total_ms"}
+        event: error   data: {"detail": "..."}      instead of done if the call fails
+    """
+    start = time.perf_counter()
+    first_token_ms = None
+    usage = None
+    parts = []
+    try:
+        chunks, model = await model_router.stream(
+            "text", lambda model: completion_chunks(client, messages, model), prompt_tokens(messages)
+        )
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_token_ms is None:
+                        first_token_ms = round((time.perf_counter() - start) * 1000, 1)
+                    parts.append(chunk.choices[0].delta.content)
+                    yield sse_event("token", {"text": chunk.choices[0].delta.content})
+                # Groq reports usage on the last chunk, under x_groq
+                chunk_usage = chunk.usage or (chunk.x_groq.usage if chunk.x_groq else None)
+                if chunk_usage is not None:
+                    usage = chunk_usage.model_dump()
+    except Exception as e:
+        yield sse_event("error", {"detail": f"Error generating response: {str(e)}"})
+        return
+    if on_done is not None:
+        await on_done("".join(parts), model)
+    yield sse_event("done", {
+        "model": model,
+        "usage": usage,
+        "time_to_first_token_ms": first_token_ms,
+        "total_ms": round((time.perf_counter() - start) * 1000, 1)
+    })
+
+async def stream_cached(answer: str, model: str, tier: str) -> AsyncIterator[str]:
+    """Replays a cached answer in the same event format as stream_text"""
+    yield sse_event("token", {"text": answer})
+    yield sse_event("done", {"model": model, "usage": None, "cache": tier})
+
+async def stream_text_cached(client, system_content: str, query: str, empathetic: bool,
+                             bypass: bool) -> AsyncIterator[str]:
+    """
+    stream_text() behind the response cache; a completed stream is stored for
+    later requests, and concurrent identical ones share a single stream
+    unless they bypass the cache
+    """
+    namespace = cache_namespace(system_content, empathetic)
+    if bypass:
+        response_cache.bypass()
+    else:
+        cached, tier = await response_cache.lookup(namespace, query)
+        if cached is not None:
+            async for event in stream_cached(*cached, tier):
+                yield event
+            return
+
+    async def store(answer: str, model: str) -> None:
+        await response_cache.store(namespace, query, (answer, model))
+
+    messages = chat_messages(system_content, medical_prompt(query, empathetic))
+    if bypass:
+        events = stream_text(client, messages, store)
+    else:
+        events = llm_flights.stream(
+            f"stream:{response_cache.key(namespace, query)}", lambda: stream_text(client, messages, store)
+        )
+    async for event in events:
+        yield event
+
+def stream_completion(slot: StreamSlot, events: Callable[..., AsyncIterator[str]]) -> StreamingResponse:
+    """
+    SSE response for events(client); the admission slot is held until the
+    last event is sent
+    """
+    return SlotStreamingResponse(
+        events(get_groq()),
+        slot,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def read_audio(file: UploadFile) -> tuple:
+    """Reads an uploaded recording into the (filename, bytes) tuple the Groq SDK accepts"""
+    return file.filename or "audio.mp3", await read_upload(file, MAX_AUDIO_BYTES, "Audio file")
+
+async def read_image(file: UploadFile) -> tuple:
+    """
+    Normalizes an uploaded image in memory (orientation, size, compact
+    re-encode) on the bounded pool; returns (base64 image, mime type)
+    """
+    return await decode_image(await read_upload(file, MAX_IMAGE_BYTES, "Image file"))
+
+async def decode_image(content: bytes) -> tuple:
+    """prepare_image() on the bounded pool; an undecodable image is a 400"""
+    try:
+        return await run_blocking(prepare_image, content)
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise HTTPException(status_code=400, detail="Could not decode the image")
+
+async def read_combined_inputs(image_file: UploadFile, audio_file: UploadFile) -> tuple:
+    """
+    Validates and reads the raw image and recording of a combined request;
+    the image is prepared later, alongside transcription
+    """
+    if not image_file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="Image file must be an image")
+    if not audio_file.content_type.startswith('audio/'):
+        raise HTTPException(status_code=400, detail="Audio file must be an audio file")
+    image = await read_upload(image_file, MAX_IMAGE_BYTES, "Image file")
+    return image, await read_audio(audio_file)
+
+def start_combined_stages(client, image: bytes, audio: tuple, timer: StageTimer) -> tuple:
+    """
+    Starts image preparation and speech-to-text side by side; neither needs
+    the other, so vision can begin after max(STT, image prep) rather than
+    their sum. Returns the (image, transcription) tasks.
+    """
+    image_task = asyncio.create_task(timer.run("image_prep", decode_image(image)))
+    transcription_task = asyncio.create_task(timer.run(
+        "speech_to_text", transcribe_with_groq_async(client=client, audio=audio, stt_model="whisper-large-v3")
+    ))
+    return image_task, transcription_task
+
+async def synthesize_clip(text: str) -> str:
+    """
+    Clip id for text from the audio cache, synthesized on the bounded pool on
+    a miss; concurrent requests for the same text share one synthesis
+    """
+    return await tts_flights.do(
+        f"segment:{audio_id(text)}", lambda: run_blocking(audio_cache.get_or_create, text)
+    )
+
+def speech_pipeline() -> SpeechPipeline:
+    return SpeechPipeline(synthesize_clip)
+
+async def synthesize_speech(text: str) -> str:
+    """
+    Speech for text as one clip; returns its filename under /audio/.
+    On a miss the sentences are synthesized concurrently and joined.
+    """
+    clip_id = audio_id(text)
+
+    async def build() -> None:
+        pipeline = speech_pipeline()
+        for sentence in split_sentences(text):
+            pipeline.add(sentence)
+        pipeline.close()
+        try:
+            segment_ids = [segment_id async for _, _, segment_id in pipeline.results()]
+        finally:
+            pipeline.cancel()
+        # MP3 frames concatenate into one playable stream
+        segments = [await run_blocking(audio_cache.read, segment_id) for segment_id in segment_ids]
+        await run_blocking(audio_cache.put, clip_id, b"".join(segments))
+
+    if await run_blocking(audio_cache.get, clip_id) is None:
+        await tts_flights.do(f"clip:{clip_id}", build)
+    return f"{clip_id}.mp3"
+
+async def analyze_image_routed(query: str, model: str, encoded_image: str, mime_type: str, client) -> tuple:
+    """
+    Vision analysis routed across the vision tier, starting with the
+    requested model; returns (analysis, model used). Concurrent requests
+    with the same image, query and model share one call.
+    """
+    key = hashlib.sha256(
+        "\0".join((model, normalize_query(query), mime_type, encoded_image)).encode()
+    ).hexdigest()
+    return await vision_flights.do(key, lambda: model_router.call(
+        "vision",
+        lambda candidate: analyze_image_with_query_async(
+            query=query,
+            model=candidate,
+            encoded_image=encoded_image,
+            client=client,
+            mime_type=mime_type
+        ),
+        preferred=model
+    ))
+
+def audio_segment_event(index: int, text: str, segment_id: str) -> str:
+    return sse_event("audio", {
+        "index": index,
+        "text": text,
+        "audio_file": f"{segment_id}.mp3",
+        "audio_url": f"/audio/{segment_id}.mp3"
+    })
+
+async def stream_combined(client, image: bytes, audio: tuple, query: str, model: str,
+                          timer: StageTimer) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for /analyze-combined/stream:
+
+        event: transcription  data: {"text"}
+        event: token          data: {"text"}      analysis deltas as they are generated
+        event: audio          data: {"index", "text", "audio_file", "audio_url"}   in order
+        event: done           data: {"transcription", "analysis", "model", "audio_files", "timings"}
+        event: error          data: {"detail"}
+
+    The image is prepared while the recording is transcribed, and vision
+    starts as soon as both are ready. Each sentence is sent to TTS as soon
+    as the model finishes it, so the first segment is playable while the
+    rest of the answer is still being generated and synthesized.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    pipeline = speech_pipeline()
+    parts, audio_files = [], []
+    model_used = model
+
+    async def generate(full_query: str, encoded_image: str, mime_type: str) -> None:
+        nonlocal model_used
+        splitter = SentenceSplitter()
+        deltas, model_used = await model_router.stream(
+            "vision",
+            lambda candidate: stream_image_analysis(full_query, candidate, encoded_image, client, mime_type),
+            preferred=model
+        )
+        async with aclosing(deltas):
+            async for delta in deltas:
+                timer.mark("first_token")
+                parts.append(delta)
+                await events.put(sse_event("token", {"text": delta}))
+                for sentence in splitter.feed(delta):
+                    pipeline.add(sentence)
+        for sentence in splitter.flush():
+            pipeline.add(sentence)
+        pipeline.close()
+
+    async def speak() -> None:
+        async for index, text, segment_id in pipeline.results():
+            timer.mark("first_audio")
+            audio_files.append(f"{segment_id}.mp3")
+            await events.put(audio_segment_event(index, text, segment_id))
+
+    image_task, transcription_task = start_combined_stages(client, image, audio, timer)
+    tasks = [image_task, transcription_task]
+    try:
+        transcription = await transcription_task
+        yield sse_event("transcription", {"text": transcription})
+        encoded_image, mime_type = await image_task
+
+        tasks += [
+            asyncio.create_task(timer.run("vision", generate(f"{query} {transcription}", encoded_image, mime_type))),
+            asyncio.create_task(timer.run("text_to_speech", speak()))
+        ]
+        work = asyncio.gather(*tasks[2:])
+        work.add_done_callback(lambda _: events.put_nowait(None))
+        while (event := await events.get()) is not None:
+            yield event
+        await work
+
+        yield sse_event("done", {
+            "transcription": transcription,
+            "analysis": "".join(parts),
+            "model": model_used,
+            "audio_files": audio_files,
+            "timings": timer.report()
+        })
+    except HTTPException as e:
+        yield sse_event("error", {"detail": e.detail})
+    except Exception as e:
+        yield sse_event("error", {"detail": f"Error in combined analysis: {str(e)}"})
+    finally:
+        # A failure in one task (or a client disconnect) must not leave the other running
+        for task in tasks:
+            task.cancel()
+        pipeline.cancel()
 
 # Health check endpoint
 @app.get("/health")
@@ -68,7 +541,32 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "AI Doctor",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "load": admission.stats(),
+        "sessions": conversations.stats(),
+        "audio_cache": audio_cache.stats()
+    }
+
+# Response cache counters
+@app.get("/metrics/cache")
+async def cache_metrics():
+    """Hit rates and sizes of the response cache tiers"""
+    return response_cache.stats()
+
+# Model router latency and error stats
+@app.get("/metrics/models")
+async def model_metrics():
+    """Rolling p50/p95 latency, error rates, hedges and fallbacks per model and tier"""
+    return model_router.stats()
+
+# Request coalescing counters
+@app.get("/metrics/coalescing")
+async def coalescing_metrics():
+    """Upstream calls made and requests that shared an in-flight call, per kind"""
+    return {
+        "llm": llm_flights.stats(),
+        "vision": vision_flights.stats(),
+        "tts": tts_flights.stats()
     }
 
 # Root endpoint
@@ -82,7 +580,7 @@ async def root():
     }
 
 # Image analysis endpoint
-@app.post("/analyze-image", response_model=ImageAnalysisResponse)
+@app.post("/analyze-image", response_model=ImageAnalysisResponse, dependencies=[Depends(admit)])
 async def analyze_image(
     file: UploadFile = File(...),
     query: str = Form(...),
@@ -96,39 +594,26 @@ async def analyze_image(
         if not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}") as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
+        # Decode, orient, downsize and re-encode in memory
+        encoded_image, mime_type = await read_image(file)
         
-        try:
-            # Encode image
-            encoded_image = encode_image(tmp_file_path)
-            
-            # Analyze image
-            analysis = analyze_image_with_query(
-                query=query,
-                model=model,
-                encoded_image=encoded_image
-            )
-            
-            return ImageAnalysisResponse(
-                success=True,
-                analysis=analysis,
-                query=query,
-                model_used=model
-            )
-            
-        finally:
-            # Clean up temporary file
-            os.unlink(tmp_file_path)
+        # Analyze image
+        analysis, model_used = await analyze_image_routed(query, model, encoded_image, mime_type, get_groq())
+        
+        return ImageAnalysisResponse(
+            success=True,
+            analysis=analysis,
+            query=query,
+            model_used=model_used
+        )
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing image: {str(e)}")
 
 # Voice transcription endpoint
-@app.post("/transcribe-audio", response_model=VoiceResponse)
+@app.post("/transcribe-audio", response_model=VoiceResponse, dependencies=[Depends(admit)])
 async def transcribe_audio(file: UploadFile = File(...)):
     """
     Transcribe audio to text using Groq Whisper
@@ -138,251 +623,244 @@ async def transcribe_audio(file: UploadFile = File(...)):
         if not file.content_type.startswith('audio/'):
             raise HTTPException(status_code=400, detail="File must be an audio file")
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}") as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
+        # Transcribe audio straight from memory
+        transcription = await transcribe_with_groq_async(
+            client=get_groq(),
+            audio=await read_audio(file),
+            stt_model="whisper-large-v3"
+        )
         
-        try:
-            # Transcribe audio
-            groq_api_key = os.getenv("GROQ_API_KEY")
-            if not groq_api_key:
-                raise HTTPException(status_code=500, detail="GROQ_API_KEY not configured")
-            
-            transcription = transcribe_with_groq(
-                GROQ_API_KEY=groq_api_key,
-                audio_filepath=tmp_file_path,
-                stt_model="whisper-large-v3"
-            )
-            
-            return VoiceResponse(
-                success=True,
-                transcription=transcription
-            )
-            
-        finally:
-            # Clean up temporary file
-            os.unlink(tmp_file_path)
+        return VoiceResponse(
+            success=True,
+            transcription=transcription
+        )
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error transcribing audio: {str(e)}")
 
 # Combined analysis endpoint (image + voice)
-@app.post("/analyze-combined", response_model=CombinedResponse)
+@app.post("/analyze-combined", response_model=CombinedResponse, dependencies=[Depends(admit)])
 async def analyze_combined(
+    response: Response,
     image_file: UploadFile = File(...),
     audio_file: UploadFile = File(...),
     query: str = Form("What do you see in this image?"),
     model: str = Form("meta-llama/llama-4-scout-17b-16e-instruct")
 ):
     """
-    Combined analysis: transcribe audio and analyze image
+    Combined analysis: transcribe audio and analyze image. Image preparation
+    runs alongside transcription; per-stage timings are returned in
+    `timings` and the Server-Timing header.
     """
+    timer = StageTimer()
     try:
-        # Validate files
-        if not image_file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="Image file must be an image")
-        if not audio_file.content_type.startswith('audio/'):
-            raise HTTPException(status_code=400, detail="Audio file must be an audio file")
+        image, audio = await timer.run("read_uploads", read_combined_inputs(image_file, audio_file))
+        client = get_groq()
         
-        # Save files temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{image_file.filename.split('.')[-1]}") as img_tmp:
-            img_content = await image_file.read()
-            img_tmp.write(img_content)
-            img_tmp_path = img_tmp.name
+        # Prepare the image while the audio is transcribed
+        (encoded_image, mime_type), transcription = await gather_stages(
+            *start_combined_stages(client, image, audio, timer)
+        )
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{audio_file.filename.split('.')[-1]}") as audio_tmp:
-            audio_content = await audio_file.read()
-            audio_tmp.write(audio_content)
-            audio_tmp_path = audio_tmp.name
+        # Analyze image with transcription as query
+        analysis, _ = await timer.run("vision", analyze_image_routed(
+            f"{query} {transcription}", model, encoded_image, mime_type, client
+        ))
         
-        try:
-            # Transcribe audio
-            groq_api_key = os.getenv("GROQ_API_KEY")
-            if not groq_api_key:
-                raise HTTPException(status_code=500, detail="GROQ_API_KEY not configured")
-            
-            transcription = transcribe_with_groq(
-                GROQ_API_KEY=groq_api_key,
-                audio_filepath=audio_tmp_path,
-                stt_model="whisper-large-v3"
-            )
-            
-            # Analyze image with transcription as query
-            encoded_image = encode_image(img_tmp_path)
-            analysis = analyze_image_with_query(
-                query=f"{query} {transcription}",
-                model=model,
-                encoded_image=encoded_image
-            )
-            
-            # Generate audio response
-            audio_response_path = text_to_speech_with_gtts(
-                input_text=analysis,
-                output_filepath="response.mp3"
-            )
-            
-            return CombinedResponse(
-                success=True,
-                transcription=transcription,
-                analysis=analysis,
-                audio_response=audio_response_path if os.path.exists(audio_response_path) else None
-            )
-            
-        finally:
-            # Clean up temporary files
-            os.unlink(img_tmp_path)
-            os.unlink(audio_tmp_path)
+        # Generate audio response
+        audio_response_path = await timer.run("text_to_speech", synthesize_speech(analysis))
+        
+        response.headers["Server-Timing"] = timer.server_timing()
+        return CombinedResponse(
+            success=True,
+            transcription=transcription,
+            analysis=analysis,
+            audio_response=audio_response_path,
+            timings=timer.report()
+        )
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in combined analysis: {str(e)}")
 
+@app.post("/analyze-combined/stream")
+async def analyze_combined_stream(
+    image_file: UploadFile = File(...),
+    audio_file: UploadFile = File(...),
+    query: str = Form("What do you see in this image?"),
+    model: str = Form("meta-llama/llama-4-scout-17b-16e-instruct"),
+    slot: StreamSlot = Depends(admit_stream)
+):
+    """
+    Streaming version of /analyze-combined: analysis tokens and spoken
+    segments are sent as Server-Sent Events while the answer is produced
+    """
+    timer = StageTimer()
+    image, audio = await timer.run("read_uploads", read_combined_inputs(image_file, audio_file))
+    return stream_completion(
+        slot, lambda client: stream_combined(client, image, audio, query, model, timer)
+    )
+
 # Text-to-speech endpoint
-@app.post("/text-to-speech")
+@app.post("/text-to-speech", dependencies=[Depends(admit)])
 async def text_to_speech(text: str = Form(...)):
     """
     Convert text to speech
     """
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Text must not be empty")
     try:
-        audio_file_path = text_to_speech_with_gtts(
-            input_text=text,
-            output_filepath="tts_output.mp3"
-        )
+        audio_file_path = await synthesize_speech(text)
         
-        if os.path.exists(audio_file_path):
-            return {
-                "success": True,
-                "audio_file": audio_file_path,
-                "message": "Text converted to speech successfully"
-            }
-        else:
-            raise HTTPException(status_code=500, detail="Failed to generate audio file")
+        return {
+            "success": True,
+            "audio_file": audio_file_path,
+            "audio_url": f"/audio/{audio_file_path}",
+            "message": "Text converted to speech successfully"
+        }
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error converting text to speech: {str(e)}")
 
+@app.post("/text-to-speech/stream")
+async def text_to_speech_stream(text: str = Form(...), slot: StreamSlot = Depends(admit_stream)):
+    """
+    Convert text to speech as one chunked MP3 stream: sentences are
+    synthesized concurrently and sent in order as each one is ready.
+    If synthesis fails part way, the audio ends after the last good sentence.
+    """
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Text must not be empty")
+
+    async def segments() -> AsyncIterator[bytes]:
+        pipeline = speech_pipeline()
+        for sentence in split_sentences(text):
+            pipeline.add(sentence)
+        pipeline.close()
+        try:
+            async for _, _, segment_id in pipeline.results():
+                yield await run_blocking(audio_cache.read, segment_id)
+        except Exception as e:
+            # The 200 and earlier audio are already sent; end the stream instead of breaking the connection
+            logger.warning("Text-to-speech stream stopped early: %s", e)
+        finally:
+            pipeline.cancel()
+
+    return SlotStreamingResponse(segments(), slot, media_type="audio/mpeg")
+
+# Synthesized speech, served from the audio cache
+@app.get("/audio/{filename}")
+async def get_audio(filename: str, if_none_match: Optional[str] = Header(None)):
+    """
+    Serve a synthesized clip by its content-addressed filename. Clips never
+    change, so the id doubles as a strong ETag; Range requests are supported
+    for seeking and resumable playback.
+    """
+    clip_id = filename[:-4] if filename.endswith(".mp3") else filename
+    path = await run_blocking(audio_cache.get, clip_id) if AUDIO_ID.match(clip_id) else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    
+    etag = f'"{clip_id}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="audio/mpeg", headers=headers)
+
 # Text-only analysis endpoint for chat
-@app.post("/analyze-text")
-async def analyze_text(query: str = Form(...)):
+@app.post("/analyze-text", dependencies=[Depends(admit)])
+async def analyze_text(response: Response, query: str = Form(...), bypass: bool = Depends(cache_bypass)):
     """
     Analyze text-only medical queries using AI
     """
     try:
-        groq_api_key = os.getenv("GROQ_API_KEY")
-        if not groq_api_key:
-            raise HTTPException(status_code=500, detail="GROQ_API_KEY not configured")
-        
-        # Create a medical-focused prompt
-        medical_prompt = f"""You are a professional AI medical assistant. Please provide helpful, accurate medical information about the following query: "{query}"
-
-        Guidelines:
-        - Provide clear, concise medical information
-        - Include general symptoms, causes, and treatment options when appropriate
-        - Always recommend consulting a healthcare professional for proper diagnosis
-        - Keep responses informative but not overly technical
-        - Focus on general health information and common conditions
-        - Do not provide specific medical diagnoses or prescriptions
-        
-        Query: {query}
-        
-        Please provide a helpful response:"""
-        
-        # Use Groq for text analysis
-        from groq import Groq
-        client = Groq(api_key=groq_api_key)
-        
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful AI medical assistant that provides general health information and guidance."
-                },
-                {
-                    "role": "user", 
-                    "content": medical_prompt
-                }
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
-        
-        analysis = response.choices[0].message.content
+        # Use the shared Groq client for text analysis
+        analysis, model_used = await cached_text(ASSISTANT_SYSTEM_PROMPT, query, False, bypass, response)
         
         return {
             "success": True,
             "analysis": analysis,
             "query": query,
-            "model_used": "llama-3.1-8b-instant"
+            "model_used": model_used
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing text: {str(e)}")
 
 # Chat endpoint for general medical queries
-@app.post("/chat")
-async def chat_endpoint(message: str = Form(...), session_id: Optional[str] = Form(None)):
+@app.post("/chat", dependencies=[Depends(admit)])
+async def chat_endpoint(response: Response, message: str = Form(...), session_id: Optional[str] = Form(None),
+                        session: Optional[Session] = Depends(chat_session), bypass: bool = Depends(cache_bypass)):
     """
     General chat endpoint for medical queries
     """
     try:
-        groq_api_key = os.getenv("GROQ_API_KEY")
-        if not groq_api_key:
-            raise HTTPException(status_code=500, detail="GROQ_API_KEY not configured")
-        
-        # Create a medical-focused prompt
-        medical_prompt = f"""You are a professional AI medical assistant. Please provide helpful, accurate medical information about the following query: "{message}"
-
-        Guidelines:
-        - Provide clear, concise medical information
-        - Include general symptoms, causes, and treatment options when appropriate
-        - Always recommend consulting a healthcare professional for proper diagnosis
-        - Keep responses informative but not overly technical
-        - Focus on general health information and common conditions
-        - Do not provide specific medical diagnoses or prescriptions
-        - Be empathetic and supportive in your responses
-        
-        Query: {message}
-        
-        Please provide a helpful response:"""
-        
-        # Use Groq for text analysis
-        from groq import Groq
-        client = Groq(api_key=groq_api_key)
-        
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful AI medical assistant that provides general health information and guidance. Always be empathetic and supportive."
-                },
-                {
-                    "role": "user", 
-                    "content": medical_prompt
-                }
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
-        
-        analysis = response.choices[0].message.content
+        prompt = medical_prompt(message, empathetic=True)
+        if session:
+            # Answer with the session's history (never cached: the answer depends on it);
+            # one request per session at a time keeps turns in order
+            async with session.lock:
+                await conversations.compact(session, summarize_turns)
+                analysis, model_used = await complete_messages(session.messages(EMPATHETIC_SYSTEM_PROMPT, prompt))
+                conversations.record(session, message, analysis)
+        else:
+            # Use the shared Groq client for text analysis
+            analysis, model_used = await cached_text(EMPATHETIC_SYSTEM_PROMPT, message, True, bypass, response)
         
         return {
             "success": True,
             "response": analysis,
             "message": message,
             "session_id": session_id,
-            "model_used": "llama-3.1-8b-instant"
+            "model_used": model_used
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
+# Streaming variants: tokens are forwarded as Server-Sent Events as soon as Groq produces them
+@app.post("/analyze-text/stream")
+async def analyze_text_stream(query: str = Form(...), slot: StreamSlot = Depends(admit_stream),
+                              bypass: bool = Depends(cache_bypass)):
+    """
+    Streaming version of /analyze-text
+    """
+    return stream_completion(
+        slot, lambda client: stream_text_cached(client, ASSISTANT_SYSTEM_PROMPT, query, False, bypass)
+    )
+
+@app.post("/chat/stream")
+async def chat_stream(message: str = Form(...), session: Optional[Session] = Depends(chat_session),
+                      slot: StreamSlot = Depends(admit_stream),
+                      bypass: bool = Depends(cache_bypass)):
+    """
+    Streaming version of /chat
+    """
+    if not session:
+        return stream_completion(
+            slot, lambda client: stream_text_cached(client, EMPATHETIC_SYSTEM_PROMPT, message, True, bypass)
+        )
+    prompt = medical_prompt(message, empathetic=True)
+    return stream_completion(slot, lambda client: stream_session_chat(client, session, message, prompt))
+
+async def stream_session_chat(client, session: Session, message: str, prompt: str) -> AsyncIterator[str]:
+    """Streams a reply with the session's history and records the exchange once it completes"""
+    async with session.lock:
+        await conversations.compact(session, summarize_turns)
+        messages = session.messages(EMPATHETIC_SYSTEM_PROMPT, prompt)
+
+        async def record(reply: str, model: str) -> None:
+            conversations.record(session, message, reply)
+
+        async for event in stream_text(client, messages, record):
+            yield event
+
 # Main analyze endpoint that the backend expects
-@app.post("/analyze")
-async def analyze_endpoint(request_data: dict):
+@app.post("/analyze", dependencies=[Depends(admit)])
+async def analyze_endpoint(request_data: dict, response: Response, bypass: bool = Depends(cache_bypass)):
     """
     Main analysis endpoint that handles text, audio, and image inputs
     """
@@ -391,49 +869,10 @@ async def analyze_endpoint(request_data: dict):
         audio_file = request_data.get('audio_file')
         image_file = request_data.get('image_file')
         
-        groq_api_key = os.getenv("GROQ_API_KEY")
-        if not groq_api_key:
-            raise HTTPException(status_code=500, detail="GROQ_API_KEY not configured")
-        
         # Handle text-only input
         if text_input and not audio_file and not image_file:
-            # Create a medical-focused prompt
-            medical_prompt = f"""You are a professional AI medical assistant. Please provide helpful, accurate medical information about the following query: "{text_input}"
-
-            Guidelines:
-            - Provide clear, concise medical information
-            - Include general symptoms, causes, and treatment options when appropriate
-            - Always recommend consulting a healthcare professional for proper diagnosis
-            - Keep responses informative but not overly technical
-            - Focus on general health information and common conditions
-            - Do not provide specific medical diagnoses or prescriptions
-            - Be empathetic and supportive in your responses
-            
-            Query: {text_input}
-            
-            Please provide a helpful response:"""
-            
-            # Use Groq for text analysis
-            from groq import Groq
-            client = Groq(api_key=groq_api_key)
-            
-            response = client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful AI medical assistant that provides general health information and guidance. Always be empathetic and supportive."
-                    },
-                    {
-                        "role": "user", 
-                        "content": medical_prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            analysis = response.choices[0].message.content
+            # Use the shared Groq client for text analysis
+            analysis, model_used = await cached_text(EMPATHETIC_SYSTEM_PROMPT, text_input, True, bypass, response)
             
             return {
                 "success": True,
@@ -441,7 +880,7 @@ async def analyze_endpoint(request_data: dict):
                     "analysis": analysis,
                     "input_type": "text",
                     "query": text_input,
-                    "model_used": "llama-3.1-8b-instant"
+                    "model_used": model_used
                 }
             }
         
@@ -483,6 +922,19 @@ async def analyze_endpoint(request_data: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in analysis: {str(e)}")
 
+@app.post("/analyze/stream")
+async def analyze_stream(request_data: dict, slot: StreamSlot = Depends(admit_stream),
+                         bypass: bool = Depends(cache_bypass)):
+    """
+    Streaming version of /analyze for text-only input
+    """
+    text_input = request_data.get('text_input')
+    if not text_input or request_data.get('audio_file') or request_data.get('image_file'):
+        raise HTTPException(status_code=400, detail="Streaming is only available for text-only input; use /analyze")
+    return stream_completion(
+        slot, lambda client: stream_text_cached(client, EMPATHETIC_SYSTEM_PROMPT, text_input, True, bypass)
+    )
+
 if __name__ == "__main__":
     # Check for required environment variables
     required_vars = ['GROQ_API_KEY']
@@ -8,7 +8,7 @@ import gradio as gr
 
 from brain_of_the_doctor import encode_image, analyze_image_with_query
 from voice_of_the_patient import record_audio, transcribe_with_groq
-from voice_of_the_doctor import text_to_speech_with_gtts
+from audio_cache import audio_cache
 
 #load_dotenv()
 
@@ -35,7 +35,7 @@ def process_inputs(audio_filepath, image_filepath):
             doctor_response = "No image provided for me to analyze"
 
         # Generate audio response
-        voice_of_doctor = text_to_speech_with_gtts(input_text=doctor_response, output_filepath="final.mp3") 
+        voice_of_doctor = audio_cache.path(audio_cache.get_or_create(doctor_response))
         
         # Verify the audio file was created
         if not os.path.exists(voice_of_doctor):
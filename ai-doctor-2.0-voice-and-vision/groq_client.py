@@ -0,0 +1,74 @@
+"""
+Shared Groq client for the AI Doctor service.
+
+One AsyncGroq instance is created at application startup and reused by every
+endpoint, so requests share a pool of keep-alive HTTPS connections instead of
+paying a fresh TLS handshake per call. Limits and timeouts are configurable
+through the environment:
+
+    GROQ_TIMEOUT            overall read timeout in seconds (default 60)
+    GROQ_CONNECT_TIMEOUT    connect timeout in seconds (default 5)
+    GROQ_MAX_CONNECTIONS    pool size (default 20)
+    GROQ_MAX_KEEPALIVE      idle connections kept open (default 10)
+    GROQ_KEEPALIVE_EXPIRY   seconds an idle connection is kept (default 30)
+    GROQ_MAX_RETRIES        SDK retries on connection errors/429/5xx (default 2)
+"""
+
+import os
+from typing import Optional
+
+import httpx
+from groq import AsyncGroq, DefaultAsyncHttpxClient
+
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "60"))
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+GROQ_MAX_KEEPALIVE = int(os.getenv("GROQ_MAX_KEEPALIVE", "10"))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "30"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+
+_client: Optional[AsyncGroq] = None
+
+
+def create_client(api_key: Optional[str] = None) -> AsyncGroq:
+    """Builds an AsyncGroq client backed by a pooled keep-alive httpx client"""
+    http_client = DefaultAsyncHttpxClient(
+        timeout=httpx.Timeout(GROQ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_KEEPALIVE,
+            keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+        ),
+    )
+    return AsyncGroq(
+        api_key=api_key or os.getenv("GROQ_API_KEY"),
+        max_retries=GROQ_MAX_RETRIES,
+        http_client=http_client,
+    )
+
+
+async def startup() -> None:
+    """Creates the shared client; skipped when GROQ_API_KEY is missing"""
+    global _client
+    if _client is None and os.getenv("GROQ_API_KEY"):
+        _client = create_client()
+
+
+async def shutdown() -> None:
+    """Closes the shared client and its connection pool"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def get_client() -> AsyncGroq:
+    """
+    Returns the shared client.
+
+    Raises:
+        RuntimeError: GROQ_API_KEY is not configured (or startup has not run).
+    """
+    if _client is None:
+        raise RuntimeError("GROQ_API_KEY not configured")
+    return _client
@@ -0,0 +1,289 @@
+"""
+Latency-aware model routing for Groq calls.
+
+Each tier (text, vision) is an ordered list of interchangeable models, the
+first being the preferred one. The router keeps a rolling window of latency,
+time to first token and errors per model, and for every call:
+
+- picks the order to try models in: the preferred order, or fastest first
+  (by observed p50) for short prompts; models that are rate-limited or
+  failing are moved to the back;
+- sends a hedged request to the next model once the tier's latency SLO is
+  exceeded, and a fallback request at once when a model fails with a
+  rate-limit, timeout, connection or server error;
+- uses whichever answer arrives first and cancels the rest.
+
+Errors that another model would not fix (bad request, auth) are raised as is.
+
+    TEXT_MODELS                 comma-separated text tier, preferred first
+    TEXT_SLO                    seconds before a completion is hedged (default 4)
+    TEXT_FIRST_TOKEN_SLO        seconds before a stream is hedged (default 1.5)
+    VISION_MODELS               comma-separated vision tier, preferred first
+    VISION_SLO                  (default 10)
+    VISION_FIRST_TOKEN_SLO      (default 4)
+    ROUTER_SIMPLE_PROMPT_TOKENS prompts up to this size go to the fastest model (default 200)
+    ROUTER_MAX_ATTEMPTS         models tried per call, hedges included (default 2)
+    ROUTER_WINDOW               calls kept per model for percentiles (default 200)
+    ROUTER_ERROR_WINDOW         seconds of outcomes behind the error rate (default 60)
+    ROUTER_MAX_ERROR_RATE       error rate past which a model is avoided (default 0.5)
+    ROUTER_COOLDOWN             seconds a rate-limited model is avoided (default 30)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import groq
+import numpy as np
+
+T = TypeVar("T")
+
+
+def _models(name: str, default: str) -> List[str]:
+    return [model.strip() for model in os.getenv(name, default).split(",") if model.strip()]
+
+
+TEXT_MODELS = _models("TEXT_MODELS", "llama-3.1-8b-instant,llama-3.3-70b-versatile")
+TEXT_SLO = float(os.getenv("TEXT_SLO", "4"))
+TEXT_FIRST_TOKEN_SLO = float(os.getenv("TEXT_FIRST_TOKEN_SLO", "1.5"))
+VISION_MODELS = _models(
+    "VISION_MODELS",
+    "meta-llama/llama-4-scout-17b-16e-instruct,meta-llama/llama-4-maverick-17b-128e-instruct"
+)
+VISION_SLO = float(os.getenv("VISION_SLO", "10"))
+VISION_FIRST_TOKEN_SLO = float(os.getenv("VISION_FIRST_TOKEN_SLO", "4"))
+ROUTER_SIMPLE_PROMPT_TOKENS = int(os.getenv("ROUTER_SIMPLE_PROMPT_TOKENS", "200"))
+ROUTER_MAX_ATTEMPTS = int(os.getenv("ROUTER_MAX_ATTEMPTS", "2"))
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", "200"))
+ROUTER_ERROR_WINDOW = float(os.getenv("ROUTER_ERROR_WINDOW", "60"))
+ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))
+ROUTER_COOLDOWN = float(os.getenv("ROUTER_COOLDOWN", "30"))
+# Fewer recent outcomes than this say nothing about a model's health
+MIN_OUTCOMES = 5
+
+logger = logging.getLogger(__name__)
+
+
+def retryable(error: BaseException) -> bool:
+    """Whether another model might succeed where this one failed"""
+    if isinstance(error, (groq.APIConnectionError, groq.RateLimitError, groq.NotFoundError)):
+        return True
+    return isinstance(error, groq.APIStatusError) and error.status_code >= 500
+
+
+@dataclass
+class Tier:
+    name: str
+    models: List[str]
+    slo: float
+    first_token_slo: float
+
+
+class ModelStats:
+    """Rolling latency and outcome window for one model"""
+
+    def __init__(self, window: int = ROUTER_WINDOW):
+        self.latency = deque(maxlen=window)
+        self.first_token = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.cooldown_until = 0.0
+        self.counts = {"requests": 0, "errors": 0, "hedges": 0, "fallbacks": 0, "wins": 0}
+
+    def p(self, kind: str, q: float) -> Optional[float]:
+        samples = getattr(self, kind)
+        return float(np.percentile(samples, q)) if samples else None
+
+    def error_rate(self, now: float) -> float:
+        recent = [ok for at, ok in self.outcomes if now - at <= ROUTER_ERROR_WINDOW]
+        if len(recent) < MIN_OUTCOMES:
+            return 0.0
+        return 1 - sum(recent) / len(recent)
+
+    def healthy(self, now: float, max_error_rate: float) -> bool:
+        return now >= self.cooldown_until and self.error_rate(now) <= max_error_rate
+
+    def snapshot(self, now: float, max_error_rate: float) -> dict:
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            **self.counts,
+            "healthy": self.healthy(now, max_error_rate),
+            "error_rate": round(self.error_rate(now), 3),
+            "cooldown_s": round(max(self.cooldown_until - now, 0), 1),
+            "latency_p50_ms": ms(self.p("latency", 50)),
+            "latency_p95_ms": ms(self.p("latency", 95)),
+            "first_token_p50_ms": ms(self.p("first_token", 50)),
+            "first_token_p95_ms": ms(self.p("first_token", 95)),
+        }
+
+
+class ModelRouter:
+    def __init__(self, tiers: List[Tier], max_attempts: int = ROUTER_MAX_ATTEMPTS,
+                 simple_prompt_tokens: int = ROUTER_SIMPLE_PROMPT_TOKENS,
+                 max_error_rate: float = ROUTER_MAX_ERROR_RATE, cooldown: float = ROUTER_COOLDOWN):
+        self.tiers = {tier.name: tier for tier in tiers}
+        self.max_attempts = max_attempts
+        self.simple_prompt_tokens = simple_prompt_tokens
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.models: Dict[str, ModelStats] = {}
+
+    def _stats(self, model: str) -> ModelStats:
+        if model not in self.models:
+            self.models[model] = ModelStats()
+        return self.models[model]
+
+    def primary(self, tier: str) -> str:
+        return self.tiers[tier].models[0]
+
+    def candidates(self, tier: str, kind: str = "latency", prompt_tokens: Optional[int] = None,
+                   preferred: Optional[str] = None) -> List[str]:
+        """Models in the order they should be tried"""
+        models = self.tiers[tier].models
+        if preferred:
+            # A model the client asked for goes first, with the tier as its fallbacks
+            models = [preferred] + [model for model in models if model != preferred]
+        elif prompt_tokens is not None and prompt_tokens <= self.simple_prompt_tokens:
+            # Unmeasured models sort first, so each gets measured
+            models = sorted(models, key=lambda model: self._stats(model).p(kind, 50) or 0.0)
+        now = time.monotonic()
+        healthy = [model for model in models if self._stats(model).healthy(now, self.max_error_rate)]
+        # Unhealthy models stay as a last resort
+        return healthy + [model for model in models if model not in healthy]
+
+    async def _attempt(self, model: str, start: Callable[[str], Awaitable[T]], kind: str) -> T:
+        stats = self._stats(model)
+        stats.counts["requests"] += 1
+        began = time.perf_counter()
+        try:
+            result = await start(model)
+        except Exception as e:
+            if retryable(e):
+                stats.counts["errors"] += 1
+                stats.outcomes.append((time.monotonic(), False))
+                if isinstance(e, groq.RateLimitError):
+                    retry_after = e.response.headers.get("retry-after", "")
+                    wait = float(retry_after) if retry_after.replace(".", "", 1).isdigit() else self.cooldown
+                    stats.cooldown_until = time.monotonic() + wait
+            raise
+        getattr(stats, kind).append(time.perf_counter() - began)
+        stats.outcomes.append((time.monotonic(), True))
+        return result
+
+    async def _race(self, tier: str, start: Callable[[str], Awaitable[T]], kind: str,
+                    prompt_tokens: Optional[int], preferred: Optional[str],
+                    discard: Optional[Callable[[T], Awaitable[None]]] = None) -> Tuple[T, str]:
+        models = self.candidates(tier, kind, prompt_tokens, preferred)[:self.max_attempts]
+        slo = self.tiers[tier].slo if kind == "latency" else self.tiers[tier].first_token_slo
+        pending: Dict[asyncio.Task, str] = {}
+        started: Dict[asyncio.Task, float] = {}
+        next_model = 0
+        won = False
+        error: Optional[BaseException] = None
+
+        def launch(reason: Optional[str] = None) -> None:
+            nonlocal next_model
+            model = models[next_model]
+            next_model += 1
+            if reason:
+                self._stats(model).counts[reason] += 1
+                logger.info("%s request to %s (%s tier)", reason[:-1].capitalize(), model, tier)
+            task = asyncio.create_task(self._attempt(model, start, kind))
+            pending[task] = model
+            started[task] = time.perf_counter()
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, timeout=slo if next_model < len(models) else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Past the SLO: race the next model against the slow one
+                    launch("hedges")
+                    continue
+                for task in done:
+                    model = pending.pop(task)
+                    if task.exception() is None:
+                        self._stats(model).counts["wins"] += 1
+                        won = True
+                        # A second answer that landed in the same tick is not needed
+                        for other in done:
+                            if other is not task and other.exception() is None and discard is not None:
+                                await discard(other.result())
+                        return task.result(), model
+                    error = task.exception()
+                    if not retryable(error):
+                        raise error
+                if next_model < len(models):
+                    launch("fallbacks")
+            raise error
+        finally:
+            for task, model in pending.items():
+                task.cancel()
+                if won:
+                    # A loser was at least this slow; leaving it out would make a slow model look fast
+                    getattr(self._stats(model), kind).append(time.perf_counter() - started[task])
+
+    async def call(self, tier: str, request: Callable[[str], Awaitable[T]],
+                   prompt_tokens: Optional[int] = None, preferred: Optional[str] = None) -> Tuple[T, str]:
+        """
+        Runs request(model) against the tier with hedging and fallback.
+        Returns (result, model that produced it).
+        """
+        return await self._race(tier, request, "latency", prompt_tokens, preferred)
+
+    async def stream(self, tier: str, open_stream: Callable[[str], AsyncIterator[T]],
+                     prompt_tokens: Optional[int] = None,
+                     preferred: Optional[str] = None) -> Tuple[AsyncIterator[T], str]:
+        """
+        Like call() for streams: hedges and falls back until the first item
+        arrives (time to first token), then commits to that model. Returns
+        (all items of the winning stream, model).
+        """
+        async def start(model: str) -> tuple:
+            items = open_stream(model)
+            try:
+                return [await items.__anext__()], items
+            except StopAsyncIteration:
+                return [], items
+
+        async def discard(started: tuple) -> None:
+            await started[1].aclose()
+
+        (head, items), model = await self._race(tier, start, "first_token", prompt_tokens, preferred, discard)
+
+        async def chained() -> AsyncIterator[T]:
+            try:
+                for item in head:
+                    yield item
+                async for item in items:
+                    yield item
+            finally:
+                await items.aclose()
+
+        return chained(), model
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            name: {
+                "models": tier.models,
+                "slo_s": tier.slo,
+                "first_token_slo_s": tier.first_token_slo,
+                "stats": {model: self._stats(model).snapshot(now, self.max_error_rate) for model in tier.models},
+            }
+            for name, tier in self.tiers.items()
+        }
+
+
+model_router = ModelRouter([
+    Tier("text", TEXT_MODELS, TEXT_SLO, TEXT_FIRST_TOKEN_SLO),
+    Tier("vision", VISION_MODELS, VISION_SLO, VISION_FIRST_TOKEN_SLO),
+])
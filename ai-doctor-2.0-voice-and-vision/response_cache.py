@@ -0,0 +1,198 @@
+"""
+Response cache for single-turn text queries.
+
+Two tiers, both with TTL and LRU eviction:
+
+- exact: keyed on the normalized query (case, whitespace and trailing
+  punctuation ignored) within a namespace that pins the model, prompt
+  template and sampling parameters. A hit is a dict lookup.
+- semantic (optional): embeds the query with a local sentence-transformers
+  model and reuses the answer to an earlier query whose cosine similarity
+  clears SEMANTIC_CACHE_THRESHOLD. Needs `sentence-transformers`; if it is
+  missing the tier stays off.
+
+    RESPONSE_CACHE_TTL          seconds an answer is reused (default 21600)
+    RESPONSE_CACHE_SIZE         exact-tier entries (default 5000)
+    SEMANTIC_CACHE              1 to enable the semantic tier (default 0)
+    SEMANTIC_CACHE_MODEL        embedding model (default all-MiniLM-L6-v2)
+    SEMANTIC_CACHE_THRESHOLD    minimum cosine similarity (default 0.92)
+    SEMANTIC_CACHE_SIZE         semantic-tier entries (default 2000)
+"""
+
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+from concurrency import run_blocking
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "21600"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "all-MiniLM-L6-v2")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2000"))
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query.lower()).strip(" ?!.")
+
+
+class TTLCache:
+    """LRU dict whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value) -> None:
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def items(self) -> list:
+        now = time.monotonic()
+        return [(key, value) for key, (value, expires_at) in self._entries.items() if expires_at >= now]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SemanticIndex:
+    """
+    Nearest-neighbour lookup over cached query embeddings, one namespace at a
+    time. Vectors are normalized, so a dot product is the cosine similarity.
+    """
+
+    def __init__(self, model_name: str, threshold: float, max_size: int, ttl: float):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.entries = TTLCache(max_size, ttl)
+        self._model = None
+        # A miss embeds the query on lookup and again on store; remember recent vectors
+        self._recent = TTLCache(256, 300)
+        self._matrix = None
+        self._keys = []
+        self.available = True
+
+    def _encode(self, text: str) -> np.ndarray:
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name)
+        return self._model.encode(text, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+    async def embed(self, text: str) -> Optional[np.ndarray]:
+        if not self.available:
+            return None
+        vector = self._recent.get(text)
+        if vector is not None:
+            return vector
+        try:
+            vector = await run_blocking(self._encode, text)
+        except ImportError:
+            logger.warning("sentence-transformers is not installed; semantic cache disabled")
+            self.available = False
+            return None
+        self._recent.put(text, vector)
+        return vector
+
+    def _rebuild(self) -> None:
+        live = self.entries.items()
+        self._keys = [key for key, _ in live]
+        self._matrix = np.vstack([vector for _, (_, vector, _) in live]) if live else None
+
+    def search(self, namespace: str, vector: np.ndarray) -> Optional[Any]:
+        if self._matrix is None or len(self._keys) != len(self.entries):
+            self._rebuild()
+        if self._matrix is None:
+            return None
+        scores = self._matrix @ vector
+        # Other namespaces (models, templates) never match
+        for i in np.argsort(-scores):
+            if scores[i] < self.threshold:
+                return None
+            entry = self.entries.get(self._keys[i])
+            if entry is not None and entry[0] == namespace:
+                return entry[2]
+        return None
+
+    def add(self, key: str, namespace: str, vector: np.ndarray, value: Any) -> None:
+        self.entries.put(key, (namespace, vector, value))
+        self._matrix = None
+
+
+class ResponseCache:
+    def __init__(self, ttl=RESPONSE_CACHE_TTL, max_size=RESPONSE_CACHE_SIZE, semantic=SEMANTIC_CACHE):
+        self.exact = TTLCache(max_size, ttl)
+        self.semantic = (
+            SemanticIndex(SEMANTIC_CACHE_MODEL, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE, ttl)
+            if semantic else None
+        )
+        self.counts = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "bypassed": 0}
+
+    @staticmethod
+    def key(namespace: str, query: str) -> str:
+        """Cache key: the namespace plus the normalized query"""
+        return hashlib.sha256(f"{namespace}\0{normalize_query(query)}".encode()).hexdigest()
+
+    async def lookup(self, namespace: str, query: str) -> Tuple[Optional[Any], str]:
+        """
+        Returns (cached value, tier) where tier is "exact", "semantic" or "miss".
+        """
+        value = self.exact.get(self.key(namespace, query))
+        if value is not None:
+            self.counts["exact_hits"] += 1
+            return value, "exact"
+        if self.semantic is not None:
+            vector = await self.semantic.embed(normalize_query(query))
+            if vector is not None:
+                value = self.semantic.search(namespace, vector)
+                if value is not None:
+                    self.counts["semantic_hits"] += 1
+                    # Promote, so the next identical query skips the embedding
+                    self.exact.put(self.key(namespace, query), value)
+                    return value, "semantic"
+        self.counts["misses"] += 1
+        return None, "miss"
+
+    async def store(self, namespace: str, query: str, value: Any) -> None:
+        key = self.key(namespace, query)
+        self.exact.put(key, value)
+        if self.semantic is not None:
+            vector = await self.semantic.embed(normalize_query(query))
+            if vector is not None:
+                self.semantic.add(key, namespace, vector, value)
+
+    def bypass(self) -> None:
+        self.counts["bypassed"] += 1
+
+    def stats(self) -> dict:
+        lookups = self.counts["exact_hits"] + self.counts["semantic_hits"] + self.counts["misses"]
+        hits = self.counts["exact_hits"] + self.counts["semantic_hits"]
+        return {
+            **self.counts,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "exact_entries": len(self.exact),
+            "semantic_entries": len(self.semantic.entries) if self.semantic else None,
+            "semantic_enabled": bool(self.semantic and self.semantic.available),
+        }
@@ -0,0 +1,109 @@
+"""
+Single-flight request coalescing.
+
+When many patients ask the same question at the same moment (a clinic
+shares a link, say), concurrent calls with the same key share one upstream
+call instead of each making their own: the first caller starts it, later
+callers wait on it, and everyone gets the same result or error. Streams
+are fanned out the same way; a caller that joins late first replays what
+was already produced.
+
+The shared call is cancelled only when every caller waiting on it has gone
+away, so one client disconnecting does not fail the others.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    waiters: int = 0
+    # Stream flights only: items produced so far, how the stream ended, and a wake-up for readers
+    items: List = field(default_factory=list)
+    finished: bool = False
+    error: Optional[Exception] = None
+    changed: Optional[asyncio.Condition] = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.counts = {"calls": 0, "coalesced": 0}
+
+    def _join(self, key: str, start: Callable[[_Flight], Awaitable], stream: bool) -> _Flight:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(task=None, changed=asyncio.Condition() if stream else None)
+            flight.task = asyncio.create_task(start(flight))
+            self._flights[key] = flight
+
+            def forget(_, key=key, flight=flight):
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+            flight.task.add_done_callback(forget)
+            self.counts["calls"] += 1
+        else:
+            self.counts["coalesced"] += 1
+        flight.waiters += 1
+        return flight
+
+    def _leave(self, flight: _Flight) -> None:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            flight.task.cancel()
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Result of call(), shared with every concurrent caller using the same key"""
+        async def start(flight: _Flight) -> T:
+            return await call()
+
+        flight = self._join(key, start, stream=False)
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            self._leave(flight)
+
+    async def stream(self, key: str, open_stream: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Items of open_stream(), fanned out to every concurrent caller using the same key"""
+        async def start(flight: _Flight) -> None:
+            try:
+                async for item in open_stream():
+                    flight.items.append(item)
+                    async with flight.changed:
+                        flight.changed.notify_all()
+            except Exception as e:
+                flight.error = e
+            finally:
+                flight.finished = True
+                async with flight.changed:
+                    flight.changed.notify_all()
+
+        flight = self._join(key, start, stream=True)
+        try:
+            index = 0
+            while True:
+                while index < len(flight.items):
+                    yield flight.items[index]
+                    index += 1
+                if flight.finished:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: index < len(flight.items) or flight.finished)
+        finally:
+            self._leave(flight)
+
+    def stats(self) -> dict:
+        total = self.counts["calls"] + self.counts["coalesced"]
+        return {
+            **self.counts,
+            "in_flight": len(self._flights),
+            "coalesced_rate": round(self.counts["coalesced"] / total, 3) if total else 0.0,
+        }
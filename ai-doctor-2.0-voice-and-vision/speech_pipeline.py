@@ -0,0 +1,106 @@
+"""
+Sentence-pipelined text-to-speech.
+
+A long answer is split into sentence-sized segments that are synthesized
+concurrently (TTS_CONCURRENCY at a time per answer) and handed back in
+their original order, so the first sentence can play while later ones are
+still being synthesized — or, when fed from a token stream, still being
+generated. Segments go through the audio cache like any other clip, so
+recurring sentences such as disclaimers are synthesized once.
+
+    TTS_CONCURRENCY     segments synthesized in parallel per answer (default 4)
+"""
+
+import asyncio
+import os
+import re
+from typing import AsyncIterator, Awaitable, Callable, List, Tuple
+
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))
+# Very short sentences ("Hi.") are merged with the next one to avoid choppy audio and extra requests
+MIN_SEGMENT_CHARS = 40
+MAX_SEGMENT_CHARS = 300
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class SentenceSplitter:
+    """Incrementally cuts streamed text into speakable segments"""
+
+    def __init__(self, min_chars: int = MIN_SEGMENT_CHARS, max_chars: int = MAX_SEGMENT_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Adds text and returns the segments it completed"""
+        self._buffer += text
+        segments = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            if match.start() - start >= self.min_chars:
+                segments.append(self._buffer[start:match.start()].strip())
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        # A run-on sentence is cut at the last comma or space before the limit
+        while len(self._buffer) > self.max_chars:
+            window = self._buffer[:self.max_chars]
+            cut = max(window.rfind(", "), window.rfind(" "))
+            cut = cut + 1 if cut > 0 else self.max_chars
+            segments.append(self._buffer[:cut].strip())
+            self._buffer = self._buffer[cut:]
+        return [segment for segment in segments if segment]
+
+    def flush(self) -> List[str]:
+        """Returns whatever text is left once the stream has ended"""
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+def split_sentences(text: str) -> List[str]:
+    splitter = SentenceSplitter()
+    return splitter.feed(text) + splitter.flush()
+
+
+class SpeechPipeline:
+    """
+    Starts synthesis of each segment as soon as it is added (bounded by
+    `concurrency`) and yields the results strictly in order.
+    """
+
+    def __init__(self, synthesize: Callable[[str], Awaitable[str]], concurrency: int = TTS_CONCURRENCY):
+        self._synthesize = synthesize
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: List[Tuple[str, asyncio.Task]] = []
+        self._closed = False
+        self._changed = asyncio.Event()
+
+    async def _run(self, text: str) -> str:
+        async with self._slots:
+            return await self._synthesize(text)
+
+    def add(self, text: str) -> None:
+        self._tasks.append((text, asyncio.create_task(self._run(text))))
+        self._changed.set()
+
+    def close(self) -> None:
+        """No more segments will be added"""
+        self._closed = True
+        self._changed.set()
+
+    def cancel(self) -> None:
+        for _, task in self._tasks:
+            task.cancel()
+
+    async def results(self) -> AsyncIterator[Tuple[int, str, str]]:
+        """Yields (index, segment text, synthesis result) in segment order"""
+        index = 0
+        while True:
+            while index >= len(self._tasks):
+                if self._closed:
+                    return
+                self._changed.clear()
+                await self._changed.wait()
+            text, task = self._tasks[index]
+            yield index, text, await task
+            index += 1
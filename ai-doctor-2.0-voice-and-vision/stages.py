@@ -0,0 +1,60 @@
+"""
+Per-stage timings for multi-stage requests such as /analyze-combined.
+
+Stages that do not depend on each other run concurrently, so each one is
+reported with its start offset as well as its duration; the critical path
+is visible straight from the numbers.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, TypeVar
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self.stages = {}
+        self.marks = {}
+
+    def _offset_ms(self, at: float) -> float:
+        return round((at - self._origin) * 1000, 1)
+
+    async def run(self, name: str, awaitable: Awaitable[T]) -> T:
+        """Awaits one stage and records when it started and how long it took"""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.stages[name] = {
+                "start_ms": self._offset_ms(start),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            }
+
+    def mark(self, name: str) -> None:
+        """Records a point in time (e.g. first token), once"""
+        self.marks.setdefault(name, self._offset_ms(time.perf_counter()))
+
+    def server_timing(self) -> str:
+        """The stage durations as a Server-Timing header value"""
+        metrics = [f"{name};dur={stage['duration_ms']}" for name, stage in self.stages.items()]
+        return ", ".join(metrics + [f"total;dur={self._offset_ms(time.perf_counter())}"])
+
+    def report(self) -> dict:
+        return {
+            "total_ms": self._offset_ms(time.perf_counter()),
+            "stages": dict(self.stages),
+            **({"marks": dict(self.marks)} if self.marks else {}),
+        }
+
+
+async def gather_stages(*tasks: "asyncio.Task"):
+    """asyncio.gather() that cancels the other stages as soon as one fails"""
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
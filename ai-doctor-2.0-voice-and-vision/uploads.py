@@ -0,0 +1,102 @@
+"""
+Upload size limits for the AI Doctor service.
+
+Request bodies are capped while they stream in, so an oversized upload is
+refused with 413 before it is spooled in full: up front when Content-Length
+says so, otherwise as soon as the received bytes cross the limit. Each file
+part is then checked against its own limit and read into memory once; no
+endpoint writes uploads to disk.
+
+    MAX_UPLOAD_MB   whole request body (default 36: one image plus one audio file)
+    MAX_IMAGE_MB    one image file (default 10)
+    MAX_AUDIO_MB    one audio file (default 25, Groq's transcription limit)
+"""
+
+import os
+
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+
+MB = 1024 * 1024
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "36")) * MB)
+MAX_IMAGE_BYTES = int(float(os.getenv("MAX_IMAGE_MB", "10")) * MB)
+MAX_AUDIO_BYTES = int(float(os.getenv("MAX_AUDIO_MB", "25")) * MB)
+
+READ_CHUNK = 256 * 1024
+
+
+class _BodyTooLarge(HTTPException):
+    # An HTTPException, so FastAPI's body parsing re-raises it and the app answers 413 itself
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Request body exceeds {limit // MB} MB")
+
+
+def _too_large(limit: int) -> JSONResponse:
+    return JSONResponse(
+        status_code=413,
+        content={"detail": f"Request body exceeds {limit // MB} MB"},
+    )
+
+
+class BodySizeLimitMiddleware:
+    """Pure ASGI middleware that stops reading a request body past `max_bytes`"""
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                await _too_large(self.max_bytes)(scope, receive, send)
+                return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise _BodyTooLarge(self.max_bytes)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            if not response_started:
+                await _too_large(self.max_bytes)(scope, receive, send)
+
+
+async def read_upload(file: UploadFile, max_bytes: int, kind: str) -> bytes:
+    """
+    Reads an upload into memory, refusing it with 413 once it passes max_bytes.
+
+    The size recorded while the multipart body was parsed is checked first,
+    so an oversized part is refused without reading it back.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"{kind} exceeds {max_bytes // MB} MB")
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(READ_CHUNK)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise HTTPException(status_code=413, detail=f"{kind} exceeds {max_bytes // MB} MB")
+        chunks.append(chunk)
+    return b"".join(chunks)
@@ -4,6 +4,7 @@
 
 #Step1a: Setup Text to Speech–TTS–model with gTTS
 import os
+from io import BytesIO
 from gtts import gTTS
 
 def text_to_speech_with_gtts_old(input_text, output_filepath):
@@ -18,7 +19,7 @@ def text_to_speech_with_gtts_old(input_text, output_filepath):
 
 
 input_text="Hi this is Ai with Hassan!"
-text_to_speech_with_gtts_old(input_text=input_text, output_filepath="gtts_testing.mp3")
+#text_to_speech_with_gtts_old(input_text=input_text, output_filepath="gtts_testing.mp3")
 
 #Step1b: ElevenLabs functionality removed - using only Google TTS 
 
@@ -39,6 +40,18 @@ def text_to_speech_with_gtts(input_text, output_filepath):
     # Return the file path so Gradio can use it
     return output_filepath
 
+def synthesize_mp3(input_text, lang="en", tld="com", slow=False):
+    """Same synthesis as text_to_speech_with_gtts, returned as MP3 bytes instead of written to a fixed file"""
+    audioobj= gTTS(
+        text=input_text,
+        lang=lang,
+        tld=tld,
+        slow=slow
+    )
+    buffer=BytesIO()
+    audioobj.write_to_fp(buffer)
+    return buffer.getvalue()
+
 
 input_text="Hi this is Ai with Hassan, autoplay testing!"
 #text_to_speech_with_gtts(input_text=input_text, output_filepath="gtts_testing_autoplay.mp3")
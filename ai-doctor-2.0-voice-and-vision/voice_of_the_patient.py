@@ -47,19 +47,65 @@ audio_filepath="patient_voice_test_for_patient.mp3"
 
 #Step2: Setup Speech to text–STT–model for transcription
 import os
+import asyncio
 from groq import Groq
+from concurrency import run_blocking
+from audio_preprocessing import STT_CONCURRENCY, STT_PREPROCESS, prepare_for_stt
+from stages import gather_stages
 
 GROQ_API_KEY=os.environ.get("GROQ_API_KEY")
 stt_model="whisper-large-v3"
 
+_sync_clients={}
+
 def transcribe_with_groq(stt_model, audio_filepath, GROQ_API_KEY):
-    client=Groq(api_key=GROQ_API_KEY)
+    # One client per API key, so repeated calls reuse its connection pool
+    if GROQ_API_KEY not in _sync_clients:
+        _sync_clients[GROQ_API_KEY]=Groq(api_key=GROQ_API_KEY)
+    client=_sync_clients[GROQ_API_KEY]
     
-    audio_file=open(audio_filepath, "rb")
-    transcription=client.audio.transcriptions.create(
+    with open(audio_filepath, "rb") as audio_file:
+        transcription=client.audio.transcriptions.create(
+            model=stt_model,
+            file=audio_file,
+            language="en"
+        )
+
+    return transcription.text
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+async def _transcribe_chunk(stt_model, client, audio):
+    transcription=await client.audio.transcriptions.create(
         model=stt_model,
-        file=audio_file,
+        file=audio,
         language="en"
     )
 
     return transcription.text
+
+async def transcribe_with_groq_async(stt_model, client, audio_filepath=None, audio=None, preprocess=STT_PREPROCESS):
+    """
+    Same as transcribe_with_groq, on the shared AsyncGroq client.
+    Pass either a file path or audio=(filename, bytes) already in memory.
+
+    With preprocess, the recording is downmixed, trimmed of silence and
+    re-encoded first; long recordings are transcribed as parallel chunks
+    and the texts joined in order. A recording without speech gives "".
+    """
+    if audio is None:
+        audio=(os.path.basename(audio_filepath), await run_blocking(_read_bytes, audio_filepath))
+    if not preprocess:
+        return await _transcribe_chunk(stt_model, client, audio)
+
+    chunks=await run_blocking(prepare_for_stt, audio)
+    slots=asyncio.Semaphore(STT_CONCURRENCY)
+
+    async def transcribe(chunk):
+        async with slots:
+            return await _transcribe_chunk(stt_model, client, chunk)
+
+    texts=await gather_stages(*(asyncio.create_task(transcribe(chunk)) for chunk in chunks))
+    return " ".join(text.strip() for text in texts if text.strip())
@@ -4,6 +4,8 @@ import fs from 'fs';
 import path from 'path';
 
 const AI_DOCTOR_API_URL = process.env.AI_DOCTOR_API_URL || 'http://localhost:8000';
+// Shared secret that lets this backend use chat sessions on behalf of its users
+const AI_DOCTOR_SERVICE_TOKEN = process.env.AI_DOCTOR_SERVICE_TOKEN || '';
 
 export const analyzeMedicalInput = async (req, res) => {
   try {
@@ -72,20 +74,140 @@ export const analyzeMedicalInput = async (req, res) => {
   }
 };
 
+// Proxies a Server-Sent Events stream from the AI Doctor service, forwarding
+// each event as soon as it arrives instead of waiting for the full answer
+const proxyEventStream = async (res, endpoint, body, headers) => {
+  const controller = new AbortController();
+  // Stop the upstream generation when the browser goes away
+  res.on('close', () => controller.abort());
+
+  try {
+    const response = await axios.post(`${AI_DOCTOR_API_URL}${endpoint}`, body, {
+      headers,
+      responseType: 'stream',
+      signal: controller.signal,
+      validateStatus: () => true
+    });
+
+    if (response.status !== 200) {
+      // Errors arrive as a JSON body before any event is sent
+      let raw = '';
+      for await (const chunk of response.data) raw += chunk;
+      let detail;
+      try {
+        detail = JSON.parse(raw).detail;
+      } catch {
+        detail = raw;
+      }
+      if (response.headers['retry-after']) {
+        res.set('Retry-After', response.headers['retry-after']);
+      }
+      return res.status(response.status).json({
+        success: false,
+        message: 'AI Doctor service error',
+        error: detail
+      });
+    }
+
+    res.set({
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache',
+      'Connection': 'keep-alive',
+      'X-Accel-Buffering': 'no'
+    });
+    res.flushHeaders();
+    response.data.pipe(res);
+    response.data.on('error', (error) => {
+      if (!controller.signal.aborted) {
+        console.error('AI Doctor stream error:', error);
+      }
+      res.end();
+    });
+
+  } catch (error) {
+    if (controller.signal.aborted) return;
+    console.error('AI Doctor stream error:', error);
+
+    if (error.code === 'ECONNREFUSED') {
+      res.status(503).json({
+        success: false,
+        message: 'AI Doctor service is not available',
+        error: 'Service connection refused'
+      });
+    } else {
+      res.status(500).json({
+        success: false,
+        message: 'Internal server error',
+        error: error.message
+      });
+    }
+  }
+};
+
+export const streamMedicalInput = async (req, res) => {
+  const { textInput } = req.body;
+
+  if (!textInput) {
+    return res.status(400).json({
+      success: false,
+      message: 'textInput is required for streaming analysis'
+    });
+  }
+
+  await proxyEventStream(res, '/analyze/stream', { text_input: textInput }, {
+    'Content-Type': 'application/json',
+  });
+};
+
+export const streamChat = async (req, res) => {
+  const { message, sessionId } = req.body;
+
+  if (!message) {
+    return res.status(400).json({
+      success: false,
+      message: 'message is required'
+    });
+  }
+
+  const form = new URLSearchParams({ message });
+  const headers = { 'Content-Type': 'application/x-www-form-urlencoded' };
+  if (sessionId) {
+    // Session history is private: the AI Doctor service scopes it to the user vouched for here
+    form.append('session_id', String(sessionId));
+    headers['X-Session-Owner'] = `${req.auth.type}:${req.auth.id}`;
+    headers['X-Service-Token'] = AI_DOCTOR_SERVICE_TOKEN;
+  }
+
+  await proxyEventStream(res, '/chat/stream', form.toString(), headers);
+};
+
 export const getAudioResponse = async (req, res) => {
   try {
     const { filename } = req.params;
     
+    // Forward conditional and range headers so the browser can seek and revalidate
+    const forwardHeaders = {};
+    for (const name of ['range', 'if-range', 'if-none-match']) {
+      if (req.headers[name]) forwardHeaders[name] = req.headers[name];
+    }
+    
     // Forward request to FastAPI audio endpoint
-    const response = await axios.get(`${AI_DOCTOR_API_URL}/audio/${filename}`, {
-      responseType: 'stream'
+    const response = await axios.get(`${AI_DOCTOR_API_URL}/audio/${encodeURIComponent(filename)}`, {
+      headers: forwardHeaders,
+      responseType: 'stream',
+      validateStatus: (status) => (status >= 200 && status < 300) || status === 304 || status === 416
     });
     
-    res.set({
-      'Content-Type': 'audio/mpeg',
-      'Content-Disposition': `attachment; filename="${filename}"`
-    });
+    res.status(response.status);
+    for (const name of ['content-type', 'content-length', 'content-range', 'accept-ranges', 'etag', 'last-modified', 'cache-control']) {
+      if (response.headers[name]) res.set(name, response.headers[name]);
+    }
+    res.set('Content-Disposition', `attachment; filename="${filename}"`);
     
+    if (response.status === 304) {
+      response.data.resume();
+      return res.end();
+    }
     response.data.pipe(res);
     
   } catch (error) {
@@ -1,5 +1,5 @@
 import express from 'express';
-import { analyzeMedicalInput, getAudioResponse, checkAIDoctorHealth } from '../controllers/aiDoctorController.js';
+import { analyzeMedicalInput, streamMedicalInput, streamChat, getAudioResponse, checkAIDoctorHealth } from '../controllers/aiDoctorController.js';
 import { authenticateToken } from '../middleware/auth.js';
 
 const router = express.Router();
@@ -10,6 +10,10 @@ router.get('/health', checkAIDoctorHealth);
 // Analyze medical input (audio, image, text)
 router.post('/analyze', authenticateToken, analyzeMedicalInput);
 
+// Stream the analysis / chat reply token by token (Server-Sent Events)
+router.post('/analyze/stream', authenticateToken, streamMedicalInput);
+router.post('/chat/stream', authenticateToken, streamChat);
+
 // Get audio response file
 router.get('/audio/:filename', authenticateToken, getAudioResponse);
 
@@ -1,6 +1,10 @@
 # backend/api/inventory.py
 
-from fastapi import APIRouter, Depends, HTTPException
+import hashlib
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List
@@ -10,6 +14,7 @@ from backend.db import models
 from backend.db.database import SessionLocal
 from backend.services.vector_search import add_medicine_to_vector_db, delete_medicine_from_vector_db
 from backend.services.drug_api import fetch_drug_summary
+from backend.services import lexical_search, neighbor_graph
 
 router = APIRouter()
 
@@ -34,6 +39,22 @@ class MedicineSchema(BaseModel):
     class Config:
         orm_mode = True
 
+# -----------------------------
+# ETag helpers for read endpoints
+# -----------------------------
+def etag_response(request: Request, payload) -> Response:
+    """
+    Serializes the payload once, tags it with a content hash and answers
+    304 Not Modified when the client already holds the same representation.
+    """
+    content = jsonable_encoder(payload)
+    body = json.dumps(content, sort_keys=True, separators=(",", ":"))
+    etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(content=content, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
 # -----------------------------
 # Add a medicine
 # -----------------------------
@@ -48,6 +69,8 @@ def add_medicine(med: MedicineSchema, db: Session = Depends(get_db)):
 
     summary = fetch_drug_summary(new_med.name) or ""
     add_medicine_to_vector_db(new_med.id, new_med.name, summary)
+    lexical_search.index_medicine(new_med.id, new_med.name, summary)
+    neighbor_graph.refresh_medicine(db, new_med.id)
 
     return new_med
 
@@ -55,8 +78,9 @@ def add_medicine(med: MedicineSchema, db: Session = Depends(get_db)):
 # Get all medicines
 # -----------------------------
 @router.get("/all", response_model=List[MedicineSchema])
-def get_all_medicines(db: Session = Depends(get_db)):
-    return db.query(models.Medicine).all()
+def get_all_medicines(request: Request, db: Session = Depends(get_db)):
+    meds = db.query(models.Medicine).all()
+    return etag_response(request, [MedicineSchema.from_orm(m) for m in meds])
 
 # -----------------------------
 # Delete a medicine by ID
@@ -72,6 +96,8 @@ def delete_medicine(med_id: str, db: Session = Depends(get_db)):
 
     # Remove from vector DB as well
     delete_medicine_from_vector_db(med_id)
+    lexical_search.remove_medicine(med_id)
+    neighbor_graph.remove_medicine(db, med_id)
 
     return {"detail": f"Medicine {med_id} deleted from database and vector index"}
 
@@ -93,6 +119,8 @@ def update_medicine(med_id: str, med_update: MedicineSchema, db: Session = Depen
     summary = fetch_drug_summary(med_update.name) or ""
     delete_medicine_from_vector_db(med_id)
     add_medicine_to_vector_db(med_id, med_update.name, summary)
+    lexical_search.index_medicine(med_id, med_update.name, summary)
+    neighbor_graph.refresh_medicine(db, med_id)
 
     return med
 
@@ -100,8 +128,9 @@ def update_medicine(med_id: str, med_update: MedicineSchema, db: Session = Depen
 # Get low-stock medicines
 # -----------------------------
 @router.get("/low-stock", response_model=List[MedicineSchema])
-def get_low_stock(threshold: int = 10, db: Session = Depends(get_db)):
-    return db.query(models.Medicine).filter(models.Medicine.quantity <= threshold).all()
+def get_low_stock(request: Request, threshold: int = 10, db: Session = Depends(get_db)):
+    meds = db.query(models.Medicine).filter(models.Medicine.quantity <= threshold).all()
+    return etag_response(request, [MedicineSchema.from_orm(m) for m in meds])
 
 
 @router.post("/sell")
@@ -0,0 +1,51 @@
+# backend/api/prescriptions.py
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from typing import List, Optional
+from backend.api.inventory import get_db
+from backend.services.prescription_resolver import resolve_prescription
+
+router = APIRouter()
+
+class PrescriptionItem(BaseModel):
+    name: str
+    quantity: int = 1
+
+class ResolveRequest(BaseModel):
+    items: List[PrescriptionItem]
+    top_k: int = 5
+    always_alternatives: bool = False
+
+class AlternativeSchema(BaseModel):
+    id: str
+    name: str
+    score: float
+    in_stock: int
+    price: float
+
+class ResolvedItem(BaseModel):
+    name: str
+    requested: int
+    medicine_id: Optional[str] = None
+    in_stock: int
+    price: Optional[float] = None
+    available: bool
+    shortfall: int
+    alternatives: List[AlternativeSchema]
+
+class ResolveResponse(BaseModel):
+    items: List[ResolvedItem]
+
+# -----------------------------
+# Resolve a whole prescription in one round trip
+# -----------------------------
+@router.post("/resolve", response_model=ResolveResponse)
+def resolve(request: ResolveRequest, db: Session = Depends(get_db)):
+    items = [item.dict() for item in request.items]
+    return {
+        "items": resolve_prescription(
+            db, items, top_k=request.top_k, always_alternatives=request.always_alternatives
+        )
+    }
@@ -4,9 +4,8 @@
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List
-from backend.services.vector_search import search_similar_medicines
-from backend.services.drug_api import fetch_drug_summary
+from typing import List, Optional
+from backend.services.lexical_search import hybrid_search
 
 router = APIRouter()
 
@@ -17,11 +16,14 @@ class SearchRequest(BaseModel):
 class SearchResult(BaseModel):
     name: str
     score: float
+    id: Optional[str] = None
+    source: Optional[str] = None
 
+# Scores are reciprocal-rank-fusion scores (higher is better); `source` says
+# whether the dense path ran ("hybrid") or the lexical match was decisive ("lexical")
 @router.post("/similar", response_model=List[SearchResult])
 def find_similar(request: SearchRequest):
-    summary = fetch_drug_summary(request.medicine_name)
-    if not summary or summary == "No data found.":
-        raise HTTPException(status_code=404, detail="Summary not found for the requested medicine")
-    results = search_similar_medicines(query_text=summary, top_k=request.top_k)
-    return results
+    hits, source = hybrid_search(request.medicine_name, top_k=request.top_k)
+    if not hits:
+        raise HTTPException(status_code=404, detail="No medicines match the requested name")
+    return [{**hit, "source": source} for hit in hits]
@@ -2,7 +2,7 @@
 
 # backend/db/models.py
 
-from sqlalchemy import Column, String, Integer, Float, Date
+from sqlalchemy import Column, String, Integer, Float, Date, Index
 from backend.db.database import Base
 
 class Medicine(Base):
@@ -14,3 +14,16 @@ class Medicine(Base):
     quantity = Column(Integer, default=0)
     price = Column(Float, nullable=False)
     expiry_date = Column(Date, nullable=False)
+
+
+class MedicineNeighbor(Base):
+    """Precomputed top-K similar medicines (see backend/services/neighbor_graph.py)."""
+    __tablename__ = "medicine_neighbors"
+
+    medicine_id = Column(String, primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    neighbor_id = Column(String, nullable=False, index=True)
+    score = Column(Float, nullable=False)
+
+    # Covers "first and k-th entry of every list" reads without touching the table
+    __table_args__ = (Index("ix_medicine_neighbors_rank", "rank", "medicine_id", "score"),)
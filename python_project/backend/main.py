@@ -4,10 +4,11 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from backend.api import inventory, search
+from backend.api import inventory, search, prescriptions
 
 app = FastAPI(title="PharmaAssist Backend")
 from backend.api import ocr_api
+from backend.services.http_client import get_client
 
 # CORS middleware (allow frontend to talk to backend)
 app.add_middleware(
@@ -22,7 +23,13 @@ app.add_middleware(
 app.include_router(inventory.router, prefix="/inventory", tags=["Inventory"])
 app.include_router(search.router, prefix="/search", tags=["Vector Search"])
 app.include_router(ocr_api.router, prefix="/ocr")
+app.include_router(prescriptions.router, prefix="/prescriptions", tags=["Prescriptions"])
 
 @app.get("/")
 def read_root():
     return {"message": "PharmaAssist API is running."}
+
+@app.get("/metrics/upstream")
+def upstream_metrics():
+    """Per-host latency, error, retry and circuit-breaker stats for outbound calls."""
+    return get_client().metrics()
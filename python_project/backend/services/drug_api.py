@@ -1,55 +1,253 @@
 # drug_info_pipeline.py
 
-import requests
+import logging
 import time
-import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from backend.services.http_client import UpstreamError, get_client
+
+logger = logging.getLogger(__name__)
+
+WIKIPEDIA_API = "https://en.wikipedia.org/w/api.php"
+PUBCHEM_REST = "https://pubchem.ncbi.nlm.nih.gov/rest/pug"
+OPENFDA_LABELS = "https://api.fda.gov/drug/label.json"
+
+# Batch sizes: MediaWiki returns at most 20 intro extracts per query; the
+# others keep URLs well under server limits
+WIKIPEDIA_BATCH = 20
+PUBCHEM_CID_BATCH = 100
+OPENFDA_BATCH = 10
+OPENFDA_LIMIT = 100
+# PubChem's name->CID lookup takes one name per request and allows 5 requests/s
+PUBCHEM_NAME_WORKERS = 5
 
 # 1. Wikipedia API
 
 def fetch_from_wikipedia(drug_name):
-    url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{drug_name.replace(' ', '_')}"
+    url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{quote(drug_name.replace(' ', '_'))}"
     try:
-        res = requests.get(url, timeout=10)
+        res = get_client().get(url)
         if res.status_code == 200:
-            data = res.json()
-            return data.get("extract")
-    except Exception as e:
-        print(f"Wikipedia error: {e}")
+            return res.json().get("extract")
+    except (UpstreamError, ValueError) as e:
+        logger.warning("Wikipedia lookup failed for %r: %s", drug_name, e)
     return None
 
 # 2. PubChem PUG REST API
 
 def fetch_from_pubchem(drug_name):
+    client = get_client()
     try:
-        cid_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{drug_name}/cids/JSON"
-        cid_res = requests.get(cid_url, timeout=10).json()
-        cid = cid_res["IdentifierList"]["CID"][0]
+        cid_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{quote(drug_name)}/cids/JSON"
+        cid_res = client.get(cid_url)
+        if cid_res.status_code != 200:
+            return None
+        cid = cid_res.json()["IdentifierList"]["CID"][0]
 
         description_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug_view/data/compound/{cid}/JSON"
-        desc_res = requests.get(description_url, timeout=10).json()
+        desc_res = client.get(description_url)
+        if desc_res.status_code != 200:
+            return None
+        desc_res = desc_res.json()
 
         sections = desc_res["Record"].get("Section", [])
         for section in sections:
             if section.get("TOCHeading") == "Description":
                 for info in section.get("Information", []):
                     return info.get("Value", {}).get("StringWithMarkup", [{}])[0].get("String")
-    except Exception as e:
-        print(f"PubChem error: {e}")
+    except (UpstreamError, ValueError, KeyError, IndexError) as e:
+        logger.warning("PubChem lookup failed for %r: %s", drug_name, e)
     return None
 
 # 3. OpenFDA Drug Labeling API
 
 def fetch_from_openfda(drug_name):
     try:
-        url = f"https://api.fda.gov/drug/label.json?search=openfda.brand_name:{drug_name.lower()}&limit=1"
-        res = requests.get(url, timeout=10).json()
-        results = res.get("results", [])
+        url = "https://api.fda.gov/drug/label.json"
+        res = get_client().get(url, params={"search": f"openfda.brand_name:{drug_name.lower()}", "limit": 1})
+        if res.status_code != 200:
+            return None
+        results = res.json().get("results", [])
         if results:
             return results[0].get("description", [None])[0]
-    except Exception as e:
-        print(f"OpenFDA error: {e}")
+    except (UpstreamError, ValueError) as e:
+        logger.warning("OpenFDA lookup failed for %r: %s", drug_name, e)
+    return None
+
+# Batch lookups
+
+def _chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def fetch_many_from_wikipedia(drug_names):
+    """
+    Intro extracts for many articles, WIKIPEDIA_BATCH titles per MediaWiki
+    query. Title normalization and redirects are followed back to the
+    requested names.
+
+    Returns:
+        dict: drug name -> extract, for names with an article.
+    """
+    found = {}
+    for chunk in _chunked(list(drug_names), WIKIPEDIA_BATCH):
+        params = {
+            "action": "query",
+            "prop": "extracts",
+            "exintro": 1,
+            "explaintext": 1,
+            "exlimit": "max",
+            "redirects": 1,
+            "titles": "|".join(chunk),
+            "format": "json",
+            "formatversion": 2,
+        }
+        try:
+            res = get_client().get(WIKIPEDIA_API, params=params)
+            if res.status_code != 200:
+                continue
+            query = res.json().get("query", {})
+        except (UpstreamError, ValueError) as e:
+            logger.warning("Wikipedia batch lookup failed for %d names: %s", len(chunk), e)
+            continue
+
+        renamed = {}
+        for step in ("normalized", "redirects"):
+            for entry in query.get(step, []):
+                renamed[entry["from"]] = entry["to"]
+        extracts = {
+            page["title"]: page.get("extract")
+            for page in query.get("pages", [])
+            if not page.get("missing") and page.get("extract")
+        }
+        for name in chunk:
+            title = name
+            while title in renamed and renamed[title] != title:
+                title = renamed[title]
+            if title in extracts:
+                found[name] = extracts[title]
+    return found
+
+
+def _pubchem_cid(drug_name):
+    try:
+        res = get_client().get(f"{PUBCHEM_REST}/compound/name/{quote(drug_name)}/cids/JSON")
+        if res.status_code == 200:
+            return res.json()["IdentifierList"]["CID"][0]
+    except (UpstreamError, ValueError, KeyError, IndexError) as e:
+        logger.warning("PubChem CID lookup failed for %r: %s", drug_name, e)
     return None
 
+
+def fetch_many_from_pubchem(drug_names):
+    """
+    Descriptions for many compounds. Names are resolved to CIDs concurrently
+    (PUG REST takes one name per request), then the descriptions of up to
+    PUBCHEM_CID_BATCH CIDs come back from a single request to the compact
+    /description endpoint instead of one full pug_view record per drug.
+
+    Returns:
+        dict: drug name -> description, for names PubChem knows.
+    """
+    drug_names = list(drug_names)
+    if not drug_names:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(PUBCHEM_NAME_WORKERS, len(drug_names))) as pool:
+        cids = dict(zip(drug_names, pool.map(_pubchem_cid, drug_names)))
+
+    names_by_cid = {}
+    for name, cid in cids.items():
+        if cid is not None:
+            names_by_cid.setdefault(cid, []).append(name)
+
+    found = {}
+    for chunk in _chunked(list(names_by_cid), PUBCHEM_CID_BATCH):
+        try:
+            res = get_client().get(f"{PUBCHEM_REST}/compound/cid/{','.join(map(str, chunk))}/description/JSON")
+            if res.status_code != 200:
+                continue
+            information = res.json()["InformationList"]["Information"]
+        except (UpstreamError, ValueError, KeyError) as e:
+            logger.warning("PubChem description lookup failed for %d CIDs: %s", len(chunk), e)
+            continue
+        # The first entry per CID is only the title; take the first real description
+        for info in information:
+            description = info.get("Description")
+            for name in names_by_cid.get(info.get("CID"), []):
+                if description and name not in found:
+                    found[name] = description
+    return found
+
+
+def _openfda_query(names, limit):
+    terms = " ".join(f'openfda.brand_name:"{name.lower()}"' for name in names)
+    res = get_client().get(OPENFDA_LABELS, params={"search": terms, "limit": limit})
+    # OpenFDA answers 404 when nothing matches
+    if res.status_code == 404:
+        return [], 0
+    if res.status_code != 200:
+        return None, 0
+    body = res.json()
+    return body.get("results", []), body.get("meta", {}).get("results", {}).get("total", 0)
+
+
+def fetch_many_from_openfda(drug_names):
+    """
+    Label descriptions for many brand names, OPENFDA_BATCH names per OR
+    query. Names a crowded batch page left out are retried one by one.
+
+    Returns:
+        dict: drug name -> description, for brands with a label.
+    """
+    found = {}
+    for chunk in _chunked(list(drug_names), OPENFDA_BATCH):
+        wanted = {name.lower(): name for name in chunk}
+        try:
+            results, total = _openfda_query(chunk, OPENFDA_LIMIT)
+        except (UpstreamError, ValueError) as e:
+            logger.warning("OpenFDA batch lookup failed for %d names: %s", len(chunk), e)
+            continue
+        if results is None:
+            continue
+
+        for label in results:
+            description = label.get("description", [None])[0]
+            if not description:
+                continue
+            for brand in label.get("openfda", {}).get("brand_name", []):
+                name = wanted.get(brand.lower())
+                if name and name not in found:
+                    found[name] = description
+
+        if total > len(results):
+            for name in chunk:
+                if name not in found:
+                    summary = fetch_from_openfda(name)
+                    if summary:
+                        found[name] = summary
+    return found
+
+
+def fetch_drug_summaries(drug_names):
+    """
+    Batch counterpart of fetch_drug_summary: the same Wikipedia -> PubChem ->
+    OpenFDA fallback, but each source is asked about all remaining names at
+    once, so a hundred drugs cost a handful of requests per source.
+
+    Returns:
+        dict: drug name -> summary. Names no source knows are omitted.
+    """
+    remaining = list(dict.fromkeys(name for name in drug_names if name))
+    summaries = {}
+    for source in (fetch_many_from_wikipedia, fetch_many_from_pubchem, fetch_many_from_openfda):
+        if not remaining:
+            break
+        summaries.update(source(remaining))
+        remaining = [name for name in remaining if name not in summaries]
+    return summaries
+
 # Fallback orchestrator
 
 def fetch_drug_summary(drug_name):
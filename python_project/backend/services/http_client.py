@@ -0,0 +1,346 @@
+# backend/services/http_client.py
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+# Methods safe to send twice; others are retried only when the caller says so
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+LATENCY_SAMPLES = 512
+
+
+# ------------------------------
+# Errors
+# ------------------------------
+class UpstreamError(Exception):
+    """An outbound call could not be completed."""
+
+    def __init__(self, host, message):
+        super().__init__(f"{host}: {message}")
+        self.host = host
+
+
+class CircuitOpenError(UpstreamError):
+    """The host is marked unhealthy; the call was not attempted."""
+
+
+class RateLimitedError(UpstreamError):
+    """No rate-limit token became available within the call's deadline."""
+
+
+# ------------------------------
+# Per-host policy
+# ------------------------------
+@dataclass(frozen=True)
+class HostPolicy:
+    rate: float = 10.0              # sustained requests per second
+    burst: int = 10                 # token bucket capacity
+    timeout: tuple = (3.05, 10)     # (connect, read) seconds
+    max_retries: int = 2
+    backoff_base: float = 0.2       # seconds; full jitter up to base * 2**attempt
+    backoff_cap: float = 2.0
+    failure_threshold: int = 5      # consecutive failures that open the breaker
+    reset_timeout: float = 30.0     # seconds open before a half-open probe
+    pool_size: int = 10
+
+
+DEFAULT_POLICY = HostPolicy()
+
+# Limits follow each provider's published fair-use guidance
+HOST_POLICIES = {
+    "en.wikipedia.org": HostPolicy(rate=20, burst=20),
+    "pubchem.ncbi.nlm.nih.gov": HostPolicy(rate=5, burst=5),
+    "api.fda.gov": HostPolicy(rate=4, burst=8),
+    "rxnav.nlm.nih.gov": HostPolicy(rate=20, burst=20, timeout=(3.05, 3), max_retries=1),
+}
+
+
+# ------------------------------
+# Building blocks
+# ------------------------------
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait):
+        """Takes one token, sleeping up to max_wait seconds for it. Returns False on timeout."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures; open ->
+    half-open after `reset_timeout`, letting one probe through; the probe's
+    outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def abandon(self):
+        """Releases a half-open probe slot that was granted but never used."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class RetryBudget:
+    """
+    Process-wide cap on retries: every first attempt deposits `ratio` tokens
+    (up to `max_tokens`) and every retry spends one, so retries can never
+    exceed roughly `ratio` of the traffic during an outage.
+    """
+
+    def __init__(self, ratio=0.2, min_tokens=10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = float(min_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class HostMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.rate_limited = 0
+        self.status_counts = {}
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    def observe(self, latency, status=None, failed=False):
+        with self._lock:
+            self._latencies.append(latency)
+            if status is not None:
+                self.status_counts[str(status)] = self.status_counts.get(str(status), 0) + 1
+            if failed:
+                self.failures += 1
+
+    def count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "short_circuited": self.short_circuited,
+                "rate_limited": self.rate_limited,
+                "status_counts": dict(self.status_counts),
+            }
+        if latencies:
+            stats["latency_ms"] = {
+                "p50": round(latencies[len(latencies) // 2] * 1000, 1),
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+                "max": round(latencies[-1] * 1000, 1),
+            }
+        return stats
+
+
+class _Host:
+    def __init__(self, name, policy):
+        self.name = name
+        self.policy = policy
+        self.bucket = TokenBucket(policy.rate, policy.burst)
+        self.breaker = CircuitBreaker(policy.failure_threshold, policy.reset_timeout)
+        self.metrics = HostMetrics()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=policy.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+
+# ------------------------------
+# Client
+# ------------------------------
+class ResilientClient:
+    """
+    Outbound HTTP for the backend: one keep-alive pool, token bucket, circuit
+    breaker and metrics per host, with jittered retries drawn from a shared
+    retry budget. Retries cover connection errors, timeouts and 429/5xx, for
+    idempotent methods unless a call passes retry=True.
+    """
+
+    def __init__(self, policies=None, default_policy=DEFAULT_POLICY, retry_budget=None):
+        self.policies = dict(HOST_POLICIES if policies is None else policies)
+        self.default_policy = default_policy
+        self.retry_budget = retry_budget or RetryBudget()
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        name = urlsplit(url).hostname or ""
+        with self._lock:
+            if name not in self._hosts:
+                self._hosts[name] = _Host(name, self.policies.get(name, self.default_policy))
+            return self._hosts[name]
+
+    def request(self, method, url, retry=None, **kwargs):
+        """
+        Sends a request and returns the final response (any status below 500
+        other than 429 counts as a healthy answer). `retry` defaults to
+        whether the method is idempotent.
+
+        Raises:
+            CircuitOpenError: the host is unhealthy; nothing was sent.
+            RateLimitedError: the host's rate limit left no token in time.
+            UpstreamError: every allowed attempt failed.
+        """
+        host = self._host(url)
+        policy = host.policy
+        timeout = kwargs.setdefault("timeout", policy.timeout)
+        # requests takes a single number or a (connect, read) pair; the rate limit waits at most the connect part
+        if timeout is None:
+            max_wait = policy.timeout[0]
+        else:
+            max_wait = timeout if isinstance(timeout, (int, float)) else timeout[0]
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        max_retries = policy.max_retries if retry else 0
+        self.retry_budget.deposit()
+
+        attempt = 0
+        while True:
+            if not host.breaker.allow():
+                host.metrics.count("short_circuited")
+                raise CircuitOpenError(host.name, "circuit open")
+            if not host.bucket.acquire(max_wait=max_wait):
+                host.metrics.count("rate_limited")
+                host.breaker.abandon()
+                raise RateLimitedError(host.name, "rate limit exceeded")
+
+            host.metrics.count("requests")
+            start = time.monotonic()
+            response, error = None, None
+            try:
+                response = host.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except requests.RequestException as e:
+                # Malformed requests say nothing about the host's health
+                host.breaker.abandon()
+                raise UpstreamError(host.name, str(e)) from e
+            latency = time.monotonic() - start
+
+            retryable = error is not None or response.status_code in RETRY_STATUSES
+            host.metrics.observe(latency, None if response is None else response.status_code, failed=retryable)
+            if not retryable:
+                host.breaker.record_success()
+                return response
+            host.breaker.record_failure()
+            if host.breaker.state == "open":
+                logger.warning("Circuit open for %s; failing fast for %gs", host.name, policy.reset_timeout)
+
+            if attempt >= max_retries or not self.retry_budget.try_spend():
+                if error is not None:
+                    raise UpstreamError(host.name, str(error)) from error
+                return response
+
+            attempt += 1
+            host.metrics.count("retries")
+            time.sleep(self._backoff(policy, attempt, response))
+
+    @staticmethod
+    def _backoff(policy, attempt, response):
+        delay = random.uniform(0, min(policy.backoff_cap, policy.backoff_base * 2 ** attempt))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), policy.backoff_cap))
+        return delay
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def metrics(self):
+        """Per-host counters, latency percentiles and breaker state."""
+        with self._lock:
+            hosts = list(self._hosts.values())
+        return {
+            host.name: {**host.metrics.snapshot(), "breaker": host.breaker.state}
+            for host in hosts
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the process-wide outbound client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ResilientClient()
+        return _client
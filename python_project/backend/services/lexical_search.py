@@ -0,0 +1,248 @@
+# backend/services/lexical_search.py
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+from backend.db import models
+from backend.db.database import SessionLocal
+from backend.services.drug_api import fetch_drug_summary
+from backend.services.vector_search import get_backend, search_similar_medicines_batch
+
+SYNONYMS_FILE = os.environ.get(
+    "MEDICINE_SYNONYMS_FILE", os.path.join(os.path.dirname(__file__), "synonyms.json")
+)
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+# Name and synonym terms count this many times, so a name hit outweighs a passing mention in a summary
+NAME_WEIGHT = 3
+# Reciprocal rank fusion constant (60 is the value from the original RRF paper)
+RRF_K = 60
+# An exact name/synonym hit must outscore the best other hit by this factor to skip the dense path
+DECISIVE_MARGIN = 2.0
+CANDIDATE_FACTOR = 2
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def load_synonym_groups(path=SYNONYMS_FILE):
+    """
+    Reads {"generic": ["brand", ...]} and returns one group per entry, each a
+    list of token tuples (generic first). Missing files mean no synonyms.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        mapping = json.load(f)
+    return [
+        [tuple(tokenize(term)) for term in [generic, *brands] if tokenize(term)]
+        for generic, brands in mapping.items()
+    ]
+
+
+# ------------------------------
+# Inverted index
+# ------------------------------
+class BM25Index:
+    """
+    In-memory BM25 inverted index over medicine names, synonyms and summaries.
+
+    Each medicine is one document. Name and synonym terms are weighted by
+    NAME_WEIGHT; a medicine picks up every term of a synonym group whose
+    member appears in its name, so "Crocin" finds "Paracetamol 500mg".
+    """
+
+    def __init__(self, synonym_groups=()):
+        self._groups = list(synonym_groups)
+        self._postings = defaultdict(dict)   # term -> {doc_id: weighted tf}
+        self._doc_terms = {}                 # doc_id -> Counter, for removal
+        self._doc_len = {}
+        self._name_terms = {}                # doc_id -> set of name + synonym terms
+        self._names = {}
+        self._total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def _synonym_terms(self, name_tokens):
+        name_set = set(name_tokens)
+        terms = []
+        for group in self._groups:
+            if any(set(phrase) <= name_set for phrase in group):
+                terms.extend(token for phrase in group for token in phrase)
+        return terms
+
+    def add(self, doc_id, name, summary=""):
+        """Indexes a medicine, replacing any previous version of it."""
+        name_tokens = tokenize(name)
+        name_terms = name_tokens + self._synonym_terms(name_tokens)
+        terms = Counter(tokenize(summary))
+        for term in name_terms:
+            terms[term] += NAME_WEIGHT
+
+        with self._lock:
+            self._remove(doc_id)
+            for term, tf in terms.items():
+                self._postings[term][doc_id] = tf
+            self._doc_terms[doc_id] = terms
+            self._doc_len[doc_id] = sum(terms.values())
+            self._name_terms[doc_id] = set(name_terms)
+            self._names[doc_id] = name
+            self._total_len += self._doc_len[doc_id]
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(doc_id)
+        self._name_terms.pop(doc_id, None)
+        self._names.pop(doc_id, None)
+
+    def search(self, query, top_k=5):
+        """
+        Returns up to top_k hits as {"id", "name", "score", "exact"}, best
+        first. `exact` means every query term is in the medicine's name or
+        synonyms.
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return []
+
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if not n_docs:
+                return []
+            avg_len = self._total_len / n_docs
+            scores = defaultdict(float)
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = K1 * (1 - B + B * self._doc_len[doc_id] / avg_len)
+                    scores[doc_id] += idf * tf * (K1 + 1) / (tf + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            return [
+                {
+                    "id": doc_id,
+                    "name": self._names[doc_id],
+                    "score": score,
+                    "exact": all(term in self._name_terms[doc_id] for term in query_terms),
+                }
+                for doc_id, score in ranked
+            ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Returns the process-wide index, built on first use from the inventory
+    names and the summaries already stored in the vector index.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = BM25Index(load_synonym_groups())
+            db = SessionLocal()
+            try:
+                names = dict(db.query(models.Medicine.id, models.Medicine.name))
+            finally:
+                db.close()
+
+            for ids, _, documents in get_backend().iter_documents():
+                for mid, document in zip(ids, documents):
+                    if mid in names:
+                        index.add(mid, names.pop(mid), document or "")
+            # Medicines that never made it into the vector index are searchable by name
+            for mid, name in names.items():
+                index.add(mid, name)
+            _index = index
+        return _index
+
+
+# ------------------------------
+# Inventory hooks
+# ------------------------------
+def index_medicine(medicine_id, name, summary=""):
+    get_index().add(medicine_id, name, summary or "")
+
+
+def remove_medicine(medicine_id):
+    get_index().remove(medicine_id)
+
+
+# ------------------------------
+# Hybrid search
+# ------------------------------
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Fuses ranked lists of {"id", "name", ...} hits.
+
+    Returns:
+        list of dicts: {"id", "name", "score"} ordered by fused score
+        (higher is better).
+    """
+    fused = {}
+    names = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking):
+            fused[hit["id"]] = fused.get(hit["id"], 0.0) + 1.0 / (k + rank + 1)
+            names.setdefault(hit["id"], hit["name"])
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return [{"id": mid, "name": names[mid], "score": score} for mid, score in ordered]
+
+
+def _is_decisive(hits):
+    exact = [hit for hit in hits if hit["exact"]]
+    if not exact:
+        return False
+    others = [hit for hit in hits if not hit["exact"]]
+    return not others or exact[0]["score"] >= DECISIVE_MARGIN * others[0]["score"]
+
+
+def hybrid_search(query, top_k=5):
+    """
+    Searches the inventory lexically first. When the query names a medicine
+    outright (an exact name or synonym hit that clearly beats everything
+    else) the BM25 ranking is returned as is, without fetching a summary or
+    embedding anything. Otherwise the query's drug summary is searched in
+    the vector index and both rankings are merged with reciprocal rank fusion.
+
+    Returns:
+        tuple: (hits, source) where hits are {"id", "name", "score"} (higher
+        is better) and source is "lexical" or "hybrid".
+    """
+    lexical = get_index().search(query, top_k * CANDIDATE_FACTOR)
+    if _is_decisive(lexical):
+        return reciprocal_rank_fusion([lexical])[:top_k], "lexical"
+
+    dense = []
+    summary = fetch_drug_summary(query)
+    if summary and summary != "No data found.":
+        dense = search_similar_medicines_batch(query_texts=[summary], top_k=top_k * CANDIDATE_FACTOR)[0]
+    return reciprocal_rank_fusion([lexical, dense])[:top_k], "hybrid"
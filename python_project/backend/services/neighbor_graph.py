@@ -0,0 +1,289 @@
+# backend/services/neighbor_graph.py
+
+import threading
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from backend.db import models
+from backend.services.vector_search import get_backend
+
+# Neighbours kept per medicine; generous because out-of-stock entries are filtered at lookup time
+GRAPH_K = 32
+# Rows per matrix product during a full build (BUILD_BLOCK x catalog similarity scores)
+BUILD_BLOCK = 512
+PAGE_SIZE = 2000
+
+_table_ready = False
+_table_lock = threading.Lock()
+
+
+# ------------------------------
+# Helpers
+# ------------------------------
+def _ensure_table(db: Session):
+    global _table_ready
+    with _table_lock:
+        if not _table_ready:
+            table = models.MedicineNeighbor.__table__
+            table.create(bind=db.get_bind(), checkfirst=True)
+            # Tables created before an index was added do not have it yet
+            for index in table.indexes:
+                index.create(bind=db.get_bind(), checkfirst=True)
+            _table_ready = True
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _distances(queries, rows):
+    # Squared L2 between unit vectors, the same scale the vector backends report
+    return np.maximum(2.0 - 2.0 * (queries @ rows.T), 0.0)
+
+
+def _load_matrix():
+    ids, chunks = [], []
+    for page_ids, _, embeddings in get_backend().iter_embeddings(PAGE_SIZE):
+        ids.extend(page_ids)
+        chunks.append(_normalize(embeddings))
+    if not ids:
+        return [], np.empty((0, 0), dtype=np.float32)
+    return ids, np.vstack(chunks)
+
+
+def _write_lists(db: Session, lists):
+    """Replaces the neighbour lists of the given medicines: {medicine_id: [(neighbor_id, score)]}."""
+    if not lists:
+        return
+    db.query(models.MedicineNeighbor).filter(
+        models.MedicineNeighbor.medicine_id.in_(list(lists))
+    ).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.MedicineNeighbor, [
+        {"medicine_id": mid, "rank": rank, "neighbor_id": neighbor_id, "score": float(score)}
+        for mid, neighbors in lists.items()
+        for rank, (neighbor_id, score) in enumerate(neighbors)
+    ])
+
+
+def _read_lists(db: Session, medicine_ids):
+    lists = {mid: [] for mid in medicine_ids}
+    if not lists:
+        return lists
+    rows = (
+        db.query(models.MedicineNeighbor)
+        .filter(models.MedicineNeighbor.medicine_id.in_(list(lists)))
+        .order_by(models.MedicineNeighbor.medicine_id, models.MedicineNeighbor.rank)
+    )
+    for row in rows:
+        lists[row.medicine_id].append((row.neighbor_id, row.score))
+    return lists
+
+
+def _list_bounds(db: Session, k):
+    """
+    Returns {medicine_id: worst score} for every medicine with a list; lists
+    shorter than k take any neighbour, so their bound is infinite. Reads
+    only ranks 0 and k - 1 through the rank index.
+    """
+    bounds = {}
+    rows = db.query(
+        models.MedicineNeighbor.medicine_id, models.MedicineNeighbor.rank, models.MedicineNeighbor.score
+    ).filter(models.MedicineNeighbor.rank.in_([0, k - 1]))
+    for mid, rank, score in rows:
+        if rank == k - 1:
+            bounds[mid] = score
+        else:
+            bounds.setdefault(mid, np.inf)
+    return bounds
+
+
+def _scan_top_k(query_ids, queries, k, on_page=None):
+    """
+    Streams the whole index once and keeps the k nearest rows for each query.
+    `on_page(page_ids, distances)` sees every page's distance matrix on the way.
+
+    Returns:
+        dict: query id -> [(neighbor_id, score)] sorted by score.
+    """
+    query_keys = np.asarray(query_ids, dtype=object)
+    best_d = np.empty((len(query_ids), 0), dtype=np.float32)
+    best_ids = np.empty((len(query_ids), 0), dtype=object)
+
+    for page_ids, _, embeddings in get_backend().iter_embeddings(PAGE_SIZE):
+        page_keys = np.asarray(page_ids, dtype=object)
+        dists = _distances(queries, _normalize(embeddings))
+        dists[query_keys[:, None] == page_keys[None, :]] = np.inf
+        if on_page:
+            on_page(page_keys, dists)
+
+        all_d = np.hstack([best_d, dists])
+        all_ids = np.hstack([best_ids, np.broadcast_to(page_keys, dists.shape)])
+        if all_d.shape[1] > k:
+            keep = np.argpartition(all_d, k - 1, axis=1)[:, :k]
+            all_d = np.take_along_axis(all_d, keep, axis=1)
+            all_ids = np.take_along_axis(all_ids, keep, axis=1)
+        best_d, best_ids = all_d, all_ids
+
+    lists = {}
+    for qid, row_d, row_ids in zip(query_ids, best_d, best_ids):
+        order = np.argsort(row_d, kind="stable")
+        lists[qid] = [(row_ids[i], float(row_d[i])) for i in order if np.isfinite(row_d[i])]
+    return lists
+
+
+# ------------------------------
+# Build
+# ------------------------------
+def build_graph(db: Session, k=GRAPH_K, progress=None):
+    """
+    Rebuilds the whole graph from the active vector index with blocked
+    matrix products: each block of BUILD_BLOCK rows is scored against the
+    full catalog at once and reduced to its top k with argpartition.
+
+    Returns:
+        int: Number of medicines in the graph.
+    """
+    _ensure_table(db)
+    ids, matrix = _load_matrix()
+    db.query(models.MedicineNeighbor).delete(synchronize_session=False)
+
+    n = len(ids)
+    k = min(k, n - 1)
+    for start in range(0, n if k > 0 else 0, BUILD_BLOCK):
+        end = min(start + BUILD_BLOCK, n)
+        dists = _distances(matrix[start:end], matrix)
+        dists[np.arange(end - start), np.arange(start, end)] = np.inf
+
+        top = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        top_d = np.take_along_axis(dists, top, axis=1)
+        order = np.argsort(top_d, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_d = np.take_along_axis(top_d, order, axis=1)
+
+        db.bulk_insert_mappings(models.MedicineNeighbor, [
+            {"medicine_id": ids[start + i], "rank": rank, "neighbor_id": ids[col], "score": float(score)}
+            for i in range(end - start)
+            for rank, (col, score) in enumerate(zip(top[i], top_d[i]))
+        ])
+        if progress:
+            progress(end)
+
+    db.commit()
+    return n
+
+
+# ------------------------------
+# Incremental maintenance
+# ------------------------------
+def refresh_medicine(db: Session, medicine_id, k=GRAPH_K):
+    """
+    Updates the graph after one medicine was added or re-embedded, in a
+    single pass over the index:
+
+    - its own list is recomputed;
+    - lists that already held it are recomputed, since its old position may
+      have hidden a neighbour that now deserves the slot;
+    - every other list it now belongs in gets it merged in (their k-th
+      entry is evicted). Each list's k-th score comes from the rank index,
+      and only the lists it enters are read in full.
+
+    Medicines without a list are left alone; `build_graph` covers them.
+    """
+    _ensure_table(db)
+    embedding = get_backend().get_embeddings([medicine_id]).get(medicine_id)
+    if embedding is None:
+        remove_medicine(db, medicine_id)
+        return
+
+    holders = [
+        mid for (mid,) in db.query(models.MedicineNeighbor.medicine_id)
+        .filter(models.MedicineNeighbor.neighbor_id == medicine_id)
+        if mid != medicine_id
+    ]
+    embeddings = get_backend().get_embeddings(holders)
+    query_ids = [medicine_id] + [mid for mid in holders if mid in embeddings]
+    queries = _normalize([embedding] + [embeddings[mid] for mid in query_ids[1:]])
+    bounds = _list_bounds(db, k)
+    held_by = set(holders)
+    entering = {}
+
+    def collect_entries(page_keys, dists):
+        # Row 0 holds the updated medicine's distance to every row of the page
+        for other, dist in zip(page_keys, dists[0]):
+            if other not in held_by and dist < bounds.get(other, -np.inf):
+                entering[other] = float(dist)
+
+    lists = _scan_top_k(query_ids, queries, k, on_page=collect_entries)
+    for other, neighbors in _read_lists(db, entering).items():
+        neighbors.append((medicine_id, entering[other]))
+        lists[other] = sorted(neighbors, key=lambda pair: pair[1])[:k]
+
+    _write_lists(db, lists)
+    db.commit()
+
+
+def remove_medicine(db: Session, medicine_id, k=GRAPH_K):
+    """
+    Drops a deleted medicine from the graph. Lists that pointed at it lose
+    an entry, so they are recomputed (after the vector itself is gone).
+    """
+    _ensure_table(db)
+    holders = [
+        mid for (mid,) in db.query(models.MedicineNeighbor.medicine_id)
+        .filter(models.MedicineNeighbor.neighbor_id == medicine_id)
+        if mid != medicine_id
+    ]
+    db.query(models.MedicineNeighbor).filter(
+        models.MedicineNeighbor.medicine_id == medicine_id
+    ).delete(synchronize_session=False)
+
+    embeddings = get_backend().get_embeddings(holders)
+    query_ids = [mid for mid in holders if mid in embeddings]
+    if query_ids:
+        queries = _normalize([embeddings[mid] for mid in query_ids])
+        lists = _scan_top_k(query_ids, queries, k)
+        lists = {mid: [pair for pair in neighbors if pair[0] != medicine_id] for mid, neighbors in lists.items()}
+        _write_lists(db, lists)
+    db.commit()
+
+
+# ------------------------------
+# Lookup
+# ------------------------------
+def in_stock_neighbors(db: Session, medicine_ids):
+    """
+    Returns the in-stock neighbours of each medicine, best first, as one
+    indexed join between the graph and the inventory.
+
+    Returns:
+        dict: medicine_id -> list of (Medicine, score). Medicines missing
+        from the graph are absent, so callers can fall back to vector search.
+    """
+    medicine_ids = list(medicine_ids)
+    if not medicine_ids:
+        return {}
+    _ensure_table(db)
+
+    graphed = {
+        mid for (mid,) in db.query(models.MedicineNeighbor.medicine_id).filter(
+            models.MedicineNeighbor.medicine_id.in_(medicine_ids),
+            models.MedicineNeighbor.rank == 0,
+        )
+    }
+    neighbors = {mid: [] for mid in graphed}
+    if not graphed:
+        return neighbors
+
+    rows = (
+        db.query(models.MedicineNeighbor.medicine_id, models.MedicineNeighbor.score, models.Medicine)
+        .join(models.Medicine, models.Medicine.id == models.MedicineNeighbor.neighbor_id)
+        .filter(models.MedicineNeighbor.medicine_id.in_(graphed), models.Medicine.quantity > 0)
+        .order_by(models.MedicineNeighbor.medicine_id, models.MedicineNeighbor.rank)
+    )
+    for mid, score, med in rows:
+        neighbors[mid].append((med, score))
+    return neighbors
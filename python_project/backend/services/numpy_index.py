@@ -0,0 +1,275 @@
+# backend/services/numpy_index.py
+
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from backend.services.vector_search import VectorBackend
+
+INITIAL_CAPACITY = 1024
+INT8_SCALE = 127.0
+# Rows scored per matrix product; keeps the float32 decode of int8 blocks cache-sized
+SCAN_BLOCK = 4096
+
+
+class NumpyBackend(VectorBackend):
+    """
+    Exact kNN over one contiguous, memory-mapped matrix of normalized vectors.
+
+    Layout under `path`:
+        vectors.npy  rows x dim matrix (float32, or int8 scaled by 127)
+        slots.db     SQLite map of slot -> (id, name, document)
+
+    Deleted rows go on a free-list (slots with a NULL id) and are reused by
+    the next insert, so the matrix only grows when every slot is taken.
+    Capacity doubles on growth. The index lives in the process that opened
+    it: run a single writer per index directory.
+    """
+
+    def __init__(self, path, embed, dtype="float32"):
+        if dtype not in ("float32", "int8"):
+            raise ValueError("dtype must be float32 or int8")
+        self.path = path
+        self.embed = embed
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+
+        self._db = sqlite3.connect(os.path.join(path, "slots.db"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS slots ("
+            " slot INTEGER PRIMARY KEY, id TEXT UNIQUE, name TEXT, document TEXT)"
+        )
+        self._db.commit()
+
+        self._matrix = None
+        self._load()
+
+    # ------------------------------
+    # Storage
+    # ------------------------------
+    @property
+    def _matrix_path(self):
+        return os.path.join(self.path, "vectors.npy")
+
+    def _load(self):
+        self._slot_of = {}
+        self._id_of = {}
+        self._name_of = {}
+        self._free = []
+        for slot, mid, name in self._db.execute("SELECT slot, id, name FROM slots ORDER BY slot"):
+            if mid is None:
+                self._free.append(slot)
+            else:
+                self._slot_of[mid] = slot
+                self._id_of[slot] = mid
+                self._name_of[slot] = name
+        self._next_slot = (max(self._id_of.keys() | set(self._free)) + 1) if (self._id_of or self._free) else 0
+
+        if os.path.exists(self._matrix_path):
+            self._matrix = np.load(self._matrix_path, mmap_mode="r+")
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        self._live = np.zeros(max(capacity, self._next_slot), dtype=bool)
+        for slot in self._id_of:
+            self._live[slot] = True
+
+    def _ensure_capacity(self, dim, rows_needed):
+        if self._matrix is not None and self._matrix.shape[1] != dim:
+            raise ValueError(f"Index has dimension {self._matrix.shape[1]}, got {dim}")
+
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if rows_needed <= capacity:
+            return
+
+        new_capacity = max(INITIAL_CAPACITY, capacity)
+        while new_capacity < rows_needed:
+            new_capacity *= 2
+
+        tmp_path = self._matrix_path + ".grow"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=self.dtype, shape=(new_capacity, dim))
+        if self._matrix is not None:
+            grown[:capacity] = self._matrix
+            self._matrix.flush()
+        grown.flush()
+        del grown
+        # Windows cannot replace a file that is still memory-mapped
+        self._matrix = None
+        os.replace(tmp_path, self._matrix_path)
+        self._matrix = np.load(self._matrix_path, mmap_mode="r+")
+
+        live = np.zeros(new_capacity, dtype=bool)
+        live[: len(self._live)] = self._live
+        self._live = live
+
+    def _encode(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        if self.dtype == np.int8:
+            return np.clip(np.rint(vectors * INT8_SCALE), -127, 127).astype(np.int8)
+        return vectors
+
+    def _decode(self, rows):
+        if self.dtype == np.int8:
+            return rows.astype(np.float32) / INT8_SCALE
+        return np.asarray(rows, dtype=np.float32)
+
+    # ------------------------------
+    # VectorBackend
+    # ------------------------------
+    def upsert(self, ids, names, documents):
+        documents = [doc or "" for doc in documents]
+        self.upsert_embeddings(ids, names, documents, self.embed(documents))
+
+    def upsert_embeddings(self, ids, names, documents, embeddings):
+        ids = list(ids)
+        if not ids:
+            return
+        names, documents = list(names), list(documents)
+        encoded = self._encode(embeddings)
+
+        # An id repeated within the batch gets one slot; the last occurrence wins
+        last = {mid: i for i, mid in enumerate(ids)}
+        if len(last) < len(ids):
+            keep = sorted(last.values())
+            ids = [ids[i] for i in keep]
+            names = [names[i] for i in keep]
+            documents = [documents[i] for i in keep]
+            encoded = encoded[keep]
+
+        with self._lock:
+            slots = []
+            for mid in ids:
+                if mid in self._slot_of:
+                    slots.append(self._slot_of[mid])
+                elif self._free:
+                    slots.append(self._free.pop())
+                else:
+                    slots.append(self._next_slot)
+                    self._next_slot += 1
+
+            self._ensure_capacity(encoded.shape[1], max(slots) + 1)
+            self._matrix[slots] = encoded
+            self._matrix.flush()
+
+            self._db.executemany(
+                "INSERT OR REPLACE INTO slots (slot, id, name, document) VALUES (?, ?, ?, ?)",
+                [(slot, mid, name, doc or "") for slot, mid, name, doc in zip(slots, ids, names, documents)],
+            )
+            self._db.commit()
+
+            for slot, mid, name in zip(slots, ids, names):
+                self._slot_of[mid] = slot
+                self._id_of[slot] = mid
+                self._name_of[slot] = name
+                self._live[slot] = True
+
+    def delete(self, ids):
+        with self._lock:
+            slots = [self._slot_of.pop(mid) for mid in ids if mid in self._slot_of]
+            if not slots:
+                return
+            self._db.executemany(
+                "UPDATE slots SET id = NULL, name = NULL, document = NULL WHERE slot = ?",
+                [(slot,) for slot in slots],
+            )
+            self._db.commit()
+            for slot in slots:
+                self._id_of.pop(slot, None)
+                self._name_of.pop(slot, None)
+                self._live[slot] = False
+                self._free.append(slot)
+
+    def get_embeddings(self, ids):
+        with self._lock:
+            found = [(mid, self._slot_of[mid]) for mid in ids if mid in self._slot_of]
+            if not found:
+                return {}
+            rows = self._decode(self._matrix[[slot for _, slot in found]])
+        return {mid: row for (mid, _), row in zip(found, rows)}
+
+    def get_names(self, ids):
+        with self._lock:
+            return {mid: self._name_of[self._slot_of[mid]] for mid in ids if mid in self._slot_of}
+
+    def query(self, query_texts=None, query_embeddings=None, top_k=5):
+        if query_embeddings is None:
+            if not query_texts:
+                return []
+            query_embeddings = self.embed(list(query_texts))
+        if len(query_embeddings) == 0:
+            return []
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            k = min(top_k, len(self._id_of))
+            if self._matrix is None or k <= 0:
+                return [[] for _ in range(len(queries))]
+            used = self._next_slot
+            live = self._live[:used]
+
+            # Cosine similarity of every row, one block at a time; free slots are masked out
+            sims = np.empty((len(queries), used), dtype=np.float32)
+            for start in range(0, used, SCAN_BLOCK):
+                end = min(start + SCAN_BLOCK, used)
+                sims[:, start:end] = queries @ self._decode(self._matrix[start:end]).T
+            sims[:, ~live] = -np.inf
+
+            batches = []
+            for row in sims:
+                top = np.argpartition(-row, k - 1)[:k] if k < used else np.arange(used)
+                top = top[np.argsort(-row[top])][:k]
+                batches.append([
+                    # Squared L2 between unit vectors, to match ChromaDB's distance scale
+                    {"id": self._id_of[slot], "name": self._name_of[slot], "score": float(2.0 - 2.0 * row[slot])}
+                    for slot in top
+                    if live[slot]
+                ])
+        return batches
+
+    def iter_embeddings(self, batch_size=1000):
+        with self._lock:
+            slots = sorted(self._id_of)
+        for start in range(0, len(slots), batch_size):
+            chunk = slots[start:start + batch_size]
+            with self._lock:
+                chunk = [slot for slot in chunk if slot in self._id_of]
+                if not chunk:
+                    continue
+                ids = [self._id_of[slot] for slot in chunk]
+                names = [self._name_of[slot] for slot in chunk]
+                rows = self._decode(self._matrix[chunk])
+            yield ids, names, rows
+
+    def iter_documents(self, batch_size=1000):
+        last_slot = -1
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT slot, id, name, document FROM slots"
+                    " WHERE slot > ? AND id IS NOT NULL ORDER BY slot LIMIT ?",
+                    (last_slot, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_slot = rows[-1][0]
+            yield [row[1] for row in rows], [row[2] for row in rows], [row[3] for row in rows]
+
+    def count(self):
+        with self._lock:
+            return len(self._id_of)
+
+    def get_documents(self, ids):
+        ids = list(ids)
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, document FROM slots WHERE id IN ({placeholders})", ids
+            ).fetchall()
+        return dict(rows)
@@ -1,10 +1,11 @@
 import os
 import cv2
 import json
-import requests
 from google import genai
 from google.genai import types
 
+from backend.services.http_client import UpstreamError, get_client
+
 # 🛡️ Step 0: Check API Key
 # if not os.environ.get("GEMINI_API_KEY"):
 #     raise EnvironmentError("❌ GEMINI_API_KEY environment variable not set.")
@@ -26,11 +27,11 @@ def clean_image(input_path: str, output_path: str) -> None:
 
 # 🌐 Step 2: Validate medicine name via RxNorm API
 def is_valid_medicine(name: str) -> bool:
-    url = f"https://rxnav.nlm.nih.gov/REST/rxcui.json?name={name}"
+    url = "https://rxnav.nlm.nih.gov/REST/rxcui.json"
     try:
-        r = requests.get(url, timeout=3)
+        r = get_client().get(url, params={"name": name})
         return bool(r.json().get("idGroup", {}).get("rxnormId"))
-    except:
+    except (UpstreamError, ValueError):
         return False
 
 # 🔍 Step 3: Validate and clean extracted JSON
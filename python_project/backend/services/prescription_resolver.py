@@ -0,0 +1,156 @@
+# backend/services/prescription_resolver.py
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.db import models
+from backend.services.drug_api import fetch_drug_summaries
+from backend.services.neighbor_graph import in_stock_neighbors
+from backend.services.vector_search import get_medicine_embeddings, search_similar_medicines_batch
+
+# Vector hits are over-fetched because out-of-stock and duplicate names are filtered afterwards
+CANDIDATE_FACTOR = 3
+
+# ------------------------------
+# Helpers
+# ------------------------------
+def _fetch_summaries(names):
+    """Fetches drug summaries for names unknown to the catalog, a few batched requests per source."""
+    if not names:
+        return {}
+    return fetch_drug_summaries(names)
+
+
+def _vector_candidates(catalog_ids, unknown_names, top_k):
+    """
+    Finds similar medicines for every item that needs an alternative.
+
+    Catalog medicines are searched with their stored embeddings in one batched
+    query; names missing from the catalog (or the index) fall back to their
+    fetched summaries in a second batched query.
+
+    Returns:
+        dict: lowercased item key -> list of {"id", "name", "score"}.
+    """
+    n_results = top_k * CANDIDATE_FACTOR
+    candidates = {}
+
+    embeddings = get_medicine_embeddings(list(catalog_ids.values()))
+    keys = [key for key, mid in catalog_ids.items() if mid in embeddings]
+    if keys:
+        batches = search_similar_medicines_batch(
+            query_embeddings=[embeddings[catalog_ids[key]] for key in keys],
+            top_k=n_results,
+        )
+        candidates.update(zip(keys, batches))
+
+    # Catalog medicines that never made it into the index are searched by summary too
+    unknown_names = set(unknown_names) | {key for key, mid in catalog_ids.items() if mid not in embeddings}
+    summaries = _fetch_summaries(list(unknown_names))
+    keys = [name.lower() for name in summaries]
+    if keys:
+        batches = search_similar_medicines_batch(query_texts=list(summaries.values()), top_k=n_results)
+        candidates.update(zip(keys, batches))
+
+    return candidates
+
+
+# ------------------------------
+# Resolver
+# ------------------------------
+def resolve_prescription(db: Session, items, top_k=5, always_alternatives=False):
+    """
+    Resolves a list of prescribed medicines against the inventory.
+
+    Args:
+        db (Session): Database session.
+        items (list[dict]): Each with "name" and "quantity".
+        top_k (int): Maximum number of in-stock alternatives per item.
+        always_alternatives (bool): Also rank alternatives for items that are
+            fully in stock (lets clients recompute availability locally).
+
+    Returns:
+        list of dicts: One entry per item with stock, shortfall and ranked
+        in-stock alternatives.
+    """
+    names = {item["name"].strip().lower() for item in items if item["name"].strip()}
+
+    # One query for every prescribed name
+    stocked = {}
+    if names:
+        rows = db.query(models.Medicine).filter(func.lower(models.Medicine.name).in_(names)).all()
+        for med in rows:
+            stocked.setdefault(med.name.lower(), med)
+
+    needs_alternatives = {}
+    unknown_names = set()
+    for item in items:
+        key = item["name"].strip().lower()
+        med = stocked.get(key)
+        if not key or (med and med.quantity >= item["quantity"] and not always_alternatives):
+            continue
+        if med:
+            needs_alternatives[key] = med.id
+        else:
+            unknown_names.add(item["name"].strip())
+
+    # Catalog medicines read their in-stock neighbours straight from the precomputed graph
+    candidates = {}
+    in_stock = {}
+    graph = in_stock_neighbors(db, set(needs_alternatives.values()))
+    for key, mid in list(needs_alternatives.items()):
+        if mid not in graph:
+            continue
+        candidates[key] = [{"id": alt.id, "name": alt.name, "score": score} for alt, score in graph[mid]]
+        in_stock.update((alt.id, alt) for alt, _ in graph[mid])
+        del needs_alternatives[key]
+
+    # Everything else (ungraphed or unknown names) goes through vector search
+    candidates.update(_vector_candidates(needs_alternatives, unknown_names, top_k))
+
+    # One query for the stock of every vector candidate
+    candidate_ids = {hit["id"] for hits in candidates.values() for hit in hits} - in_stock.keys()
+    if candidate_ids:
+        rows = (
+            db.query(models.Medicine)
+            .filter(models.Medicine.id.in_(candidate_ids), models.Medicine.quantity > 0)
+            .all()
+        )
+        in_stock.update((med.id, med) for med in rows)
+
+    resolved = []
+    for item in items:
+        name = item["name"].strip()
+        key = name.lower()
+        med = stocked.get(key)
+        quantity_in_stock = med.quantity if med else 0
+
+        alternatives = []
+        seen = {key}
+        for hit in candidates.get(key, []):
+            alt = in_stock.get(hit["id"])
+            if not alt or alt.name.lower() in seen:
+                continue
+            seen.add(alt.name.lower())
+            alternatives.append({
+                "id": alt.id,
+                "name": alt.name,
+                "score": hit["score"],
+                "in_stock": alt.quantity,
+                "price": alt.price,
+            })
+            if len(alternatives) >= top_k:
+                break
+
+        resolved.append({
+            "name": name,
+            "requested": item["quantity"],
+            "medicine_id": med.id if med else None,
+            "in_stock": quantity_in_stock,
+            "price": med.price if med else None,
+            "available": quantity_in_stock >= item["quantity"],
+            "shortfall": max(0, item["quantity"] - quantity_in_stock),
+            "alternatives": alternatives,
+        })
+
+    return resolved
@@ -1,54 +1,310 @@
 # backend/services/vector_search.py
 
-import chromadb
-from chromadb.utils import embedding_functions
-from sentence_transformers import SentenceTransformer
-from chromadb.config import Settings 
+import json
+import os
+import threading
+
 # ------------------------------
-# Initialize Embedding Model
+# Configuration
 # ------------------------------
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+COLLECTION_NAME = "medicine_embeddings"
+CHROMA_PATH = "chroma_store"
+ALIAS_FILE = os.path.join(CHROMA_PATH, "aliases.json")
+
+# "chroma" (default) or "numpy" for the in-process exact-kNN index
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma").lower()
+NUMPY_INDEX_PATH = os.environ.get("NUMPY_INDEX_PATH", "vector_index")
+NUMPY_INDEX_DTYPE = os.environ.get("NUMPY_INDEX_DTYPE", "float32")
+
+# Heavy dependencies are loaded on first use, so a NumPy-backed server never
+# pays for ChromaDB and a Chroma-backed one never loads a second model copy
+_embedding_model = None
+_chroma_client = None
+_collections = {}
+_collections_lock = threading.Lock()
+_alias_cache = {"mtime": None, "data": None}
+
+
+def get_embedding_model():
+    global _embedding_model
+    if _embedding_model is None:
+        from sentence_transformers import SentenceTransformer
+
+        _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _embedding_model
+
+
+def get_chroma_client():
+    global _chroma_client
+    if _chroma_client is None:
+        import chromadb
+
+        _chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
+    return _chroma_client
+
+
+def open_collection(name, model_name=None):
+    """
+    Returns a (cached) handle on a named collection. The embedding model is
+    read from the collection's metadata so every version embeds queries with
+    the model it was built with.
+    """
+    from chromadb.utils import embedding_functions
+
+    with _collections_lock:
+        if name in _collections:
+            return _collections[name]
+
+        client = get_chroma_client()
+        if model_name is None:
+            try:
+                existing = client.get_collection(name=name)
+                model_name = (existing.metadata or {}).get("embedding_model", EMBEDDING_MODEL_NAME)
+            except Exception:
+                model_name = EMBEDDING_MODEL_NAME
+
+        handle = client.get_or_create_collection(
+            name=name,
+            embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction(model_name),
+            metadata={"embedding_model": model_name},
+        )
+        _collections[name] = handle
+        return handle
+
 
 # ------------------------------
-# Connect to ChromaDB and Setup Collection
+# Versioned collections behind a persisted alias
 # ------------------------------
-chroma_client = chromadb.PersistentClient(path="chroma_store")
-collection = chroma_client.get_or_create_collection(
-    name="medicine_embeddings",
-    embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction("all-MiniLM-L6-v2")
-)
+def _default_alias():
+    return {"active": COLLECTION_NAME, "previous": None, "building": None}
+
+
+def read_alias():
+    """
+    Returns the alias record {"active", "previous", "building"}. The file is
+    re-read only when its mtime changes, so flips made by the maintenance CLI
+    are picked up by a running server without a restart.
+    """
+    try:
+        mtime = os.stat(ALIAS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return _default_alias()
+
+    if _alias_cache["mtime"] != mtime:
+        with open(ALIAS_FILE, "r", encoding="utf-8") as f:
+            _alias_cache["data"] = {**_default_alias(), **json.load(f).get(COLLECTION_NAME, {})}
+        _alias_cache["mtime"] = mtime
+    return dict(_alias_cache["data"])
+
+
+def write_alias(alias):
+    """Persists the alias record atomically (write to a temp file, then rename)."""
+    os.makedirs(CHROMA_PATH, exist_ok=True)
+    tmp_path = f"{ALIAS_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({COLLECTION_NAME: alias}, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, ALIAS_FILE)
+
+
+def version_name(version):
+    """Maps a version label ("v2") to its collection name; full names pass through."""
+    version = str(version)
+    if version == COLLECTION_NAME or version.startswith(f"{COLLECTION_NAME}_"):
+        return version
+    return f"{COLLECTION_NAME}_{version}"
+
+
+def get_collection():
+    """Returns the collection the alias currently points at."""
+    return open_collection(read_alias()["active"])
+
+
+def _write_targets():
+    # Writes also land in the version being built (so it does not miss changes
+    # made during the re-index) and in the previous one (so rollback stays current)
+    alias = read_alias()
+    names = [alias["active"]] + [alias[k] for k in ("building", "previous") if alias[k]]
+    return [open_collection(name) for name in dict.fromkeys(names)]
+
+
+# ------------------------------
+# Backend interface
+# ------------------------------
+class VectorBackend:
+    """
+    Storage and nearest-neighbour search for medicine embeddings.
+
+    Scores are squared L2 distances between normalized vectors (lower is
+    better), matching ChromaDB's default space.
+    """
+
+    def upsert(self, ids, names, documents):
+        """Embeds and stores documents, replacing existing IDs."""
+        raise NotImplementedError
+
+    def upsert_embeddings(self, ids, names, documents, embeddings):
+        """Stores precomputed embeddings, replacing existing IDs."""
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def get_embeddings(self, ids):
+        """Returns {id: embedding} for the IDs present in the index."""
+        raise NotImplementedError
+
+    def get_names(self, ids):
+        """Returns {id: name} for the IDs present in the index."""
+        raise NotImplementedError
+
+    def get_documents(self, ids):
+        """Returns {id: document} for the IDs present in the index."""
+        raise NotImplementedError
+
+    def query(self, query_texts=None, query_embeddings=None, top_k=5):
+        """Returns one list of {"id", "name", "score"} per query."""
+        raise NotImplementedError
+
+    def iter_embeddings(self, batch_size=1000):
+        """Yields (ids, names, embeddings) pages covering the whole index."""
+        raise NotImplementedError
+
+    def iter_documents(self, batch_size=1000):
+        """Yields (ids, names, documents) pages covering the whole index."""
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+
+class ChromaBackend(VectorBackend):
+    """ChromaDB collections behind the versioned alias."""
+
+    def upsert(self, ids, names, documents):
+        for target in _write_targets():
+            target.upsert(
+                ids=list(ids),
+                documents=[doc or "" for doc in documents],
+                metadatas=[{"name": name} for name in names],
+            )
+
+    def upsert_embeddings(self, ids, names, documents, embeddings):
+        active = get_collection()
+        for target in _write_targets():
+            kwargs = {
+                "ids": list(ids),
+                "documents": [doc or "" for doc in documents],
+                "metadatas": [{"name": name} for name in names],
+            }
+            # Other versions may use another model; let them embed the documents themselves
+            if target is active:
+                kwargs["embeddings"] = [list(map(float, emb)) for emb in embeddings]
+            target.upsert(**kwargs)
+
+    def delete(self, ids):
+        for target in _write_targets():
+            try:
+                target.delete(ids=list(ids))
+            except Exception:
+                pass
+
+    def get_embeddings(self, ids):
+        if not ids:
+            return {}
+        results = get_collection().get(ids=list(ids), include=["embeddings"])
+        return {mid: emb for mid, emb in zip(results["ids"], results["embeddings"])}
+
+    def get_names(self, ids):
+        if not ids:
+            return {}
+        results = get_collection().get(ids=list(ids), include=["metadatas"])
+        return {mid: (meta or {}).get("name") for mid, meta in zip(results["ids"], results["metadatas"])}
+
+    def get_documents(self, ids):
+        if not ids:
+            return {}
+        results = get_collection().get(ids=list(ids), include=["documents"])
+        return dict(zip(results["ids"], results["documents"]))
+
+    def query(self, query_texts=None, query_embeddings=None, top_k=5):
+        collection = get_collection()
+        if query_embeddings is not None:
+            if len(query_embeddings) == 0:
+                return []
+            results = collection.query(query_embeddings=[list(map(float, e)) for e in query_embeddings], n_results=top_k)
+        else:
+            if not query_texts:
+                return []
+            results = collection.query(query_texts=list(query_texts), n_results=top_k)
+
+        batches = []
+        for ids, metas, distances in zip(results["ids"], results["metadatas"], results["distances"]):
+            batches.append([
+                {"id": mid, "name": meta["name"], "score": dist}
+                for mid, meta, dist in zip(ids, metas, distances)
+            ])
+        return batches
+
+    def iter_embeddings(self, batch_size=1000):
+        for page in iter_collection(batch_size, include=("metadatas", "embeddings")):
+            yield page["ids"], [(meta or {}).get("name") for meta in page["metadatas"]], page["embeddings"]
+
+    def iter_documents(self, batch_size=1000):
+        for page in iter_collection(batch_size, include=("metadatas", "documents")):
+            yield page["ids"], [(meta or {}).get("name") for meta in page["metadatas"]], page["documents"]
+
+    def count(self):
+        return get_collection().count()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Returns the configured backend (VECTOR_BACKEND=chroma|numpy)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if VECTOR_BACKEND == "numpy":
+                from backend.services.numpy_index import NumpyBackend
+
+                _backend = NumpyBackend(NUMPY_INDEX_PATH, embed=embed_texts, dtype=NUMPY_INDEX_DTYPE)
+            elif VECTOR_BACKEND == "chroma":
+                _backend = ChromaBackend()
+            else:
+                raise ValueError(f"Unknown VECTOR_BACKEND: {VECTOR_BACKEND!r}")
+        return _backend
+
+
+def embed_texts(texts):
+    """Embeds texts with the default model as normalized float32 vectors."""
+    return get_embedding_model().encode(
+        list(texts), batch_size=64, normalize_embeddings=True, convert_to_numpy=True
+    ).astype("float32")
+
 
 # ------------------------------
 # Add a medicine document to vector DB
 # ------------------------------
 def add_medicine_to_vector_db(medicine_id, medicine_name, description):
     """
-    Adds or updates a medicine's description in the ChromaDB collection.
+    Adds or updates a medicine's description in the vector index.
     If the ID already exists, it's replaced.
     """
-    # Delete if exists
-    try:
-        collection.delete(ids=[medicine_id])
-    except Exception:
-        pass  # Ignore if not found
-
-    collection.add(
-        documents=[description or ""],
-        metadatas=[{"name": medicine_name}],
-        ids=[medicine_id]
-    )
+    get_backend().upsert([medicine_id], [medicine_name], [description or ""])
 
 # ------------------------------
 # Delete a medicine from vector DB
 # ------------------------------
 def delete_medicine_from_vector_db(medicine_id):
     """
-    Removes a medicine from the ChromaDB vector collection.
+    Removes a medicine from the vector index.
     """
-    try:
-        collection.delete(ids=[medicine_id])
-    except Exception:
-        pass
+    get_backend().delete([medicine_id])
 
 # ------------------------------
 # Search for similar medicines
@@ -64,16 +320,150 @@ def search_similar_medicines(query_text, top_k=5):
     Returns:
         list of dicts: Each dict contains the metadata and score of the result.
     """
-    results = collection.query(
-        query_texts=[query_text],
-        n_results=top_k
-    )
-
     # Format results with name and distance (lower is better)
-    matches = []
-    for i in range(len(results["documents"][0])):
-        matches.append({
-            "name": results["metadatas"][0][i]["name"],
-            "score": results["distances"][0][i]
-        })
-    return matches
+    matches = get_backend().query(query_texts=[query_text], top_k=top_k)[0]
+    return [{"name": match["name"], "score": match["score"]} for match in matches]
+
+
+# ------------------------------
+# Batched lookups
+# ------------------------------
+def get_medicine_embeddings(medicine_ids):
+    """
+    Fetches the stored embeddings for the given medicine IDs in one call.
+
+    Returns:
+        dict: medicine_id -> embedding (IDs missing from the index are omitted).
+    """
+    return get_backend().get_embeddings(list(medicine_ids))
+
+
+def search_similar_medicines_batch(query_texts=None, query_embeddings=None, top_k=5):
+    """
+    Runs several similarity searches in a single backend query.
+
+    Args:
+        query_texts (list[str]): Descriptions to embed and search with.
+        query_embeddings (list): Precomputed query vectors (used instead of query_texts).
+        top_k (int): Number of results per query.
+
+    Returns:
+        list of lists of dicts: One list per query, each entry holding the
+        medicine id, name and distance score (lower is better).
+    """
+    return get_backend().query(query_texts=query_texts, query_embeddings=query_embeddings, top_k=top_k)
+
+
+# ------------------------------
+# Paged iteration (ChromaDB maintenance)
+# ------------------------------
+def iter_collection(batch_size=500, include=("documents", "metadatas"), collection=None):
+    """
+    Yields a collection page by page so callers never hold more than
+    batch_size records in memory.
+
+    Args:
+        batch_size (int): Records per page.
+        include (tuple): Fields to fetch ("documents", "metadatas", "embeddings").
+        collection: Collection to read (defaults to the active alias target).
+
+    Yields:
+        dict: A ChromaDB get() result for one page.
+    """
+    collection = collection or get_collection()
+    offset = 0
+    while True:
+        page = collection.get(limit=batch_size, offset=offset, include=list(include))
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+# ------------------------------
+# Zero-downtime re-index
+# ------------------------------
+def reindex_collection(version, model_name=EMBEDDING_MODEL_NAME, batch_size=256, progress=None):
+    """
+    Builds a new collection version from the active one while searches keep
+    using the active collection. Documents are re-embedded in batches with
+    `model_name`; live writes are mirrored into the new version for the whole
+    build. The alias is not flipped: call promote_version() when ready.
+
+    Returns:
+        str: Name of the built collection.
+    """
+    alias = read_alias()
+    name = version_name(version)
+    if name == alias["active"]:
+        raise ValueError(f"{name} is the active collection")
+
+    source = open_collection(alias["active"])
+    target = open_collection(name, model_name)
+    write_alias({**alias, "building": name})
+
+    copied = 0
+    for page in iter_collection(batch_size, include=("documents", "metadatas"), collection=source):
+        target.upsert(ids=page["ids"], documents=page["documents"], metadatas=page["metadatas"])
+        copied += len(page["ids"])
+        if progress:
+            progress(copied)
+
+    # Drop anything deleted from the source after it was copied
+    offset = 0
+    while True:
+        page = target.get(limit=batch_size, offset=offset, include=[])
+        if not page["ids"]:
+            break
+        live = set(source.get(ids=page["ids"], include=[])["ids"])
+        gone = [mid for mid in page["ids"] if mid not in live]
+        if gone:
+            target.delete(ids=gone)
+        offset += len(page["ids"]) - len(gone)
+
+    return name
+
+
+def promote_version(version):
+    """Atomically points the alias at a built version; the old one is kept for rollback."""
+    alias = read_alias()
+    name = version_name(version)
+    if name not in list_collection_versions():
+        raise ValueError(f"Collection {name} does not exist")
+    if name == alias["active"]:
+        return alias
+
+    alias = {"active": name, "previous": alias["active"], "building": None}
+    write_alias(alias)
+    return alias
+
+
+def rollback_version():
+    """Swaps the alias back to the previously active collection."""
+    alias = read_alias()
+    if not alias["previous"]:
+        raise ValueError("No previous collection to roll back to")
+    alias = {"active": alias["previous"], "previous": alias["active"], "building": None}
+    write_alias(alias)
+    return alias
+
+
+def list_collection_versions():
+    """Names of all versions of the medicine collection."""
+    names = []
+    for item in get_chroma_client().list_collections():
+        name = item if isinstance(item, str) else item.name
+        if name == COLLECTION_NAME or name.startswith(f"{COLLECTION_NAME}_"):
+            names.append(name)
+    return sorted(names)
+
+
+def drop_version(version):
+    """Deletes a collection version that the alias no longer references."""
+    alias = read_alias()
+    name = version_name(version)
+    if name in alias.values():
+        raise ValueError(f"{name} is still referenced by the alias; promote or roll back first")
+    get_chroma_client().delete_collection(name=name)
+    with _collections_lock:
+        _collections.pop(name, None)
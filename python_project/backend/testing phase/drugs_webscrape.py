@@ -1,21 +1,36 @@
-
-
-
 # drug_scraper.py
+"""
+Scrapes the "Uses" section of drug monographs into drug_summaries.csv.
 
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
+    python drugs_webscrape.py --drugs-file drugs.txt --concurrency 8 --rate 2
+    python drugs_webscrape.py --mode browser          # render pages with Chromium
+    python drugs_webscrape.py --base-url http://127.0.0.1:8001/   # local stand-in server
+
+Plain HTTP + BeautifulSoup(lxml) is the default; `--mode browser` reuses one
+headless Chromium with N pages for sites that need JavaScript (Playwright is
+optional: requirements-browser.txt). Requests to
+each host are spaced by the --rate limit, rows are appended to the CSV as
+they finish, and a checkpoint file next to the CSV lets an interrupted run
+pick up where it stopped. Failed drugs are not checkpointed, so the next run
+retries them.
+"""
+import argparse
+import asyncio
 import csv
+import io
+import os
+import random
 import time
+from urllib.parse import urlsplit
+
+import httpx
+from bs4 import BeautifulSoup
+
+BASE_URL = "https://www.drugs.com/"
+USER_AGENT = "PharmaAssist-monograph-scraper/1.0"
+MAX_RETRIES = 2
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-def fetch_html_with_playwright(url):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        page.goto(url, timeout=60000)
-        html = page.content()
-        browser.close()
-        return html
 
 def extract_section(soup, start_id="uses", end_id="warnings"):
     start_tag = soup.find("h2", id=start_id)
@@ -36,28 +51,270 @@ def extract_section(soup, start_id="uses", end_id="warnings"):
 
     return "\n".join(content)
 
-def scrape_drug_summary(drug_name):
-    base_url = "https://www.drugs.com/"
-    drug_url = f"{base_url}{drug_name.lower().replace(' ', '-')}.html"
+
+def parse_summary(html):
+    return extract_section(BeautifulSoup(html, "lxml"))
+
+
+def drug_url(base_url, drug_name):
+    return f"{base_url.rstrip('/')}/{drug_name.lower().replace(' ', '-')}.html"
+
+
+# ------------------------------
+# Politeness
+# ------------------------------
+class HostRateLimiter:
+    """Spaces request starts to at most `rate` per second for each host."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next_slot = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url):
+        host = urlsplit(url).netloc
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+# ------------------------------
+# Fetchers
+# ------------------------------
+class HttpFetcher:
+    """Plain HTTP over one pooled keep-alive client."""
+
+    def __init__(self, concurrency, timeout):
+        self.client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+
+    async def fetch(self, url):
+        res = await self.client.get(url)
+        return res.status_code, res.text
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class BrowserFetcher:
+    """One headless Chromium, one context and a fixed pool of reusable pages."""
+
+    def __init__(self, concurrency, timeout):
+        self.concurrency = concurrency
+        self.timeout_ms = int(timeout * 1000)
+        self._pages = asyncio.Queue()
+
+    async def start(self):
+        try:
+            from playwright.async_api import async_playwright
+        except ImportError:
+            raise SystemExit(
+                "--mode browser needs Playwright: pip install -r requirements-browser.txt"
+                " && playwright install chromium"
+            )
+
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        self._context = await self._browser.new_context(user_agent=USER_AGENT)
+        # Images, fonts and stylesheets are irrelevant to the text we extract
+        await self._context.route(
+            "**/*",
+            lambda route: route.abort()
+            if route.request.resource_type in ("image", "font", "stylesheet", "media")
+            else route.continue_(),
+        )
+        for _ in range(self.concurrency):
+            self._pages.put_nowait(await self._context.new_page())
+        return self
+
+    async def fetch(self, url):
+        page = await self._pages.get()
+        try:
+            response = await page.goto(url, timeout=self.timeout_ms, wait_until="domcontentloaded")
+            return (response.status if response else 0), await page.content()
+        finally:
+            self._pages.put_nowait(page)
+
+    async def close(self):
+        await self._context.close()
+        await self._browser.close()
+        await self._playwright.stop()
+
+
+# ------------------------------
+# Output + checkpoint
+# ------------------------------
+class ResumableWriter:
+    """
+    Appends CSV rows and records progress in `<output>.checkpoint`, one
+    "offset<TAB>status<TAB>drug" line per finished drug, where offset is the
+    CSV size after that drug's row was flushed. On resume the CSV is cut back
+    to the last checkpointed offset, dropping any half-written row.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.checkpoint_path = path + ".checkpoint"
+        self.done = set()
+
+        offset = None
+        if os.path.exists(self.checkpoint_path) and not os.path.exists(path):
+            # The output was deleted on purpose: start over
+            os.remove(self.checkpoint_path)
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t", 2)
+                    if len(parts) == 3:
+                        offset = int(parts[0])
+                        self.done.add(parts[2].lower())
+        elif os.path.exists(path):
+            # Output from an older run without a checkpoint: trust every row that isn't an error
+            with open(path, newline="", encoding="utf-8") as f:
+                self.done = {
+                    row[0].lower() for row in csv.reader(f)
+                    if len(row) > 1 and row[0] != "Drug" and not row[1].startswith("Error:")
+                }
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._csv = open(path, "a+", newline="", encoding="utf-8")
+        if offset is not None:
+            self._csv.truncate(offset)
+        self._checkpoint = open(self.checkpoint_path, "a", encoding="utf-8")
+        if new_file:
+            self._append(["Drug", "Summary"])
+
+    def _append(self, row):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(row)
+        self._csv.write(buffer.getvalue())
+        self._csv.flush()
+        os.fsync(self._csv.fileno())
+
+    def record(self, drug, summary):
+        """Writes a finished drug; `summary=None` marks a page without the section."""
+        if summary is not None:
+            self._append([drug, summary])
+        self._checkpoint.write(f"{self._csv.tell()}\t{'ok' if summary is not None else 'missing'}\t{drug}\n")
+        self._checkpoint.flush()
+        os.fsync(self._checkpoint.fileno())
+        self.done.add(drug.lower())
+
+    def close(self):
+        self._csv.close()
+        self._checkpoint.close()
+
+
+# ------------------------------
+# Scraper
+# ------------------------------
+async def _scrape_one(fetcher, limiter, base_url, drug):
+    """Returns the section text, None if the page has no such section, or raises."""
+    url = drug_url(base_url, drug)
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.wait(url)
+        try:
+            status, html = await fetcher.fetch(url)
+        except Exception:
+            if attempt == MAX_RETRIES:
+                raise
+        else:
+            if status == 404:
+                return None
+            if status not in RETRY_STATUSES:
+                if status >= 400:
+                    raise RuntimeError(f"HTTP {status}")
+                # Parsing is CPU-bound; keep the event loop free for other fetches
+                return await asyncio.to_thread(parse_summary, html)
+            if attempt == MAX_RETRIES:
+                raise RuntimeError(f"HTTP {status}")
+        await asyncio.sleep(random.uniform(0, 2 ** attempt))
+
+
+async def scrape_multiple_drugs(drug_list, output_file="drug_summaries.csv", base_url=BASE_URL,
+                                mode="http", concurrency=4, rate=1.0, timeout=60.0):
+    """
+    Scrapes every drug not yet checkpointed in `output_file`.
+
+    Returns:
+        dict: Counts of "ok", "missing" (no section on the page) and "failed".
+    """
+    writer = ResumableWriter(output_file)
+    pending = [drug for drug in dict.fromkeys(drug_list) if drug.lower() not in writer.done]
+    print(f"📋 {len(drug_list)} drugs, {len(drug_list) - len(pending)} already done, {len(pending)} to scrape")
+
+    if mode == "browser":
+        fetcher = await BrowserFetcher(concurrency, timeout).start()
+    else:
+        fetcher = HttpFetcher(concurrency, timeout)
+    limiter = HostRateLimiter(rate)
+    queue = asyncio.Queue()
+    for drug in pending:
+        queue.put_nowait(drug)
+    counts = {"ok": 0, "missing": 0, "failed": 0}
+
+    async def worker():
+        while True:
+            try:
+                drug = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                summary = await _scrape_one(fetcher, limiter, base_url, drug)
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"❌ {drug}: {e}")
+                continue
+            writer.record(drug, summary)
+            counts["ok" if summary is not None else "missing"] += 1
+            print(f"{'✅' if summary is not None else '⚠️ '} {drug} ({sum(counts.values())}/{len(pending)})")
+
     try:
-        html = fetch_html_with_playwright(drug_url)
-        soup = BeautifulSoup(html, "html.parser")
-        summary = extract_section(soup)
-        return summary or "Section not found"
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-def scrape_multiple_drugs(drug_list, output_file="drug_summaries.csv"):
-    with open(output_file, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Drug", "Summary"])
-        for drug in drug_list:
-            print(f"Scraping {drug}...")
-            summary = scrape_drug_summary(drug)
-            writer.writerow([drug, summary])
-            time.sleep(2)  # Be polite to the server
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        await fetcher.close()
+        writer.close()
+
+    print(f"🏁 {counts['ok']} scraped, {counts['missing']} without a Uses section, {counts['failed']} failed")
+    return counts
+
+
+def load_drug_list(path):
+    """One drug per line, or the first column of a CSV (header row skipped if it says Drug/Name)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [row[0].strip() for row in csv.reader(f) if row and row[0].strip()]
+    if rows and rows[0].lower() in ("drug", "name"):
+        rows = rows[1:]
+    return rows
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape drug monographs into a CSV")
+    parser.add_argument("--drugs-file", help="Text/CSV file with one drug name per line")
+    parser.add_argument("--output", default="drug_summaries.csv")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--mode", choices=["http", "browser"], default="http",
+                        help="browser renders pages with headless Chromium (needs playwright)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent pages/connections")
+    parser.add_argument("--rate", type=float, default=1.0, help="Max requests per second per host")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
     # Example list of drugs
-    drugs = ["paracetamol", "ibuprofen", "amoxicillin", "azithromycin"]
-    scrape_multiple_drugs(drugs)
+    drugs = load_drug_list(args.drugs_file) if args.drugs_file else ["paracetamol", "ibuprofen", "amoxicillin", "azithromycin"]
+    asyncio.run(scrape_multiple_drugs(
+        drugs,
+        output_file=args.output,
+        base_url=args.base_url,
+        mode=args.mode,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        timeout=args.timeout,
+    ))
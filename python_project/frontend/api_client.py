@@ -0,0 +1,178 @@
+# frontend/api_client.py
+
+import threading
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_ROOT = "http://localhost:8000"
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (3.05, 30)
+OCR_TIMEOUT = (3.05, 120)
+CACHE_TTL = 300
+POOL_SIZE = 16
+
+# ------------------------------
+# Shared resources (one per Streamlit server process)
+# ------------------------------
+@st.cache_resource
+def get_session():
+    """
+    Keep-alive session shared by every page and rerun. Idempotent GETs are
+    retried on connection errors; writes are never retried.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=2,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def _get_etag_store():
+    # url -> (etag, body); lets an expired cache entry revalidate with a 304
+    return {"lock": threading.Lock(), "entries": {}}
+
+
+def _url(path):
+    return f"{API_ROOT}{path}"
+
+
+# ------------------------------
+# Cached reads
+# ------------------------------
+def _conditional_get(path, params=None):
+    store = _get_etag_store()
+    key = (path, tuple(sorted((params or {}).items())))
+
+    with store["lock"]:
+        etag, cached_body = store["entries"].get(key, (None, None))
+
+    headers = {"If-None-Match": etag} if etag else {}
+    res = get_session().get(_url(path), params=params, headers=headers, timeout=DEFAULT_TIMEOUT)
+    if res.status_code == 304 and cached_body is not None:
+        return cached_body
+
+    res.raise_for_status()
+    body = res.json()
+    new_etag = res.headers.get("ETag")
+    if new_etag:
+        with store["lock"]:
+            store["entries"][key] = (new_etag, body)
+    return body
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _cached_get(path, params_items):
+    return _conditional_get(path, dict(params_items))
+
+
+def get_json(path, params=None, use_cache=True):
+    """
+    GET a JSON resource. Cached per (path, params) for CACHE_TTL seconds; once
+    an entry expires it is revalidated against the server ETag so unchanged
+    data costs an empty 304 instead of a full payload.
+    """
+    if not use_cache:
+        return _conditional_get(path, params)
+    return _cached_get(path, tuple(sorted((params or {}).items())))
+
+
+def get_inventory():
+    return get_json("/inventory/all")
+
+
+def invalidate():
+    """Drops every cached read; call after any write to the backend."""
+    _cached_get.clear()
+    if "api_lookups" in st.session_state:
+        del st.session_state["api_lookups"]
+    store = _get_etag_store()
+    with store["lock"]:
+        store["entries"].clear()
+
+
+# ------------------------------
+# Writes (always invalidate cached reads)
+# ------------------------------
+def _write(method, path, payload=None):
+    res = get_session().request(method, _url(path), json=payload, timeout=DEFAULT_TIMEOUT)
+    if res.ok:
+        invalidate()
+    return res
+
+
+def post(path, payload):
+    return _write("POST", path, payload)
+
+
+def put(path, payload):
+    return _write("PUT", path, payload)
+
+
+def delete(path):
+    return _write("DELETE", path)
+
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+def extract_prescription(digest, filename, mime_type, _content):
+    """
+    Sends a prescription image to the OCR endpoint. Results are cached by the
+    image digest (the raw bytes are excluded from hashing), so reruns with the
+    same upload never re-send it to Gemini.
+    """
+    res = get_session().post(
+        _url("/ocr/extract"),
+        files={"file": (filename, _content, mime_type)},
+        timeout=OCR_TIMEOUT,
+    )
+    res.raise_for_status()
+    return res.json()
+
+
+# ------------------------------
+# Per-session lookup cache
+# ------------------------------
+def lookup_cache():
+    """
+    Prescription resolutions (stock and alternatives) for the current browser
+    session. Form interactions are answered from here without touching the
+    network; any successful write clears it.
+    """
+    return st.session_state.setdefault("api_lookups", {})
+
+
+def resolve_prescription(names, top_k=5):
+    """
+    Returns {name_lower: resolution} for the given medicine names. Names this
+    session has not resolved yet are sent to /prescriptions/resolve together
+    in a single request; alternatives are always ranked so availability for
+    any quantity can be decided locally.
+    """
+    cache = lookup_cache()
+    missing = sorted({name.strip() for name in names if name.strip() and name.strip().lower() not in cache})
+
+    if missing:
+        res = get_session().post(
+            _url("/prescriptions/resolve"),
+            json={
+                "items": [{"name": name, "quantity": 1} for name in missing],
+                "top_k": top_k,
+                "always_alternatives": True,
+            },
+            timeout=DEFAULT_TIMEOUT,
+        )
+        res.raise_for_status()
+        for item in res.json()["items"]:
+            cache[item["name"].lower()] = item
+
+    return cache
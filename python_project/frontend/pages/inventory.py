@@ -6,7 +6,7 @@ import requests
 import plotly.express as px
 from datetime import datetime
 
-API_BASE = "http://localhost:8000/inventory"
+import api_client
 
 def render_inventory_page():
     st.title("🧾 Medicine Inventory Management")
@@ -15,13 +15,11 @@ def render_inventory_page():
     # Load data safely
     # ------------------------------
     try:
-        response = requests.get(f"{API_BASE}/all")
-        if response.status_code == 200:
-            meds = response.json()
-            df = pd.DataFrame(meds)
-        else:
-            st.error("Failed to fetch inventory from the API.")
-            df = pd.DataFrame()
+        meds = api_client.get_inventory()
+        df = pd.DataFrame(meds)
+    except requests.HTTPError:
+        st.error("Failed to fetch inventory from the API.")
+        df = pd.DataFrame()
     except Exception as e:
         st.error(f"Connection error: {e}")
         df = pd.DataFrame()
@@ -88,7 +86,7 @@ def render_inventory_page():
                 "price": price,
                 "expiry_date": expiry.strftime("%Y-%m-%d")
             }
-            res = requests.post(f"{API_BASE}/add", json=payload)
+            res = api_client.post("/inventory/add", payload)
             if res.status_code == 200:
                 st.success("Medicine added successfully ✅")
                 st.rerun()
@@ -104,7 +102,7 @@ def render_inventory_page():
         st.subheader("🗑 Delete a Medicine")
         del_id = st.selectbox("Select ID to delete", df["id"])
         if st.button("Delete Selected"):
-            res = requests.delete(f"{API_BASE}/delete/{del_id}")
+            res = api_client.delete(f"/inventory/delete/{del_id}")
             if res.status_code == 200:
                 st.success("Deleted successfully ✅")
                 st.rerun()
@@ -136,7 +134,7 @@ def render_inventory_page():
                     "price": upd_price,
                     "expiry_date": upd_expiry.strftime("%Y-%m-%d")
                 }
-                res = requests.put(f"{API_BASE}/update/{upd_id}", json=payload)
+                res = api_client.put(f"/inventory/update/{upd_id}", payload)
                 if res.status_code == 200:
                     st.success("Updated successfully ✅")
                     st.rerun()
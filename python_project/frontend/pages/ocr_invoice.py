@@ -1,13 +1,25 @@
 import streamlit as st
-import requests
 from fpdf import FPDF
 from datetime import datetime
+import hashlib
 import tempfile
 
-API_OCR = "http://localhost:8000/ocr/extract"
-API_SELL = "http://localhost:8000/inventory/sell"
-API_SEARCH = "http://localhost:8000/search"
-API_INVENTORY = "http://localhost:8000/inventory/all"
+import api_client
+
+API_SELL = "/inventory/sell"
+
+def extract_prescription(image):
+    """
+    Returns the OCR result for an uploaded image, keyed by its content hash so
+    reruns triggered by form edits reuse the result instead of re-uploading.
+    """
+    content = image.getvalue()
+    digest = hashlib.sha256(content).hexdigest()
+    results = st.session_state.setdefault("ocr_results", {})
+    if digest not in results:
+        with st.spinner("Extracting text..."):
+            results[digest] = api_client.extract_prescription(digest, image.name, image.type, content)
+    return results[digest]
 
 def render_ocr_invoice_page():
     st.title("💊 OCR + Invoice Generator")
@@ -38,22 +50,25 @@ def render_ocr_invoice_page():
         image = st.file_uploader("Upload Image", type=["png", "jpg", "jpeg"])
 
         if image:
-            with st.spinner("Extracting text..."):
-                res = requests.post(API_OCR, files={"file": image})
-                if res.status_code == 200:
-                    data = res.json()
-                    patient = st.text_input("Patient Name", value=data.get("Patient's Name", ""))
-                    doctor = st.text_input("Doctor Name", value=data.get("Doctor's Name", ""))
-                    clinic = st.text_input("Clinic Name", value=data.get("Clinic Name", ""))
-                    date = st.date_input("Date", value=datetime.today())
-
-                    extracted = data.get("Medicines Prescribed", [])
-                    st.markdown("### 📋 Extracted Medicines")
-                    for i, extracted_name in enumerate(extracted):
-                        name = st.text_input(f"Medicine {i+1} Name", value=extracted_name, key=f"ocr_name_{i}")
-                        quantity = st.number_input(f"Quantity for {name}", min_value=1, key=f"ocr_qty_{i}")
-                        if name:
-                            meds.append({"name": name, "quantity": quantity})
+            try:
+                data = extract_prescription(image)
+            except Exception as e:
+                st.error(f"❌ OCR failed: {e}")
+                data = None
+
+            if data:
+                patient = st.text_input("Patient Name", value=data.get("Patient's Name", ""))
+                doctor = st.text_input("Doctor Name", value=data.get("Doctor's Name", ""))
+                clinic = st.text_input("Clinic Name", value=data.get("Clinic Name", ""))
+                date = st.date_input("Date", value=datetime.today())
+
+                extracted = data.get("Medicines Prescribed") or []
+                st.markdown("### 📋 Extracted Medicines")
+                for i, extracted_name in enumerate(extracted):
+                    name = st.text_input(f"Medicine {i+1} Name", value=extracted_name, key=f"ocr_name_{i}")
+                    quantity = st.number_input(f"Quantity for {name}", min_value=1, key=f"ocr_qty_{i}")
+                    if name:
+                        meds.append({"name": name, "quantity": quantity})
 
         st.markdown("### ➕ Add Extra Medicines (Optional)")
         num_extra = st.number_input("Extra medicines to add", min_value=0, max_value=5, step=1, key="extra_ocr_count")
@@ -68,68 +83,48 @@ def render_ocr_invoice_page():
 
     final_meds = []
     if meds:
+        # The whole prescription is resolved in one request; names already
+        # resolved in this session (and quantity edits) cost no network call
         try:
-            inv = requests.get(API_INVENTORY).json()
-            inventory_names = {m["name"].lower(): m for m in inv}
-        except:
+            resolved = api_client.resolve_prescription([med["name"] for med in meds])
+        except Exception:
             st.error("❌ Could not connect to inventory API.")
             return
 
         for med in meds:
             name = med["name"].strip()
             qty = med["quantity"]
-            found = inventory_names.get(name.lower())
+            entry = resolved.get(name.lower())
+            if entry is None:
+                continue
 
-            if found and found["quantity"] >= qty:
-                st.success(f"✅ {name} is available (Qty: {found['quantity']})")
+            if entry["in_stock"] >= qty:
+                st.success(f"✅ {name} is available (Qty: {entry['in_stock']})")
                 final_meds.append({"name": name, "quantity": qty})
             else:
-                if found:
-                    st.warning(f"⚠️ {name} in stock: {found['quantity']} < requested {qty}")
+                if entry["medicine_id"]:
+                    st.warning(f"⚠️ {name} in stock: {entry['in_stock']} < requested {qty}")
                 else:
                     st.warning(f"❌ {name} not in inventory")
 
-                alt_res = requests.post(f"{API_SEARCH}/similar", json={"medicine_name": name, "top_k": 10})
-                if alt_res.status_code == 200:
-                    try:
-                        alts = alt_res.json()
-                        options = []
-                        used_names = set()
-
-                        for alt in alts:
-                            alt_name = alt["name"]
-                            if alt_name.lower() in used_names:
-                                continue
-                            used_names.add(alt_name.lower())
-
-                            match = inventory_names.get(alt_name.lower())
-                            if match and match["quantity"] > 0:
-                                options.append((alt_name, match["quantity"]))
-                            if len(options) >= 5:
-                                break
-
-                        if options:
-                            st.success("✅ Found top vector alternatives:")
-                            for alt_name, qty_available in options:
-                                st.markdown(f"- {alt_name} (In stock: {qty_available})")
-
-                            alt_only = [opt[0] for opt in options]
-                            selected_alt = st.selectbox(f"Select alternative for {name}", alt_only, key=f"alt_select_{name}")
-                            max_qty = dict(options)[selected_alt]
-                            alt_qty = st.number_input(f"Quantity for {selected_alt}", min_value=1, max_value=max_qty, key=f"alt_qty_{name}")
-                            final_meds.append({"name": selected_alt, "quantity": alt_qty})
-                        else:
-                            st.error(f"⚠️ No in-stock vector alternatives found for {name}")
-                    except Exception as e:
-                        st.error(f"❌ Error parsing alternatives: {e}")
+                options = [(alt["name"], alt["in_stock"]) for alt in entry["alternatives"]]
+                if options:
+                    st.success("✅ Found top vector alternatives:")
+                    for alt_name, qty_available in options:
+                        st.markdown(f"- {alt_name} (In stock: {qty_available})")
+
+                    alt_only = [opt[0] for opt in options]
+                    selected_alt = st.selectbox(f"Select alternative for {name}", alt_only, key=f"alt_select_{name}")
+                    max_qty = dict(options)[selected_alt]
+                    alt_qty = st.number_input(f"Quantity for {selected_alt}", min_value=1, max_value=max_qty, key=f"alt_qty_{name}")
+                    final_meds.append({"name": selected_alt, "quantity": alt_qty})
                 else:
-                    st.error(f"❌ Vector search failed: {alt_res.status_code}")
-                    st.text(alt_res.text)
+                    st.error(f"⚠️ No in-stock vector alternatives found for {name}")
 
     if final_meds and st.button("🧾 Generate Invoice and Update Stock"):
         payload = {"medicines": final_meds}
         with st.spinner("Processing..."):
-            res = requests.post(API_SELL, json=payload)
+            res = api_client.post(API_SELL, payload)
 
         if res.status_code == 200:
             invoice_data = res.json()["invoice"]
@@ -0,0 +1,113 @@
+# scripts/benchmark_vector_backends.py
+"""
+Compares the ChromaDB and NumPy vector backends on synthetic embeddings.
+
+    python scripts/benchmark_vector_backends.py --size 50000 --queries 500
+    python scripts/benchmark_vector_backends.py --size 50000 --dtype int8
+
+Reports load time, cold-open time and per-query latency (p50/p95) for each
+backend. Vectors are random unit vectors with the MiniLM dimension, so no
+model download is needed.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from backend.services.numpy_index import NumpyBackend
+
+DIM = 384
+CHROMA_MAX_BATCH = 5000
+
+
+def _percentiles(samples):
+    ms = np.array(samples) * 1000
+    return f"p50 {np.percentile(ms, 50):.3f} ms | p95 {np.percentile(ms, 95):.3f} ms"
+
+
+def _no_embed(_texts):
+    raise RuntimeError("benchmark passes precomputed embeddings only")
+
+
+def bench_numpy(vectors, queries, top_k, dtype, workdir):
+    ids = [f"m{i}" for i in range(len(vectors))]
+    path = os.path.join(workdir, "numpy_index")
+
+    start = time.perf_counter()
+    backend = NumpyBackend(path, embed=_no_embed, dtype=dtype)
+    backend.upsert_embeddings(ids, ids, [""] * len(ids), vectors)
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    backend = NumpyBackend(path, embed=_no_embed, dtype=dtype)
+    cold_open = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        backend.query(query_embeddings=query[None, :], top_k=top_k)
+        latencies.append(time.perf_counter() - start)
+    return load, cold_open, latencies
+
+
+def bench_chroma(vectors, queries, top_k, workdir):
+    import chromadb
+
+    ids = [f"m{i}" for i in range(len(vectors))]
+    path = os.path.join(workdir, "chroma")
+
+    start = time.perf_counter()
+    client = chromadb.PersistentClient(path=path)
+    collection = client.get_or_create_collection(name="bench", embedding_function=None)
+    for i in range(0, len(ids), CHROMA_MAX_BATCH):
+        collection.add(
+            ids=ids[i:i + CHROMA_MAX_BATCH],
+            embeddings=vectors[i:i + CHROMA_MAX_BATCH].tolist(),
+            metadatas=[{"name": mid} for mid in ids[i:i + CHROMA_MAX_BATCH]],
+        )
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    client = chromadb.PersistentClient(path=path)
+    collection = client.get_collection(name="bench", embedding_function=None)
+    cold_open = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query.tolist()], n_results=top_k)
+        latencies.append(time.perf_counter() - start)
+    return load, cold_open, latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark vector backends")
+    parser.add_argument("--size", type=int, default=20000, help="Number of indexed vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--dtype", choices=["float32", "int8"], default="float32")
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(42)
+    vectors = rng.normal(size=(args.size, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.integers(0, args.size, args.queries)]
+
+    print(f"📐 {args.size} vectors x {DIM} dims, {args.queries} queries, top_k={args.top_k}\n")
+    with tempfile.TemporaryDirectory() as workdir:
+        load, cold_open, latencies = bench_numpy(vectors, queries, args.top_k, args.dtype, workdir)
+        print(f"NumPy ({args.dtype}): load {load:.2f} s | open {cold_open * 1000:.1f} ms | {_percentiles(latencies)}")
+
+        if not args.skip_chroma:
+            load, cold_open, latencies = bench_chroma(vectors, queries, args.top_k, workdir)
+            print(f"ChromaDB:        load {load:.2f} s | open {cold_open * 1000:.1f} ms | {_percentiles(latencies)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# scripts/bulk_load_vectors.py
+"""
+Bulk-loads drug summaries from a local CSV or Parquet file into the vector store.
+
+    python scripts/bulk_load_vectors.py "backend/testing phase/drug_summaries.csv"
+    python scripts/bulk_load_vectors.py summaries.parquet --id-column id --name-column name --text-column summary
+    python scripts/bulk_load_vectors.py summaries.parquet --version reference --workers 8
+
+The source is read as a stream, embedded in large batches across a process
+pool (one model per worker), and upserted in chunks. Nothing is fetched
+from the network. Progress is checkpointed after every chunk in
+`<source>.load-checkpoint`, so rerunning the same command resumes after
+the last stored chunk.
+
+Without --id-column, IDs are derived from the drug name. `reconcile --repair`
+deletes vectors with no SQLite row, so reference corpora that are not
+inventory belong in their own --version.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import csv
+import json
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from backend.services import vector_search
+
+EMBED_BATCH = 512
+UPSERT_BATCH = 2048
+SKIP_PREFIXES = ("Error:", "Section not found", "No data found")
+
+_worker_model = None
+
+
+# ------------------------------
+# Source readers
+# ------------------------------
+def _slug(name):
+    return "drug-" + re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def iter_source(path, name_column, text_column, id_column=None, read_batch=10000):
+    """Yields (id, name, text) rows from a CSV or Parquet file without loading it whole."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        columns = [name_column, text_column] + ([id_column] if id_column else [])
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=read_batch, columns=columns):
+            rows = batch.to_pydict()
+            ids = rows[id_column] if id_column else [None] * batch.num_rows
+            for mid, name, text in zip(ids, rows[name_column], rows[text_column]):
+                yield mid, name, text
+        return
+
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield row.get(id_column) if id_column else None, row[name_column], row[text_column]
+
+
+# ------------------------------
+# Embedding workers
+# ------------------------------
+def _init_worker(model_name, threads):
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Each process gets its share of the cores instead of all of them fighting over every core
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _embed(texts):
+    return _worker_model.encode(
+        texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True
+    ).astype(np.float32)
+
+
+# ------------------------------
+# Checkpoint
+# ------------------------------
+def _checkpoint_path(source):
+    return source + ".load-checkpoint"
+
+
+def _read_checkpoint(source, target):
+    path = _checkpoint_path(source)
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("target") != target:
+        print(f"⚠️  Checkpoint was for {state.get('target')!r}, not {target!r}; starting over")
+        return 0
+    return state["rows_done"]
+
+
+def _write_checkpoint(source, target, rows_done):
+    path = _checkpoint_path(source)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"target": target, "rows_done": rows_done}, f)
+    os.replace(tmp, path)
+
+
+# ------------------------------
+# Loader
+# ------------------------------
+def _chunks(rows, size, skip):
+    """Groups usable rows into chunks of `size`, tagging each with the source position it ends at."""
+    ids, names, texts = [], [], []
+    position = 0
+    for mid, name, text in rows:
+        position += 1
+        if position <= skip:
+            continue
+        name = (name or "").strip()
+        text = (text or "").strip()
+        if not name or not text or text.startswith(SKIP_PREFIXES):
+            continue
+        ids.append(str(mid) if mid else _slug(name))
+        names.append(name)
+        texts.append(text)
+        if len(ids) >= size:
+            yield ids, names, texts, position
+            ids, names, texts = [], [], []
+    yield ids, names, texts, position
+
+
+def _dedupe(ids, names, texts, embeddings):
+    # Upserts reject duplicate IDs within one call; the last occurrence wins
+    last = {mid: i for i, mid in enumerate(ids)}
+    if len(last) == len(ids):
+        return ids, names, texts, embeddings
+    keep = sorted(last.values())
+    return [ids[i] for i in keep], [names[i] for i in keep], [texts[i] for i in keep], embeddings[keep]
+
+
+def _make_upsert(version):
+    if version:
+        collection = vector_search.open_collection(vector_search.version_name(version))
+        model = (collection.metadata or {}).get("embedding_model", vector_search.EMBEDDING_MODEL_NAME)
+        target = collection.name
+
+        def upsert(ids, names, texts, embeddings):
+            collection.upsert(
+                ids=ids,
+                documents=texts,
+                metadatas=[{"name": name} for name in names],
+                embeddings=embeddings.tolist(),
+            )
+        return upsert, model, target
+
+    backend = vector_search.get_backend()
+    target = f"{vector_search.VECTOR_BACKEND}:active"
+    return backend.upsert_embeddings, vector_search.EMBEDDING_MODEL_NAME, target
+
+
+def bulk_load(source, name_column="Drug", text_column="Summary", id_column=None, version=None,
+              workers=None, embed_batch=EMBED_BATCH, upsert_batch=UPSERT_BATCH, restart=False):
+    """
+    Streams `source` into the vector store.
+
+    Returns:
+        int: Number of vectors upserted by this run.
+    """
+    upsert, model_name, target = _make_upsert(version)
+    skip = 0 if restart else _read_checkpoint(source, target)
+    if skip:
+        print(f"↪️  Resuming after row {skip}")
+
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    threads = max(1, (os.cpu_count() or 1) // max(workers, 1))
+    # Bound the work in flight so memory stays flat regardless of source size
+    max_in_flight = max(2, workers * 2)
+
+    if workers > 0:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, threads),
+        )
+        submit = lambda texts: pool.submit(_embed, texts)
+    else:
+        pool = None
+        _init_worker(model_name, os.cpu_count() or 1)
+        submit = lambda texts: _Done(_embed(texts))
+
+    total = 0
+    pending_upsert = None
+    start = time.perf_counter()
+
+    def flush(batch):
+        nonlocal total
+        ids, names, texts, embeddings, position = batch
+        if ids:
+            batch = _dedupe(ids, names, texts, np.vstack(embeddings))
+            upsert(*batch)
+            total += len(batch[0])
+        _write_checkpoint(source, target, position)
+        rate = total / max(time.perf_counter() - start, 1e-9)
+        print(f"⬆️  {total} vectors upserted (row {position}, {rate:.0f}/s)", end="\r")
+
+    def collect(result):
+        # Results arrive in source order; group them into upsert-sized chunks
+        nonlocal pending_upsert
+        ids, names, texts, embeddings, position = result
+        if pending_upsert is None:
+            pending_upsert = ([], [], [], [], position)
+        p_ids, p_names, p_texts, p_embs, _ = pending_upsert
+        p_ids.extend(ids)
+        p_names.extend(names)
+        p_texts.extend(texts)
+        if embeddings.size:
+            p_embs.append(embeddings)
+        pending_upsert = (p_ids, p_names, p_texts, p_embs, position)
+        if len(p_ids) >= upsert_batch:
+            flush(pending_upsert)
+            pending_upsert = None
+
+    rows = iter_source(source, name_column, text_column, id_column)
+    in_flight = deque()
+    try:
+        for ids, names, texts, position in _chunks(rows, embed_batch, skip):
+            future = submit(texts) if texts else _Done(np.empty((0, 0), dtype=np.float32))
+            in_flight.append((ids, names, texts, future, position))
+            while len(in_flight) >= max_in_flight:
+                ids_, names_, texts_, future_, position_ = in_flight.popleft()
+                collect((ids_, names_, texts_, future_.result(), position_))
+        while in_flight:
+            ids_, names_, texts_, future_, position_ = in_flight.popleft()
+            collect((ids_, names_, texts_, future_.result(), position_))
+        if pending_upsert is not None:
+            flush(pending_upsert)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ Loaded {total} vectors into {target} in {elapsed:.1f} s")
+    return total
+
+
+class _Done:
+    """Future-like wrapper for results computed in-process (--workers 0)."""
+
+    def __init__(self, value):
+        self._value = value
+
+    def result(self):
+        return self._value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load summaries into the vector store")
+    parser.add_argument("source", help="CSV or .parquet file")
+    parser.add_argument("--name-column", default="Drug")
+    parser.add_argument("--text-column", default="Summary")
+    parser.add_argument("--id-column", help="Column holding vector IDs (default: derived from the name)")
+    parser.add_argument("--version", help="Load into this collection version instead of the active backend")
+    parser.add_argument("--workers", type=int, default=None, help="Embedding processes (0 = in-process, e.g. on GPU)")
+    parser.add_argument("--embed-batch", type=int, default=EMBED_BATCH, help="Texts per worker task")
+    parser.add_argument("--upsert-batch", type=int, default=UPSERT_BATCH, help="Vectors per upsert call")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and load from the first row")
+    args = parser.parse_args(argv)
+
+    bulk_load(
+        args.source,
+        name_column=args.name_column,
+        text_column=args.text_column,
+        id_column=args.id_column,
+        version=args.version,
+        workers=args.workers,
+        embed_batch=args.embed_batch,
+        upsert_batch=args.upsert_batch,
+        restart=args.restart,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+# scripts/vector_store.py
+"""
+Maintenance CLI for the medicine vector store.
+
+    python scripts/vector_store.py export medicines.ndjson.gz
+    python scripts/vector_store.py export medicines.arrow
+    python scripts/vector_store.py import medicines.arrow
+    python scripts/vector_store.py snapshot
+    python scripts/vector_store.py reconcile --repair
+    python scripts/vector_store.py reindex v2 --model all-mpnet-base-v2
+    python scripts/vector_store.py promote v2
+    python scripts/vector_store.py rollback
+    python scripts/vector_store.py graph --k 32
+
+Every command works page by page, so memory stays bounded by --batch-size
+no matter how large the collection grows. Without --version, export,
+import, snapshot and reconcile go through the active vector backend
+(VECTOR_BACKEND), so they read and repair the store the server searches.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import gzip
+import json
+from datetime import datetime
+
+from backend.db import models
+from backend.db.database import SessionLocal
+from backend.services.drug_api import fetch_drug_summaries
+from backend.services import neighbor_graph, vector_search
+from backend.services.vector_search import EMBEDDING_MODEL_NAME, iter_collection
+
+DEFAULT_BATCH_SIZE = 500
+SNAPSHOT_DIR = "snapshots"
+ALL_FIELDS = ("documents", "metadatas", "embeddings")
+
+
+def _target(version=None):
+    """
+    The Chroma collection version a command operates on, or None for the
+    active vector backend.
+    """
+    if not version:
+        return None
+    if vector_search.VECTOR_BACKEND != "chroma":
+        raise SystemExit(f"❌ --version needs VECTOR_BACKEND=chroma (active: {vector_search.VECTOR_BACKEND})")
+    return vector_search.open_collection(vector_search.version_name(version))
+
+
+def _model_of(collection):
+    return (collection.metadata or {}).get("embedding_model", EMBEDDING_MODEL_NAME)
+
+
+def _store_info(collection):
+    """(name, embedding model) of a collection version or the active backend."""
+    if collection is None:
+        if vector_search.VECTOR_BACKEND != "chroma":
+            return f"{vector_search.COLLECTION_NAME}_{vector_search.VECTOR_BACKEND}", EMBEDDING_MODEL_NAME
+        collection = vector_search.get_collection()
+    return collection.name, _model_of(collection)
+
+
+def _iter_records(collection, batch_size):
+    """Yields (ids, documents, metadatas, embeddings) pages of a collection version or the active backend."""
+    if collection is not None:
+        for page in iter_collection(batch_size, include=ALL_FIELDS, collection=collection):
+            yield page["ids"], page["documents"], page["metadatas"], page["embeddings"]
+        return
+    backend = vector_search.get_backend()
+    for ids, names, embeddings in backend.iter_embeddings(batch_size):
+        documents = backend.get_documents(ids)
+        yield ids, [documents.get(mid, "") for mid in ids], [{"name": name} for name in names], embeddings
+
+
+# ------------------------------
+# File formats
+# ------------------------------
+def _is_arrow(path):
+    return path.endswith((".arrow", ".arrows"))
+
+
+def _open_text(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _arrow_schema(collection):
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("id", pa.string()),
+            ("document", pa.string()),
+            ("metadata", pa.string()),
+            ("embedding", pa.list_(pa.float32())),
+        ],
+        metadata=_header(collection),
+    )
+
+
+def _header(collection):
+    name, model = _store_info(collection)
+    return {"collection": name, "embedding_model": model}
+
+
+# ------------------------------
+# Export / import
+# ------------------------------
+def export_collection(path, batch_size=DEFAULT_BATCH_SIZE, version=None):
+    """Streams the collection, embeddings included, to NDJSON(.gz) or an Arrow IPC stream."""
+    collection = _target(version)
+    total = 0
+    if _is_arrow(path):
+        import pyarrow as pa
+
+        schema = _arrow_schema(collection)
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_stream(sink, schema) as writer:
+            for ids, documents, metadatas, embeddings in _iter_records(collection, batch_size):
+                writer.write_batch(pa.record_batch(
+                    [
+                        ids,
+                        documents,
+                        [json.dumps(meta or {}) for meta in metadatas],
+                        [list(map(float, emb)) for emb in embeddings],
+                    ],
+                    schema=schema,
+                ))
+                total += len(ids)
+    else:
+        with _open_text(path, "w") as f:
+            f.write(json.dumps({"_header": _header(collection)}) + "\n")
+            for ids, documents, metadatas, embeddings in _iter_records(collection, batch_size):
+                for i, mid in enumerate(ids):
+                    f.write(json.dumps({
+                        "id": mid,
+                        "document": documents[i],
+                        "metadata": metadatas[i],
+                        "embedding": [float(x) for x in embeddings[i]],
+                    }) + "\n")
+                total += len(ids)
+
+    print(f"✅ Exported {total} vectors to {path}")
+    return total
+
+
+def _iter_import_batches(path, batch_size, expected_model):
+    if _is_arrow(path):
+        import pyarrow as pa
+
+        with pa.OSFile(path, "rb") as source:
+            reader = pa.ipc.open_stream(source)
+            model = (reader.schema.metadata or {}).get(b"embedding_model", b"").decode()
+            _check_model(model, expected_model)
+            for batch in reader:
+                rows = batch.to_pydict()
+                for start in range(0, batch.num_rows, batch_size):
+                    end = start + batch_size
+                    yield (
+                        rows["id"][start:end],
+                        rows["document"][start:end],
+                        [json.loads(meta) for meta in rows["metadata"][start:end]],
+                        rows["embedding"][start:end],
+                    )
+        return
+
+    with _open_text(path, "r") as f:
+        ids, docs, metas, embs = [], [], [], []
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "_header" in record:
+                _check_model(record["_header"].get("embedding_model"), expected_model)
+                continue
+            ids.append(record["id"])
+            docs.append(record["document"])
+            metas.append(record["metadata"])
+            embs.append(record["embedding"])
+            if len(ids) >= batch_size:
+                yield ids, docs, metas, embs
+                ids, docs, metas, embs = [], [], [], []
+        if ids:
+            yield ids, docs, metas, embs
+
+
+def _check_model(model, expected_model):
+    if model and model != expected_model:
+        raise SystemExit(
+            f"❌ Export was embedded with {model!r} but this collection uses {expected_model!r}"
+        )
+
+
+def import_collection(path, batch_size=DEFAULT_BATCH_SIZE, version=None):
+    """Upserts an export file back into the collection without re-embedding."""
+    collection = _target(version)
+    total = 0
+    for ids, docs, metas, embs in _iter_import_batches(path, batch_size, _store_info(collection)[1]):
+        if collection is not None:
+            collection.upsert(ids=ids, documents=docs, metadatas=metas, embeddings=embs)
+        else:
+            vector_search.get_backend().upsert_embeddings(ids, [(meta or {}).get("name") for meta in metas], docs, embs)
+        total += len(ids)
+        print(f"⬆️  Imported {total} vectors...", end="\r")
+    print(f"\n✅ Imported {total} vectors from {path}")
+    return total
+
+
+def snapshot(directory=SNAPSHOT_DIR, batch_size=DEFAULT_BATCH_SIZE, version=None):
+    """Writes a timestamped Arrow export of the collection."""
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, f"{_store_info(_target(version))[0]}-{stamp}.arrow")
+    export_collection(path, batch_size, version)
+    return path
+
+
+# ------------------------------
+# SQLite <-> vector store reconciliation
+# ------------------------------
+def _stored_names(collection, ids):
+    if collection is None:
+        return vector_search.get_backend().get_names(ids)
+    found = collection.get(ids=ids, include=["metadatas"])
+    return {mid: (meta or {}).get("name") for mid, meta in zip(found["ids"], found["metadatas"])}
+
+
+def _iter_stored_ids(collection, batch_size):
+    if collection is None:
+        for ids, _, _ in vector_search.get_backend().iter_documents(batch_size):
+            yield ids
+    else:
+        for page in iter_collection(batch_size, include=(), collection=collection):
+            yield page["ids"]
+
+
+def _iter_sql_batches(db, batch_size):
+    # Keyset pagination keeps each query cheap and the working set bounded
+    last_id = None
+    while True:
+        query = db.query(models.Medicine.id, models.Medicine.name).order_by(models.Medicine.id)
+        if last_id is not None:
+            query = query.filter(models.Medicine.id > last_id)
+        rows = query.limit(batch_size).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def reconcile(repair=False, batch_size=DEFAULT_BATCH_SIZE, version=None):
+    """
+    Diffs SQLite against the vector store (a collection version, or the
+    active backend) in batches.
+
+    - missing: medicines in SQLite with no vector (re-embedded on repair)
+    - stale: vectors whose stored name differs from SQLite (re-embedded on repair)
+    - orphans: vectors with no medicine in SQLite (deleted on repair)
+
+    Returns:
+        dict: Counts per category.
+    """
+    collection = _target(version)
+    counts = {"missing": 0, "stale": 0, "orphans": 0}
+    db = SessionLocal()
+    try:
+        # Pass 1: every SQLite row must have an up-to-date vector
+        for rows in _iter_sql_batches(db, batch_size):
+            indexed = _stored_names(collection, [row.id for row in rows])
+
+            to_repair = []
+            for row in rows:
+                if row.id not in indexed:
+                    kind = "missing"
+                elif indexed[row.id] != row.name:
+                    kind = "stale"
+                else:
+                    continue
+                counts[kind] += 1
+                print(f"{'➕' if kind == 'missing' else '♻️ '} {kind}: {row.id} ({row.name})")
+                to_repair.append(row)
+
+            if repair and to_repair:
+                # One batched summary lookup per page instead of a round of requests per medicine
+                summaries = fetch_drug_summaries([row.name for row in to_repair])
+                ids = [row.id for row in to_repair]
+                names = [row.name for row in to_repair]
+                documents = [summaries.get(row.name, "") for row in to_repair]
+                if collection is not None:
+                    collection.upsert(ids=ids, documents=documents, metadatas=[{"name": name} for name in names])
+                else:
+                    vector_search.get_backend().upsert(ids, names, documents)
+
+        # Pass 2: every vector must belong to a SQLite row
+        orphans = []
+        for ids in _iter_stored_ids(collection, batch_size):
+            known = {mid for (mid,) in db.query(models.Medicine.id).filter(models.Medicine.id.in_(ids))}
+            for mid in ids:
+                if mid not in known:
+                    print(f"🗑  orphan: {mid}")
+                    orphans.append(mid)
+        counts["orphans"] = len(orphans)
+
+        # Deleted after the scan, so deletions do not shift the pages being read
+        if repair:
+            for start in range(0, len(orphans), batch_size):
+                if collection is not None:
+                    collection.delete(ids=orphans[start:start + batch_size])
+                else:
+                    vector_search.get_backend().delete(orphans[start:start + batch_size])
+    finally:
+        db.close()
+
+    verb = "Repaired" if repair else "Found"
+    print(f"✅ {verb}: {counts['missing']} missing, {counts['stale']} stale, {counts['orphans']} orphaned vectors")
+    return counts
+
+
+# ------------------------------
+# CLI
+# ------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vector store maintenance")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--version", help="Operate on this collection version instead of the active one")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="Stream the collection to .ndjson[.gz] or .arrow")
+    p_export.add_argument("path")
+
+    p_import = sub.add_parser("import", help="Upsert an export file into the collection")
+    p_import.add_argument("path")
+
+    p_snapshot = sub.add_parser("snapshot", help="Write a timestamped Arrow export")
+    p_snapshot.add_argument("--dir", default=SNAPSHOT_DIR)
+
+    p_reconcile = sub.add_parser("reconcile", help="Diff SQLite against the vector store")
+    p_reconcile.add_argument("--repair", action="store_true", help="Re-embed missing/stale rows and delete orphans")
+
+    p_reindex = sub.add_parser("reindex", help="Build a new collection version in the background")
+    p_reindex.add_argument("new_version", help="Version label, e.g. v2")
+    p_reindex.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="Sentence-transformers model to embed with")
+
+    p_promote = sub.add_parser("promote", help="Atomically point the alias at a built version")
+    p_promote.add_argument("new_version")
+
+    sub.add_parser("rollback", help="Point the alias back at the previous version")
+    sub.add_parser("versions", help="List collection versions and the alias")
+
+    p_graph = sub.add_parser("graph", help="Rebuild the precomputed nearest-neighbour graph")
+    p_graph.add_argument("--k", type=int, default=neighbor_graph.GRAPH_K, help="Neighbours kept per medicine")
+
+    p_drop = sub.add_parser("drop", help="Delete a version the alias no longer references")
+    p_drop.add_argument("old_version")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_collection(args.path, args.batch_size, args.version)
+    elif args.command == "import":
+        import_collection(args.path, args.batch_size, args.version)
+    elif args.command == "snapshot":
+        snapshot(args.dir, args.batch_size, args.version)
+    elif args.command == "reconcile":
+        reconcile(args.repair, args.batch_size, args.version)
+    elif args.command == "reindex":
+        name = vector_search.reindex_collection(
+            args.new_version,
+            model_name=args.model,
+            batch_size=args.batch_size,
+            progress=lambda n: print(f"🔁 Re-embedded {n} documents...", end="\r"),
+        )
+        print(f"\n✅ Built {name}. Run `promote {args.new_version}` to switch searches to it.")
+    elif args.command == "promote":
+        alias = vector_search.promote_version(args.new_version)
+        print(f"✅ Active: {alias['active']} (rollback target: {alias['previous']})")
+        print("   Run `graph` to rebuild the neighbour graph from the new embeddings.")
+    elif args.command == "rollback":
+        alias = vector_search.rollback_version()
+        print(f"↩️  Active: {alias['active']} (previous: {alias['previous']})")
+        print("   Run `graph` to rebuild the neighbour graph from the restored embeddings.")
+    elif args.command == "versions":
+        alias = vector_search.read_alias()
+        for name in vector_search.list_collection_versions():
+            tags = [key for key, value in alias.items() if value == name]
+            print(f"{name}{'  <- ' + ', '.join(tags) if tags else ''}")
+    elif args.command == "graph":
+        db = SessionLocal()
+        try:
+            total = neighbor_graph.build_graph(
+                db, k=args.k, progress=lambda n: print(f"🕸  Linked {n} medicines...", end="\r")
+            )
+        finally:
+            db.close()
+        print(f"\n✅ Built the neighbour graph for {total} medicines")
+    elif args.command == "drop":
+        vector_search.drop_version(args.old_version)
+        print(f"🗑  Dropped {vector_search.version_name(args.old_version)}")
+
+
+if __name__ == "__main__":
+    main()